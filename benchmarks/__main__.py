@@ -0,0 +1,103 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.cases import CASES, MAP_SIZES, ARMY_SIZES, QUICK_MAP_SIZES, QUICK_ARMY_SIZES, SEED, fits
+
+def time_call(fn, repeat):
+    prepare = getattr(fn, 'prepare', None)
+    times = []
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+def run(quick=False, only=None, repeat=5, max_seconds=2.0, log=sys.stderr):
+    sizes = QUICK_MAP_SIZES if quick else MAP_SIZES
+    armies = QUICK_ARMY_SIZES if quick else ARMY_SIZES
+    results = {}
+    for name, setup, uses_army in CASES:
+        if only and not any(o in name for o in only):
+            continue
+        for w, h in sizes:
+            for army in (armies if uses_army else [0]):
+                if uses_army and not fits(w, h, army):
+                    continue
+                key = f'{name}/{w}x{h}' + (f'/u{army}' if uses_army else '')
+                fn = setup(w, h, army)
+                # 第一次调用兼作预热并估计耗时；慢用例减少重复次数，只有一次时才用它计数
+                first = time_call(fn, 1)[0]
+                n = max(1, min(repeat, int(max_seconds / first) if first > 0 else repeat))
+                times = time_call(fn, n) if n > 1 else [first]
+                results[key] = {
+                    'median_s': statistics.median(times),
+                    'min_s': min(times),
+                    'repeat': len(times),
+                }
+                print(f'{key:<48} median {results[key]["median_s"] * 1000:10.3f} ms  (n={len(times)})', file=log)
+    return results
+
+def compare(base, new, threshold):
+    """Return (rows, regressions); a regression is new/base median above threshold."""
+    rows = []
+    regressions = []
+    for key in sorted(set(base) & set(new)):
+        b = base[key]['median_s']
+        n = new[key]['median_s']
+        ratio = n / b if b > 0 else float('inf')
+        rows.append((key, b, n, ratio))
+        if ratio > threshold:
+            regressions.append(key)
+    return rows, regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m benchmarks', description='Simulation hot-path benchmarks')
+    ap.add_argument('-o', '--out', help='write results JSON here')
+    ap.add_argument('--quick', action='store_true', help='small maps and armies only')
+    ap.add_argument('-k', '--only', action='append', help='run cases whose name contains this text (repeatable)')
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--max-seconds', type=float, default=2.0, help='time budget per case when choosing repeats')
+    ap.add_argument('--compare', metavar='BASELINE', help='compare against a previous results JSON')
+    ap.add_argument('--current', metavar='RESULTS', help='with --compare: use this results JSON instead of running')
+    ap.add_argument('--threshold', type=float, default=1.25, help='flag cases slower than baseline by this factor')
+    args = ap.parse_args(argv)
+
+    if args.current:
+        with open(args.current, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    else:
+        from core.backend import get_backend
+        data = {
+            'meta': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'backend': get_backend(),
+                'seed': SEED,
+                'quick': args.quick,
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': run(args.quick, args.only, args.repeat, args.max_seconds),
+        }
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        rows, regressions = compare(base['results'], data['results'], args.threshold)
+        for key, b, n, ratio in rows:
+            flag = '  REGRESSION' if key in regressions else ''
+            print(f'{key:<48} {b * 1000:10.3f} -> {n * 1000:10.3f} ms  x{ratio:5.2f}{flag}')
+        print(f'{len(rows)} compared, {len(regressions)} regressions (threshold x{args.threshold})')
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
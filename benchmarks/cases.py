@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core.state import GameState
+from simulation.loop import SimulationLoop
+from ai.policy import SimplePolicy, TwoPhasePolicy
+from ai.unit_policies import CompositePolicy
+
+MAP_SIZES = [(40, 20), (100, 50), (200, 100), (400, 200)]
+ARMY_SIZES = [10, 100, 500, 2000]
+QUICK_MAP_SIZES = [(40, 20), (100, 50)]
+QUICK_ARMY_SIZES = [10, 100]
+# 军队最多占可走格的比例，超过则跳过该组合（例如 40x20 放不下 2000 个单位）
+MAX_FILL = 0.25
+SEED = 1234
+
+POLICIES = {
+    'simple': SimplePolicy,
+    'twophase': TwoPhasePolicy,
+    'composite': CompositePolicy,
+}
+
+def build_state(width, height, seed=SEED):
+    return GameState(width, height, seed=seed)
+
+def populate(state, n, seed=SEED):
+    """Place n units (alternating teams and kinds) on random free walkable cells."""
+    rng = random.Random(seed)
+    m = state.map
+    bases = {state.base_a.pos(), state.base_b.pos()}
+    cells = [(x, y) for y in range(m.height) for x in range(m.width) if m.can_walk(x, y) and (x, y) not in bases]
+    rng.shuffle(cells)
+    kinds = ['Infantry', 'Archer', 'Scout']
+    for i, pos in enumerate(cells[:n]):
+        state.add_unit(state.spawn_unit('AB'[i % 2], pos, kinds[i % 3]))
+    return state
+
+def fits(width, height, army):
+    return army <= width * height * MAX_FILL
+
+def make_loop(width, height, army, policy='simple'):
+    loop = SimulationLoop(POLICIES[policy](), None, initial_state=populate(build_state(width, height), army))
+    loop._refresh_visibility()
+    return loop
+
+# 每个用例：setup(w, h, army) 返回一个无参可调用对象，只计时该调用；setup 不计时
+def case_state_init(w, h, army):
+    return lambda: build_state(w, h)
+
+def case_visibility(w, h, army):
+    loop = make_loop(w, h, army)
+    return lambda: loop._compute_visibility('A')
+
+def case_collect_actions(policy):
+    def setup(w, h, army):
+        loop = make_loop(w, h, army, policy)
+        # 第一次调用会填充策略与地图的缓存，先预热
+        loop.collect_actions()
+        return loop.collect_actions
+    return setup
+
+def case_resolve_movements(w, h, army):
+    # 每次计时都在新的局面上结算，避免单位已经移动过
+    template = make_loop(w, h, army).state.serialize()
+    def run():
+        loop = SimulationLoop(SimplePolicy(), None, initial_state=GameState.deserialize(template))
+        loop._refresh_visibility()
+        actions = loop.collect_actions()
+        return loop, actions
+    prepared = []
+    def bench():
+        loop, actions = prepared.pop() if prepared else run()
+        loop.resolve_movements(actions)
+    bench.prepare = lambda: prepared.append(run())
+    return bench
+
+def case_serialize(w, h, army):
+    # 快照按 (tick, 变更计数) 缓存：每次计时前让缓存失效，测的是重建 + 编码
+    state = make_loop(w, h, army).state
+    def invalidate():
+        state.mutations += 1
+    bench = lambda: state.snapshot_bytes()
+    bench.prepare = invalidate
+    return bench
+
+def case_checksum(w, h, army):
+    state = make_loop(w, h, army).state
+    return state.get_checksum
+
+def case_step(w, h, army):
+    loop = make_loop(w, h, army, 'composite')
+    return loop.step
+
+# (名称, setup, 是否依赖军队规模)
+CASES = [
+    ('state_init', case_state_init, False),
+    ('visibility', case_visibility, True),
+    ('collect_actions[simple]', case_collect_actions('simple'), True),
+    ('collect_actions[twophase]', case_collect_actions('twophase'), True),
+    ('collect_actions[composite]', case_collect_actions('composite'), True),
+    ('resolve_movements', case_resolve_movements, True),
+    ('serialize', case_serialize, True),
+    ('checksum', case_checksum, True),
+    ('step', case_step, True),
+]
@@ -1,5 +1,4 @@
 from core.balance import UNIT_COSTS
-import random
 
 class ISpawnStrategy:
     def choose_units(self, points, team, state):
@@ -9,8 +8,9 @@ class RandomSpawnStrategy(ISpawnStrategy):
     def choose_units(self, points, team, state):
         kinds = []
         options = list(UNIT_COSTS.items())
+        rng = state.rng.stream('spawn')
         while points >= min(UNIT_COSTS.values()):
-            k, c = random.choice(options)
+            k, c = rng.choice(options)
             if c <= points:
                 kinds.append(k)
                 points -= c
@@ -19,7 +19,7 @@ class RandomSpawnStrategy(ISpawnStrategy):
                 cheaper = [kk for kk, cc in options if cc <= points]
                 if not cheaper:
                     break
-                k = random.choice(cheaper)
+                k = rng.choice(cheaper)
                 kinds.append(k)
                 points -= UNIT_COSTS[k]
         return kinds
@@ -5,6 +5,10 @@ class UnitPolicy(DecisionPolicy):
     pass
 
 class ScoutPolicy(UnitPolicy):
+    # mode: 'farthest' 前往离己方基地最远的可走格；'frontier' 前往未探索且未被队友认领的最远格
+    def __init__(self, mode='farthest'):
+        self.mode = mode
+
     def decide(self, unit, gamestate):
         other_base = gamestate.base_b if unit.team == 'A' else gamestate.base_a
         if hex_distance(unit.pos(), other_base.pos()) <= unit.vision:
@@ -15,25 +19,18 @@ class ScoutPolicy(UnitPolicy):
                 return Action('attack', other_base)
             return Action('move_towards', known)
         # 探索更远点
-        home = gamestate.base_a if unit.team == 'A' else gamestate.base_b
-        best = None; best_d = -1
-        for y in range(gamestate.map.height):
-            for x in range(gamestate.map.width):
-                if gamestate.map.can_walk(x, y):
-                    d = hex_distance(home.pos(), (x, y))
-                    if d > best_d:
-                        best_d = d; best = (x, y)
+        best = None
+        if self.mode == 'frontier':
+            best = gamestate.frontier_target(unit)
+        if best is None:
+            targets = gamestate.exploration_targets(unit.team)
+            best = targets[0] if targets else None
         return Action('move_towards', best or unit.pos())
 
 class InfantryPolicy(UnitPolicy):
     def decide(self, unit, gamestate):
         # 最近目标优先
-        tgt = None; md = 10**9
-        for e in gamestate.units + [gamestate.base_a, gamestate.base_b]:
-            if getattr(e, 'team', unit.team) != unit.team:
-                d = hex_distance(unit.pos(), e.pos())
-                if d < md:
-                    md = d; tgt = e
+        tgt, md = gamestate.nearest_enemy(unit)
         if tgt and md <= unit.rng:
             return Action('attack', tgt)
         if tgt:
@@ -42,12 +39,7 @@ class InfantryPolicy(UnitPolicy):
 
 class ArcherPolicy(UnitPolicy):
     def decide(self, unit, gamestate):
-        tgt = None; md = 10**9
-        for e in gamestate.units + [gamestate.base_a, gamestate.base_b]:
-            if getattr(e, 'team', unit.team) != unit.team:
-                d = hex_distance(unit.pos(), e.pos())
-                if d < md:
-                    md = d; tgt = e
+        tgt, md = gamestate.nearest_enemy(unit)
         if tgt and md <= unit.rng:
             return Action('attack', tgt)
         if tgt:
@@ -56,9 +48,9 @@ class ArcherPolicy(UnitPolicy):
         return Action('wander')
 
 class CompositePolicy(DecisionPolicy):
-    def __init__(self):
+    def __init__(self, scout_mode='farthest'):
         self._policies = {
-            'Scout': ScoutPolicy(),
+            'Scout': ScoutPolicy(scout_mode),
             'Infantry': InfantryPolicy(),
             'Archer': ArcherPolicy(),
         }
@@ -0,0 +1,153 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+# Add src directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from simulation.loop import SimulationLoop
+from core.state import GameState
+from ai.policy import SimplePolicy, TwoPhasePolicy
+from ai.unit_policies import CompositePolicy
+
+POLICIES = {
+    'simple': SimplePolicy,
+    'twophase': TwoPhasePolicy,
+    'composite': CompositePolicy,
+    'composite-frontier': lambda: CompositePolicy(scout_mode='frontier'),
+}
+
+FIELDS = ['seed', 'map', 'width', 'height', 'policy', 'winner', 'ticks',
+          'units_a', 'units_b', 'base_a_hp', 'base_b_hp', 'seconds']
+
+def winner_of(state):
+    a = state.base_a.hp <= 0
+    b = state.base_b.hp <= 0
+    if a and b:
+        return 'draw'
+    if a:
+        return 'B'
+    if b:
+        return 'A'
+    return None
+
+def play_game(job):
+    """Run one headless EVE game and return its result row."""
+    seed = job['seed']
+    t = time.perf_counter()
+    if job.get('map'):
+        with open(job['map'], 'r', encoding='utf-8') as f:
+            state = GameState.deserialize(json.load(f), seed=seed)
+    else:
+        state = GameState(job['width'], job['height'], seed=seed)
+    loop = SimulationLoop(POLICIES[job['policy']](), None, initial_state=state)
+    while state.tick < job['max_ticks']:
+        if not loop.step():
+            break
+    return {
+        'seed': seed,
+        'map': job.get('map') and os.path.basename(job['map']),
+        'width': state.map.width,
+        'height': state.map.height,
+        'policy': job['policy'],
+        'winner': winner_of(state),
+        'ticks': state.tick,
+        'units_a': sum(1 for u in state.units if u.team == 'A'),
+        'units_b': sum(1 for u in state.units if u.team == 'B'),
+        'base_a_hp': max(0, state.base_a.hp),
+        'base_b_hp': max(0, state.base_b.hp),
+        'seconds': round(time.perf_counter() - t, 4),
+    }
+
+def parse_size(s):
+    w, _, h = s.lower().partition('x')
+    return int(w), int(h)
+
+def collect_maps(paths):
+    maps = []
+    for p in paths:
+        if os.path.isdir(p):
+            maps.extend(sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith('.json')))
+        else:
+            maps.append(p)
+    return maps
+
+def make_jobs(args):
+    # 每局一个种子；指定地图文件时轮流使用，否则按种子在给定尺寸中选择
+    maps = collect_maps(args.maps or [])
+    sizes = [parse_size(s) for s in (args.size or ['60x30'])]
+    jobs = []
+    for i in range(args.games):
+        seed = args.seed + i
+        job = {'seed': seed, 'policy': args.policy, 'max_ticks': args.max_ticks}
+        if maps:
+            job['map'] = maps[i % len(maps)]
+        else:
+            job['width'], job['height'] = sizes[random.Random(seed).randrange(len(sizes))]
+        jobs.append(job)
+    return jobs
+
+class ResultWriter:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.f = open(path, 'w', encoding='utf-8', newline='') if path and path != '-' else sys.stdout
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.f, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv is not None:
+            self.csv.writerow(row)
+        else:
+            self.f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.f.flush()
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Run many headless AI-vs-AI games in parallel')
+    ap.add_argument('-n', '--games', type=int, default=100)
+    ap.add_argument('--seed', type=int, default=0, help='first seed; game i uses seed + i')
+    ap.add_argument('--maps', nargs='*', help='map JSON files or directories (cycled)')
+    ap.add_argument('--size', action='append', help='random map size WxH, repeatable (default 60x30)')
+    ap.add_argument('--policy', choices=sorted(POLICIES), default='composite')
+    ap.add_argument('--max-ticks', type=int, default=1000)
+    ap.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('-o', '--out', default='-', help='output file (.jsonl or .csv), - for stdout')
+    ap.add_argument('--format', choices=['jsonl', 'csv'])
+    args = ap.parse_args(argv)
+    fmt = args.format or ('csv' if args.out.lower().endswith('.csv') else 'jsonl')
+
+    jobs = make_jobs(args)
+    writer = ResultWriter(args.out, fmt)
+    wins = {'A': 0, 'B': 0, 'draw': 0, None: 0}
+    t = time.perf_counter()
+    try:
+        if args.workers <= 1:
+            results = map(play_game, jobs)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(args.workers)
+            results = pool.imap_unordered(play_game, jobs)
+        for row in results:
+            writer.write(row)
+            wins[row['winner']] += 1
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - t
+    n = len(jobs)
+    print(f'{n} games in {elapsed:.1f}s ({n / elapsed if elapsed > 0 else 0:.2f} games/s, {args.workers} workers); '
+          f"wins A {wins['A']} / B {wins['B']} / draw {wins['draw']} / unfinished {wins[None]}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
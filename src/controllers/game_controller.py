@@ -1,5 +1,6 @@
 import os
 import json
+import random
 import pygame
 import threading
 from src.eve.config import get_eve_menu_buttons
@@ -15,6 +16,7 @@ from src.views.pygame_view import Button
 from src.utils.common import hex_neighbors, hex_distance, get_local_ip
 from src.core.balance import UNIT_STATS, UNIT_COSTS
 from src.ai.policy import Action
+from src.simulation.worker import SimulationWorker
 from src.core.state import GameState
 
 class GameController:
@@ -55,6 +57,12 @@ class GameController:
         self.input_ip = '127.0.0.1'
         self.is_host = False
         self.connection_status = ''
+        # 上次绘制的菜单画面 key；悬停、文字、画面都没变时不重画不 flip
+        self._menu_drawn = None
+        # 模拟线程模式（F4 切换，或设置环境变量 RTS_SIM_THREAD=1）：连续模式下模拟在独立线程按固定
+        # tick 率推进，渲染只画最新快照并在两 tick 之间插值单位位置
+        self.threaded_sim = bool(os.environ.get('RTS_SIM_THREAD'))
+        self.worker = None
 
 
     def reset_runtime(self):
@@ -73,6 +81,11 @@ class GameController:
         if event.type == pygame.QUIT:
             self.renderer.running = False
             return
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            # 窗口重新露出：下一帧整屏重画
+            self.renderer.invalidate()
+            self._menu_drawn = None
+            return
         if event.type == pygame.KEYDOWN:
             uni = (event.unicode or '').lower()
             if self.state_view == 'MENU_ROOT':
@@ -115,6 +128,13 @@ class GameController:
                     self.renderer.step_mode = self.step_mode
                 elif event.key == pygame.K_n or uni == 'n':
                     self.do_step = True
+                elif event.key == pygame.K_F3:
+                    # 切换分阶段计时显示
+                    self.loop.enable_profiling(not self.loop.profiler.enabled)
+                elif event.key == pygame.K_F4:
+                    self.threaded_sim = not self.threaded_sim
+                    w, h = self.renderer.screen.get_size()
+                    self.view.push_feed(self.renderer, '模拟线程 ' + ('开' if self.threaded_sim else '关'), w - 10, 6)
             elif self.state_view == 'PVP_HOST_MAP':
                 # Handled in main draw loop
                 pass
@@ -597,26 +617,16 @@ class GameController:
             try:
                 # Need to pass map config to server
                 map_config = {}
-                # 为了保证PVP地图绝对一致，主机先生成地图并序列化发送
-                # Create a temporary state to generate the map
-                temp_seed = int(pygame.time.get_ticks())
-                import random
-                random.seed(temp_seed)
-                
                 if self.pending_start_mode == 'random':
-                    # 生成随机地图并序列化
-                    temp_state = GameState() 
-                    map_data = temp_state.serialize()
-                    # 只传输地图数据部分，减少包大小（其实GameState.deserialize主要看map）
-                    # 但为了兼容现有逻辑，我们发送完整序列化数据作为 'data'
-                    map_config = {'mode': 'file', 'data': map_data}
+                    # 随机地图只发送种子：双方用同一种子在本地生成完全相同的地图与随机流
+                    map_config = {'mode': 'random', 'seed': random.SystemRandom().randrange(1 << 63)}
                 elif self.pending_start_mode == 'file' and self.pending_map_path:
                     try:
                         with open(self.pending_map_path, 'r', encoding='utf-8') as f:
                             data = json.load(f)
-                            map_config = {'mode': 'file', 'data': data}
+                            map_config = {'mode': 'file', 'data': data, 'seed': random.SystemRandom().randrange(1 << 63)}
                     except:
-                         map_config = {'mode': 'random'}
+                         map_config = {'mode': 'random', 'seed': random.SystemRandom().randrange(1 << 63)}
                 
                 self.server = GameServer(host='0.0.0.0', port=5000)
                 # Set map config
@@ -637,6 +647,8 @@ class GameController:
             # Join as Client
             self.client = GameClient()
             if self.client.connect(self.input_ip, 5000):
+                # 连到多房间服务器（RoomServer）时快速匹配进房间；单局 GameServer 忽略此消息
+                self.client.join_room()
                 self.connection_status = '已连接，等待游戏开始...'
                 self._wait_for_pvp_start()
             else:
@@ -671,22 +683,12 @@ class GameController:
                     
                     if config.get('mode') == 'random':
                         # Use transmitted seed to ensure deterministic generation
-                        seed = config.get('seed')
-                        if seed is not None:
-                            import random
-                            random.seed(seed)
-                            # Re-import generate to ensure it uses the seeded random
-                            # Actually random module is global, so just seeding is enough 
-                            # IF generate uses random module.
-                            # Let's check state generation.
-                            # Assuming GameState init uses random.
-                            pass
-                        initial_state = GameState() # Will generate map
+                        initial_state = GameState(seed=config.get('seed'))
                     elif config.get('mode') == 'file':
-                        # Use transmitted map data
+                        # Use transmitted map data; both peers share the host's seed for the RNG streams
                         map_data = config.get('data')
                         if map_data:
-                            initial_state = GameState.deserialize(map_data)
+                            initial_state = GameState.deserialize(map_data, seed=config.get('seed'))
                     
                     # Fallback if initialization failed
                     if not initial_state:
@@ -724,6 +726,8 @@ class GameController:
         self.renderer.preview_recruits = list(getattr(self.loop, 'player_recruits', []))
         self.renderer.preview_actions = dict(getattr(self.loop, 'player_actions', {}))
         
+        self.renderer.profile_lines = self.loop.profiler.summary_lines()
+
         # Inject waiting state to renderer for UI update
         if isinstance(self.loop, PVPGameLoop):
             self.renderer.is_waiting_pvp = self.loop.waiting_for_server
@@ -732,7 +736,10 @@ class GameController:
             self.renderer.is_waiting_pvp = False
             self.renderer.pvp_error = None
             
-        if self.step_mode:
+        if self.threaded_sim and not self.step_mode and not isinstance(self.loop, PVPGameLoop):
+            cont = self._tick_threaded()
+        elif self.step_mode:
+            self._stop_worker()
             # PVP模式下，如果正在等待服务器响应，强制执行step以轮询网络消息
             force_step = False
             if isinstance(self.loop, PVPGameLoop) and self.loop.waiting_for_server:
@@ -747,6 +754,7 @@ class GameController:
                 self.renderer.render(self.loop.state, self.loop.state.tick)
                 cont = True
         else:
+            self._stop_worker()
             if self.paused:
                 self.renderer.render(self.loop.state, self.loop.state.tick)
                 cont = True
@@ -770,41 +778,90 @@ class GameController:
         if not cont:
             self.state_view = 'GAMEOVER'
 
+    def _tick_threaded(self):
+        # 模拟线程推进状态；这里只取最新快照渲染，输入处理不会被慢 step 卡住
+        if self.worker is not None and self.worker.loop is not self.loop:
+            self._stop_worker()
+        if self.worker is None:
+            self.worker = SimulationWorker(self.loop)
+            self.worker.start()
+        self.worker.paused = self.paused
+        self.worker.tick_rate = self.renderer.fps * self.speed
+        frame, prev, alpha = self.worker.latest()
+        self.renderer.interp = (prev.positions, alpha) if prev is not None else None
+        self.renderer.render(frame, frame.tick)
+        return not self.worker.finished
+
+    def _stop_worker(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+            self.renderer.interp = None
+
     def run(self):
         while self.renderer.running:
             mx, my = pygame.mouse.get_pos()
             self.view.update_hover(self.renderer, mx, my, self.select_buttons)
             for event in pygame.event.get():
-                self.handle_event(event)
+                if self.worker is not None:
+                    # 模拟线程运行中：输入对状态的修改与 step 互斥
+                    with self.worker.loop.lock:
+                        self.handle_event(event)
+                else:
+                    self.handle_event(event)
+            redraw = True
+            if self.state_view != 'RUNNING':
+                self._stop_worker()
+                # 菜单直接画在屏幕上，回到对局时要整帧重画
+                self.renderer.invalidate()
+                key = self._menu_key()
+                redraw = key != self._menu_drawn
+                self._menu_drawn = key
+            else:
+                self._menu_drawn = None
             if self.state_view in ('MENU_ROOT','MENU_EVE','MENU_PVE','MENU_PVP','PVP_HOST_MAP','PVP_TEAM_SELECT'):
-                self.view.draw_menu(self.renderer)
-                pygame.display.flip()
+                if redraw:
+                    self.view.draw_menu(self.renderer)
+                    pygame.display.flip()
             elif self.state_view == 'PVP_CONNECT':
-                 self.view.draw_menu(self.renderer)
-                 # Draw IP input
-                 font = self.renderer.font
-                 label = font.render(f"IP: {self.input_ip}", True, (255, 255, 255))
-                 status = font.render(self.connection_status, True, (200, 200, 200))
-                 w, h = self.renderer.screen.get_size()
-                 self.renderer.screen.blit(label, (w//2 - label.get_width()//2, 140))
-                 self.renderer.screen.blit(status, (w//2 - status.get_width()//2, 380))
-                 pygame.display.flip()
+                 if redraw:
+                     self.view.draw_menu(self.renderer)
+                     # Draw IP input
+                     font = self.renderer.font
+                     label = font.render(f"IP: {self.input_ip}", True, (255, 255, 255))
+                     status = font.render(self.connection_status, True, (200, 200, 200))
+                     w, h = self.renderer.screen.get_size()
+                     self.renderer.screen.blit(label, (w//2 - label.get_width()//2, 140))
+                     self.renderer.screen.blit(status, (w//2 - status.get_width()//2, 380))
+                     pygame.display.flip()
                  # Check for start signal here too, as main loop might not update tick_step in menu modes
                  if self.pending_start_mode == 'pvp_start':
                      self.tick_step()
             elif self.state_view == 'TEAM_SELECT':
-                self.view.draw_menu(self.renderer)
-                pygame.display.flip()
+                if redraw:
+                    self.view.draw_menu(self.renderer)
+                    pygame.display.flip()
             elif self.state_view == 'MAP_SELECT':
-                self.view.draw_select(self.renderer, self.select_buttons)
-                pygame.display.flip()
+                if redraw:
+                    self.view.draw_select(self.renderer, self.select_buttons)
+                    pygame.display.flip()
             elif self.state_view == 'RUNNING':
                 self.tick_step()
             elif self.state_view == 'GAMEOVER':
-                self.view.draw_gameover(self.renderer, self.loop.state)
-                pygame.display.flip()
+                if redraw:
+                    self.view.draw_gameover(self.renderer, self.loop.state)
+                    pygame.display.flip()
             self.view.update_feed(self.renderer)
             self.renderer.clock.tick(self.renderer.fps)
+        self._stop_worker()
+
+    def _menu_key(self):
+        # 菜单画面由画面类型、按钮（文字/悬停/选中）和输入文字决定
+        buttons = self.view.menu_buttons + self.view.gameover_buttons + self.select_buttons
+        return (self.state_view, self.renderer.screen.get_size(), self.view.menu_title,
+                tuple((b.label, b.hover, b.selected) for b in buttons),
+                getattr(self.view, 'pvp_error', None), self.input_ip, self.connection_status,
+                id(self.loop.state), self.loop.state.tick)
 
     def _open_recruit_panel(self):
         # 高亮基地周围可放置格
@@ -844,10 +901,11 @@ class GameController:
         self.renderer.ui_highlights = hl
         self.renderer.path_preview = []
         # 目标列表（攻击范围内）
-        targets = []
-        for e in self.loop.state.units + [self.loop.state.base_a, self.loop.state.base_b]:
-            if getattr(e, 'team', unit.team) != unit.team and hex_distance(unit.pos(), e.pos()) <= unit.rng:
-                targets.append(e)
+        st = self.loop.state
+        targets = st.enemies_within(unit.pos(), unit.rng, unit.team)
+        for b in (st.base_a, st.base_b):
+            if b.team != unit.team and hex_distance(unit.pos(), b.pos()) <= unit.rng:
+                targets.append(b)
         self.unit_mode = getattr(self, 'unit_mode', 'move')
         self.renderer.panel = {'type':'unit','title':'单位操作','unit':unit, 'max_hp': unit.hp, 'targets': targets, 'selected_mode': self.unit_mode}
 
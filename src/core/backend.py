@@ -0,0 +1,26 @@
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 运行时可选的计算后端：'numpy'（需安装 numpy）或纯 Python 'python'
+# 默认有 numpy 则用 numpy，可用环境变量 RTS_BACKEND=python 强制回退
+_backend = 'python'
+if np is not None and os.environ.get('RTS_BACKEND', 'numpy').lower() != 'python':
+    _backend = 'numpy'
+
+def get_backend():
+    return _backend
+
+def set_backend(name):
+    global _backend
+    if name not in ('numpy', 'python'):
+        raise ValueError(f'unknown backend: {name}')
+    if name == 'numpy' and np is None:
+        raise ValueError('numpy backend requested but numpy is not installed')
+    _backend = name
+
+def use_numpy():
+    return _backend == 'numpy'
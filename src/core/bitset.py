@@ -0,0 +1,101 @@
+class CellBitset:
+    """
+    Fixed-size set of map cells, one bit per cell at index y*width+x.
+    Backed by a bytearray so membership is O(1); union and popcount go
+    through Python ints, i.e. word-level operations in C.
+    Iteration yields (x, y) tuples in index (row-major) order.
+    """
+    __slots__ = ('width', 'height', 'data')
+
+    def __init__(self, width, height, data=None):
+        self.width = width
+        self.height = height
+        nbytes = (width * height + 7) >> 3
+        self.data = bytearray(nbytes) if data is None else bytearray(data)
+
+    @classmethod
+    def from_cells(cls, width, height, cells):
+        bs = cls(width, height)
+        bs.update(cells)
+        return bs
+
+    @classmethod
+    def from_int(cls, width, height, bits):
+        bs = cls(width, height)
+        bs.set_int(bits)
+        return bs
+
+    def as_int(self):
+        return int.from_bytes(self.data, 'little')
+
+    def set_int(self, bits):
+        self.data[:] = bits.to_bytes(len(self.data), 'little')
+
+    def __contains__(self, cell):
+        x, y = cell
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        i = y * self.width + x
+        return bool(self.data[i >> 3] & (1 << (i & 7)))
+
+    def add(self, cell):
+        x, y = cell[0], cell[1]
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = y * self.width + x
+            self.data[i >> 3] |= 1 << (i & 7)
+
+    def update(self, cells):
+        # 同尺寸位集直接按字合并，其他可迭代对象逐格写入
+        # （按属性判断而非 isinstance：src.core 与 core 两种导入路径会得到不同的类对象）
+        if hasattr(cells, 'as_int') and cells.width == self.width and cells.height == self.height:
+            self.set_int(self.as_int() | cells.as_int())
+            return
+        w = self.width
+        h = self.height
+        data = self.data
+        for c in cells:
+            x, y = c[0], c[1]
+            if 0 <= x < w and 0 <= y < h:
+                i = y * w + x
+                data[i >> 3] |= 1 << (i & 7)
+
+    def copy(self):
+        return CellBitset(self.width, self.height, self.data)
+
+    def __or__(self, other):
+        res = self.copy()
+        res.update(other)
+        return res
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __len__(self):
+        return bin(self.as_int()).count('1')
+
+    def __bool__(self):
+        return any(self.data)
+
+    def __iter__(self):
+        w = self.width
+        for bi, byte in enumerate(self.data):
+            if not byte:
+                continue
+            base = bi << 3
+            for bit in range(8):
+                if byte & (1 << bit):
+                    i = base + bit
+                    yield (i % w, i // w)
+
+    def __eq__(self, other):
+        if hasattr(other, 'as_int'):
+            return self.width == other.width and self.height == other.height and self.data == other.data
+        if isinstance(other, (set, frozenset)):
+            return set(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'CellBitset({self.width}x{self.height}, {len(self)} cells)'
@@ -23,6 +23,8 @@ class Unit:
         self.hp = hp
         self.armor = armor
         self.vision = vision
+        # 由 GameState.add_unit 分配的稳定编号，决定同距离目标的先后
+        self.uid = None
 
     def pos(self):
         return self.x, self.y
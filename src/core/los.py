@@ -0,0 +1,39 @@
+from utils.common import oddr_to_cube, hex_line
+
+# 视线偏移表缓存：{(radius, row_parity, q_parity): [(dx, dy, ((ix, iy), ...)), ...]}
+_TABLES = {}
+
+def _build_table(radius, row_parity, q_parity):
+    # 以满足奇偶条件的原点 (q_parity, row_parity) 构建，结果为相对偏移
+    ox, oy = q_parity, row_parity
+    ocx, ocy, ocz = oddr_to_cube(ox, oy)
+    entries = []
+    for dq in range(-radius, radius + 1):
+        lo = max(-radius, -dq - radius)
+        hi = min(radius, -dq + radius)
+        for dr in range(lo, hi + 1):
+            q = ocx + dq
+            r = ocz + dr
+            tx = q + ((r - (r & 1)) // 2)
+            ty = r
+            line = hex_line((ox, oy), (tx, ty))
+            inter = tuple((lx - ox, ly - oy) for lx, ly in line[1:-1])
+            entries.append((tx - ox, ty - oy, inter))
+    return entries
+
+def los_table(radius, x, y):
+    """
+    Relative LOS table for a viewer at (x, y): a list of (dx, dy, intermediates)
+    for every cell within `radius`, where intermediates are the offsets of the
+    cells hex_line passes through between viewer and target.
+
+    Tables are built once per radius and per origin parity. Row parity alone is
+    not enough: hex_line rounds exact .5 ties to even, so the cube q parity of
+    the origin also changes which cells a line touches.
+    """
+    key = (radius, y & 1, oddr_to_cube(x, y)[0] & 1)
+    table = _TABLES.get(key)
+    if table is None:
+        table = _build_table(radius, key[1], key[2])
+        _TABLES[key] = table
+    return table
@@ -1,14 +1,24 @@
 import random
+from core.backend import np, use_numpy
 
 PLAIN = '.'
 MOUNTAIN = '#'
 RIVER = '~'
 
+# uint8 地形编码（NumPy 后端）
+TERRAIN_CODES = {PLAIN: 0, MOUNTAIN: 1, RIVER: 2}
+
 class Map:
     def __init__(self, width, height):
         self.width = width
         self.height = height
         self.grid = [[PLAIN for _ in range(width)] for _ in range(height)]
+        # 地形版本号：每次通过 set_tile/set_grid 修改地形时递增，用于失效派生缓存
+        self.version = 0
+        self._terrain = None
+        self._terrain_version = -1
+        self._walk = None
+        self._walk_version = -1
 
     def in_bounds(self, x, y):
         return 0 <= x < self.width and 0 <= y < self.height
@@ -16,12 +26,44 @@ class Map:
     def can_walk(self, x, y):
         return self.in_bounds(x, y) and self.grid[y][x] == PLAIN
 
-def generate(width=40, height=20):
-    m = Map(width, height)
-    
-    # 1. Generate Noise for Mountains
-    # Use Perlin-like noise smoothing
-    noise = [[random.random() for _ in range(width)] for _ in range(height)]
+    def set_tile(self, x, y, t):
+        if self.grid[y][x] != t:
+            self.grid[y][x] = t
+            self.version += 1
+
+    def set_grid(self, grid):
+        self.grid = grid
+        self.version += 1
+
+    def terrain_array(self):
+        """uint8 terrain codes (height x width); NumPy backend only, rebuilt when the version changes."""
+        if self._terrain is None or self._terrain_version != self.version:
+            codes = TERRAIN_CODES
+            self._terrain = np.array([[codes.get(c, 0) for c in row] for row in self.grid], dtype=np.uint8)
+            self._terrain_version = self.version
+        return self._terrain
+
+    def walkable_mask(self):
+        if use_numpy():
+            return self.terrain_array() == TERRAIN_CODES[PLAIN]
+        return [[c == PLAIN for c in row] for row in self.grid]
+
+    def walkable_flat(self):
+        """walkable_mask flattened to a list of bools indexed by y*width+x; cached per terrain version."""
+        if self._walk is None or self._walk_version != self.version:
+            mask = self.walkable_mask()
+            # 寻路内循环逐格按下标查，Python 列表比逐元素访问 NumPy 数组快
+            self._walk = mask.ravel().tolist() if use_numpy() else [c for row in mask for c in row]
+            self._walk_version = self.version
+        return self._walk
+
+    def blocker_mask(self):
+        # 阻挡视线的格子（山地）
+        if use_numpy():
+            return self.terrain_array() == TERRAIN_CODES[MOUNTAIN]
+        return [[c == MOUNTAIN for c in row] for row in self.grid]
+
+def _smooth_noise(noise, width, height):
     for _ in range(4): # Increased smoothing passes
         new_noise = [[0.0 for _ in range(width)] for _ in range(height)]
         for y in range(height):
@@ -34,22 +76,73 @@ def generate(width=40, height=20):
                 if y+1 < height: s += noise[y+1][x]; c += 1
                 new_noise[y][x] = s / c
         noise = new_noise
+    return noise
 
-    # 2. Apply Terrain Thresholds (Top Half Only for Central Symmetry)
-    # We process rows 0 to height//2 (exclusive) fully, 
-    # and if height is odd, we'd handle the middle row carefully. 
-    # For simplicity, assuming even height or just processing top half rows.
-    half_h = height // 2
+def _smooth_noise_numpy(noise):
+    # 与纯 Python 版本按相同顺序累加（中、左、右、上、下），保证浮点结果逐位一致
+    n = np.array(noise, dtype=np.float64)
+    cnt = np.ones_like(n)
+    cnt[:, 1:] += 1
+    cnt[:, :-1] += 1
+    cnt[1:, :] += 1
+    cnt[:-1, :] += 1
+    for _ in range(4):
+        s = n.copy()
+        s[:, 1:] += n[:, :-1]
+        s[:, :-1] += n[:, 1:]
+        s[1:, :] += n[:-1, :]
+        s[:-1, :] += n[1:, :]
+        n = s / cnt
+    return n
+
+def _apply_thresholds(m, noise, half_h, rng):
     for y in range(half_h):
-        for x in range(width):
+        for x in range(m.width):
             v = noise[y][x]
             if v > 0.65:
                 m.grid[y][x] = MOUNTAIN
-            elif v > 0.55 and random.random() < 0.4:
+            elif v > 0.55 and rng.random() < 0.4:
                 m.grid[y][x] = MOUNTAIN
             else:
                 m.grid[y][x] = PLAIN
 
+def _apply_thresholds_numpy(m, noise, half_h, rng):
+    top = noise[:half_h]
+    mountain = top > 0.65
+    maybe = (top > 0.55) & ~mountain
+    # 随机数只在 0.55 < v <= 0.65 的格子上按行优先顺序抽取，与纯 Python 版本一致
+    ys, xs = np.nonzero(maybe)
+    if len(ys):
+        draws = np.array([rng.random() for _ in range(len(ys))])
+        mountain[ys, xs] = draws < 0.4
+    for y, row in enumerate(mountain.tolist()):
+        m.grid[y] = [MOUNTAIN if b else PLAIN for b in row]
+
+def generate(width=40, height=20, rng=None):
+    # rng: random.Random 实例（如 GameState 的 'map' 流）；缺省时使用全局 random 模块
+    if rng is None:
+        rng = random
+    m = Map(width, height)
+    
+    # 1. Generate Noise for Mountains
+    # Use Perlin-like noise smoothing
+    noise = [[rng.random() for _ in range(width)] for _ in range(height)]
+    numpy_backend = use_numpy()
+    if numpy_backend:
+        noise = _smooth_noise_numpy(noise)
+    else:
+        noise = _smooth_noise(noise, width, height)
+
+    # 2. Apply Terrain Thresholds (Top Half Only for Central Symmetry)
+    # We process rows 0 to height//2 (exclusive) fully, 
+    # and if height is odd, we'd handle the middle row carefully. 
+    # For simplicity, assuming even height or just processing top half rows.
+    half_h = height // 2
+    if numpy_backend:
+        _apply_thresholds_numpy(m, noise, half_h, rng)
+    else:
+        _apply_thresholds(m, noise, half_h, rng)
+
     # 3. Generate River (Separating Diagonals)
     # Bases are Top-Left and Bottom-Right.
     # River should flow roughly Top-Right to Bottom-Left.
@@ -65,7 +158,7 @@ def generate(width=40, height=20):
         river_start_options.append((width - 1, y))
         
     if river_start_options:
-        cx, cy = random.choice(river_start_options)
+        cx, cy = rng.choice(river_start_options)
         m.grid[cy][cx] = RIVER
         
         # Target is center, but we clamp ny to half_h - 1.
@@ -92,14 +185,14 @@ def generate(width=40, height=20):
             
             if not moves: break
             
-            mdx, mdy = random.choice(moves)
+            mdx, mdy = rng.choice(moves)
             # Occasional random deviation
-            if random.random() < 0.3:
-                mdx, mdy = random.choice([(0,1), (0,-1), (1,0), (-1,0)])
+            if rng.random() < 0.3:
+                mdx, mdy = rng.choice([(0,1), (0,-1), (1,0), (-1,0)])
                 # Clamp direction to not go backwards too much? 
                 # Simplest is just take the optimal move most of the time
                 if dx != 0: mdx = dx; mdy = 0
-                if dy != 0 and random.random() < 0.5: mdx = 0; mdy = dy
+                if dy != 0 and rng.random() < 0.5: mdx = 0; mdy = dy
             
             nx, ny = cx + mdx, cy + mdy
             
@@ -111,7 +204,7 @@ def generate(width=40, height=20):
             m.grid[cy][cx] = RIVER
             
             # Widen randomly
-            if random.random() < 0.2:
+            if rng.random() < 0.2:
                 for wx, wy in [(cx+1, cy), (cx-1, cy), (cx, cy+1), (cx, cy-1)]:
                     if m.in_bounds(wx, wy) and wy < half_h:
                         m.grid[wy][wx] = RIVER
@@ -180,7 +273,7 @@ def generate(width=40, height=20):
     
     if river_cells:
         # Pick a random spot for a flank bridge
-        bx, by = random.choice(river_cells)
+        bx, by = rng.choice(river_cells)
         clear_radius(bx, by, 1)
         # Mirror it
         clear_radius(width - 1 - bx, height - 1 - by, 1)
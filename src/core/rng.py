@@ -0,0 +1,24 @@
+import random
+
+class RngStreams:
+    """
+    Named, independently seeded random.Random streams derived from one game seed
+    ('map', 'spawn', 'movement', ...). Each stream is seeded from the string
+    '<seed>:<name>', so a stream's sequence depends only on the seed and its
+    name, not on how much the other streams were used, and is stable across
+    processes and Python hash randomization.
+    """
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(1 << 63)
+        self.seed = seed
+        self._streams = {}
+
+    def stream(self, name):
+        r = self._streams.get(name)
+        if r is None:
+            r = self._streams[name] = random.Random(f'{self.seed}:{name}')
+        return r
+
+    __getitem__ = stream
+
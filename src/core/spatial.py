@@ -0,0 +1,108 @@
+from utils.common import hex_distance
+
+class SpatialIndex:
+    """
+    Per-team bucket grid over odd-r offset coordinates.
+
+    Hex distance is never smaller than the Chebyshev distance in offset
+    coordinates, so a bucket ring k (k >= 1) around the query bucket cannot hold
+    anything closer than (k - 1) * bucket + 1; searches expand ring by ring and
+    stop as soon as that bound exceeds the best hit. Ties are broken by unit
+    uid, which matches the insertion order of GameState.units.
+    """
+    def __init__(self, bucket=4):
+        self.bucket = bucket
+        self._buckets = {}
+        self._where = {}
+        # 曾出现过的最大桶坐标，限定无半径查询的扩展圈数
+        self._extent = 0
+
+    def _key(self, x, y):
+        return (x // self.bucket, y // self.bucket)
+
+    def clear(self):
+        self._buckets = {}
+        self._where = {}
+        self._extent = 0
+
+    def insert(self, u):
+        key = (u.team,) + self._key(u.x, u.y)
+        self._buckets.setdefault(key, []).append(u)
+        self._where[u] = key
+        self._extent = max(self._extent, abs(key[1]), abs(key[2]))
+
+    def remove(self, u):
+        key = self._where.pop(u, None)
+        if key is None:
+            return
+        lst = self._buckets[key]
+        lst.remove(u)
+        if not lst:
+            del self._buckets[key]
+
+    def update(self, u):
+        # 单位坐标已改变后调用；同一桶内移动无需任何操作
+        key = (u.team,) + self._key(u.x, u.y)
+        if self._where.get(u) != key:
+            self.remove(u)
+            self.insert(u)
+
+    def _ring(self, team, bx, by, k):
+        buckets = self._buckets
+        if k == 0:
+            lst = buckets.get((team, bx, by))
+            if lst:
+                yield from lst
+            return
+        for cx in range(bx - k, bx + k + 1):
+            for cy in (by - k, by + k):
+                lst = buckets.get((team, cx, cy))
+                if lst:
+                    yield from lst
+        for cy in range(by - k + 1, by + k):
+            for cx in (bx - k, bx + k):
+                lst = buckets.get((team, cx, cy))
+                if lst:
+                    yield from lst
+
+    def nearest(self, team, pos, max_radius=None):
+        """Nearest unit of `team` to pos within max_radius: (unit, distance) or (None, None)."""
+        if not self._buckets:
+            return None, None
+        bx, by = self._key(pos[0], pos[1])
+        best = None
+        best_d = None
+        limit = self._extent + max(abs(bx), abs(by))
+        k = 0
+        while k <= limit:
+            if k > 0:
+                bound = (k - 1) * self.bucket + 1
+                if best_d is not None and bound > best_d:
+                    break
+                if max_radius is not None and bound > max_radius:
+                    break
+            for u in self._ring(team, bx, by, k):
+                d = hex_distance(pos, (u.x, u.y))
+                if max_radius is not None and d > max_radius:
+                    continue
+                if best is None or d < best_d or (d == best_d and u.uid < best.uid):
+                    best = u
+                    best_d = d
+            k += 1
+        return best, best_d
+
+    def within(self, team, pos, r):
+        """Units of `team` within hex distance r of pos, in uid order."""
+        x0, y0 = self._key(pos[0] - r, pos[1] - r)
+        x1, y1 = self._key(pos[0] + r, pos[1] + r)
+        res = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                lst = self._buckets.get((team, cx, cy))
+                if not lst:
+                    continue
+                for u in lst:
+                    if hex_distance(pos, (u.x, u.y)) <= r:
+                        res.append(u)
+        res.sort(key=lambda u: u.uid)
+        return res
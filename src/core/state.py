@@ -1,82 +1,311 @@
-import random
+import gzip
 import hashlib
 import json
+import os
+import threading
 from core.entities import Base, Unit
 from core.map import Map, generate
 from core.map import PLAIN
 from utils.common import manhattan, adjacent_positions
 from core.balance import BASE_BUILD_POINTS, UNIT_STATS
+from core.bitset import CellBitset
+from core.spatial import SpatialIndex
+from core.rng import RngStreams
+from utils.common import hex_distance
+
+class _Snapshot:
+    __slots__ = ('key', 'data', 'json', 'gzip')
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+        self.json = None
+        self.gzip = None
 
 class GameState:
-    def __init__(self, width=60, height=30):
-        self.map = generate(width, height)
+    # 调试：每次 get_checksum 都全量重算单位哈希并与增量值比对（或设置环境变量 RTS_CHECKSUM_DEBUG=1）
+    checksum_debug = bool(os.environ.get('RTS_CHECKSUM_DEBUG'))
+
+    def __init__(self, width=60, height=30, seed=None):
+        # 所有随机性来自按名字区分的独立流（'map'、'spawn'、'movement'），同一种子完全复现一局
+        self.rng = RngStreams(seed)
+        self.seed = self.rng.seed
+        self.map = generate(width, height, self.rng.stream('map'))
         self.base_a, self.base_b = self.place_bases()
-        self.units = []
-        self.occupied = set()
+        # 单位按 uid 存放；uid 单调递增，dict 的插入顺序即确定的遍历顺序
+        self._units = {}
+        self._units_list = []
+        self._units_dirty = False
+        # 位置 -> 单位 uid
+        self.occupied = {}
+        self.spatial = SpatialIndex()
+        self._next_uid = 0
+        # Zobrist 式校验：各单位哈希的异或，随单位增删、移动与受伤增量更新
+        self._unit_hashes = {}
+        self._units_hash = 0
+        self._terrain_hash_cache = None
+        # 序列化快照缓存，键为 (tick, 变更计数, 地图, 地图版本)；见 snapshot()
+        self.mutations = 0
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+        self._map_section = None
+        self._unit_views = {}
+        self._explored_views = {}
         self.tick = 0
         self.actions = []
         self.known_enemy_base = {'A': None, 'B': None}
-        self.explored = {'A': set(), 'B': set()}
+        self.explored = {'A': self._new_bitset(), 'B': self._new_bitset()}
         self.ensure_connectivity()
+        # 探索目标缓存：{side: (map, map.version, 基地坐标, 排序后的格子)}；探索认领：{side: {uid: 格子}}
+        self._explore_targets = {}
+        self._explore_claims = {'A': {}, 'B': {}}
+
+    @property
+    def units(self):
+        if self._units_dirty:
+            self._units_list = list(self._units.values())
+            self._units_dirty = False
+        return self._units_list
+
+    @units.setter
+    def units(self, units):
+        self._units = {}
+        self._units_dirty = True
+        self.occupied = {}
+        self.spatial.clear()
+        self._unit_hashes = {}
+        self._units_hash = 0
+        self.mutations += 1
+        for u in units:
+            self.add_unit(u)
+
+    def get_unit(self, uid):
+        return self._units.get(uid)
 
     def update_occupied(self):
-        self.occupied = set(u.pos() for u in self.units)
+        # 全量重建；add/remove/move_unit 已增量维护，这里只用于兼容直接改写 x/y 的旧代码
+        self.occupied = {u.pos(): u.uid for u in self.units}
+        for u in self.units:
+            self.spatial.update(u)
+        self.mutations += 1
+        self._unit_views = {}
 
     def add_unit(self, u):
-        self.units.append(u)
-        self.update_occupied()
+        if u.uid is None or u.uid in self._units:
+            u.uid = self._next_uid
+        self._next_uid = max(self._next_uid, u.uid + 1)
+        self._units[u.uid] = u
+        self._units_dirty = True
+        self.occupied[u.pos()] = u.uid
+        self.spatial.insert(u)
+        self._rehash_unit(u)
+        self.mutations += 1
 
     def remove_unit(self, u):
-        self.units = [x for x in self.units if x is not u]
-        self.update_occupied()
+        if self._units.get(u.uid) is not u:
+            return
+        del self._units[u.uid]
+        self._units_dirty = True
+        pos = u.pos()
+        if self.occupied.get(pos) == u.uid:
+            del self.occupied[pos]
+        self.spatial.remove(u)
+        self._units_hash ^= self._unit_hashes.pop(u.uid, 0)
+        self.mutations += 1
+
+    def remove_units(self, units):
+        for u in units:
+            self.remove_unit(u)
+
+    def move_unit(self, u, x, y):
+        if self._units.get(u.uid) is not u:
+            # 已移除的单位（例如本回合阵亡但仍在行动列表中）只改坐标，不再进入索引与校验
+            u.x = x
+            u.y = y
+            return
+        pos = u.pos()
+        if self.occupied.get(pos) == u.uid:
+            del self.occupied[pos]
+        u.x = x
+        u.y = y
+        self.occupied[(x, y)] = u.uid
+        self.spatial.update(u)
+        self._rehash_unit(u)
+        self.mutations += 1
+
+    def apply_damage(self, target, dmg):
+        # 单位或基地扣血；单位的校验哈希同步更新（死亡单位由调用方移除）
+        target.hp -= dmg
+        self.mutations += 1
+        if getattr(target, 'uid', None) is not None and self._units.get(target.uid) is target:
+            self._rehash_unit(target)
+
+    def nearest_enemy(self, unit, max_radius=None, include_base=True):
+        """
+        Closest enemy of `unit` within max_radius (unbounded if None): (target, distance)
+        or (None, None). Enemy units win ties in uid order; the enemy base is
+        returned only when strictly closer than every enemy unit.
+        """
+        pos = unit.pos()
+        enemy = 'B' if unit.team == 'A' else 'A'
+        radius = max_radius
+        base = None
+        if include_base:
+            base = self.base_b if unit.team == 'A' else self.base_a
+            bd = hex_distance(pos, base.pos())
+            if max_radius is None or bd <= max_radius:
+                radius = bd
+            else:
+                base = None
+        tgt, d = self.spatial.nearest(enemy, pos, radius)
+        if tgt is None and base is not None:
+            return base, bd
+        return tgt, d
+
+    def enemies_within(self, pos, r, team):
+        """Units not on `team` within hex distance r of pos, in uid order."""
+        res = []
+        for side in ('A', 'B'):
+            if side != team:
+                res.extend(self.spatial.within(side, pos, r))
+        return res
 
     def serialize(self):
+        """
+        Full state as plain data. Served from the snapshot cache, so callers share
+        the same dict for a given tick and must not modify it.
+        """
+        return self.snapshot()
+
+    def _snapshot_key(self):
+        return (self.tick, self.mutations, id(self.map), self.map.version)
+
+    def snapshot(self):
+        """
+        Serialized state, rebuilt only when the tick, the mutation counter
+        (unit add/remove/move/damage, explored, known enemy base) or the terrain
+        changes. The map section is cached per terrain version; units whose hash
+        is unchanged reuse their dict from the previous snapshot.
+        """
+        key = self._snapshot_key()
+        with self._snapshot_lock:
+            snap = self._snapshot
+            if snap is None or snap.key != key:
+                snap = self._snapshot = _Snapshot(key, self._build_snapshot())
+            return snap.data
+
+    def snapshot_bytes(self, compressed=False):
+        """The snapshot encoded as JSON bytes (gzip-compressed if `compressed`), encoded once per snapshot."""
+        data = self.snapshot()
+        with self._snapshot_lock:
+            snap = self._snapshot
+            if snap.data is not data:
+                # 另一个线程刚好换了快照：直接编码当前这份
+                snap = _Snapshot(None, data)
+            if snap.json is None:
+                rest = dict(data)
+                del rest['map']
+                # 静态的地图部分只编码一次，拼在前面
+                snap.json = b'{"map": ' + self._map_section[2] + b', ' + json.dumps(rest).encode('utf-8')[1:]
+            if not compressed:
+                return snap.json
+            if snap.gzip is None:
+                snap.gzip = gzip.compress(snap.json, compresslevel=6)
+            return snap.gzip
+
+    def _build_snapshot(self):
+        m = self.map
+        ms = self._map_section
+        if ms is None or ms[0] is not m or ms[1] != m.version:
+            section = {'width': m.width, 'height': m.height, 'grid': m.grid}
+            ms = self._map_section = (m, m.version, json.dumps(section).encode('utf-8'), section)
+        old = self._unit_views
+        views = {}
+        for u in self.units:
+            h = self._unit_hashes.get(u.uid)
+            ent = old.get(u.uid)
+            if ent is None or ent[0] != h:
+                ent = (h, {'id': u.uid, 'team': u.team, 'kind': u.kind, 'x': u.x, 'y': u.y, 'atk': u.atk, 'rng': u.rng, 'spd': u.spd, 'hp': u.hp, 'armor': u.armor, 'vision': u.vision})
+            views[u.uid] = ent
+        self._unit_views = views
+        explored = {}
+        for side in ('A', 'B'):
+            exp = self.explored[side]
+            raw = bytes(exp.data)
+            ent = self._explored_views.get(side)
+            if ent is None or ent[0] != raw:
+                ent = self._explored_views[side] = (raw, sorted(exp))
+            explored[side] = ent[1]
         return {
+            'seed': self.seed,
             'tick': self.tick,
-            'map': {'width': self.map.width, 'height': self.map.height, 'grid': self.map.grid},
+            'map': ms[3],
             'grid_type': 'hex',
             'layout': 'odd-r',
             'bases': [
                 {'team': self.base_a.team, 'x': self.base_a.x, 'y': self.base_a.y, 'hp': self.base_a.hp, 'build_points_per_turn': getattr(self.base_a, 'build_points_per_turn', BASE_BUILD_POINTS), 'build_point_bonus': getattr(self.base_a, 'build_point_bonus', 0)},
                 {'team': self.base_b.team, 'x': self.base_b.x, 'y': self.base_b.y, 'hp': self.base_b.hp, 'build_points_per_turn': getattr(self.base_b, 'build_points_per_turn', BASE_BUILD_POINTS), 'build_point_bonus': getattr(self.base_b, 'build_point_bonus', 0)}
             ],
-            'units': [
-                {'team': u.team, 'kind': u.kind, 'x': u.x, 'y': u.y, 'atk': u.atk, 'rng': u.rng, 'spd': u.spd, 'hp': u.hp, 'armor': u.armor, 'vision': u.vision}
-                for u in self.units
-            ],
-            'known_enemy_base': self.known_enemy_base,
-            'explored': {
-                'A': sorted(list(self.explored['A'])),
-                'B': sorted(list(self.explored['B']))
-            }
+            'units': [ent[1] for ent in views.values()],
+            'known_enemy_base': dict(self.known_enemy_base),
+            'explored': explored,
         }
 
+    @staticmethod
+    def _hash_unit(u):
+        s = f'{u.uid}|{u.team}|{u.kind}|{u.x}|{u.y}|{u.hp}|{u.atk}|{u.rng}|{u.spd}|{u.armor}|{u.vision}'
+        return int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def _rehash_unit(self, u):
+        h = self._hash_unit(u)
+        self._units_hash ^= self._unit_hashes.get(u.uid, 0) ^ h
+        self._unit_hashes[u.uid] = h
+
+    def _terrain_hash(self):
+        # 地形哈希按 map 对象与版本号缓存
+        m = self.map
+        c = self._terrain_hash_cache
+        if c is None or c[0] is not m or c[1] != m.version:
+            h = hashlib.blake2b(f'{m.width}x{m.height}|'.encode('utf-8'), digest_size=8)
+            for row in m.grid:
+                h.update(''.join(row).encode('utf-8'))
+            c = self._terrain_hash_cache = (m, m.version, h.hexdigest())
+        return c[2]
+
+    def verify_checksum(self):
+        """Recompute every unit hash from scratch and fail if the incremental XOR drifted."""
+        full = 0
+        for u in self.units:
+            full ^= self._hash_unit(u)
+        if full != self._units_hash:
+            stale = [u.uid for u in self.units if self._unit_hashes.get(u.uid) != self._hash_unit(u)]
+            raise RuntimeError(f'incremental checksum out of sync at tick {self.tick}; stale units: {stale}')
+        return True
+
     def get_checksum(self):
-        # Serialize state to a stable string and hash it
-        data = self.serialize()
-        
-        # Exclude client-specific view data from checksum to prevent desync
-        # The physical state (Units, Map, Bases) must be identical.
-        # 'explored' and 'known_enemy_base' might differ if they track local player's view only,
-        # or if the simulation doesn't perfectly sync them. 
-        # For P2P lockstep, we assume simulation logic (which uses _vis_cache) is deterministic based on units/map.
-        if 'explored' in data:
-            del data['explored']
-        if 'known_enemy_base' in data:
-            del data['known_enemy_base']
-            
-        # Ensure json dump is deterministic
-        s = json.dumps(data, sort_keys=True)
-        return hashlib.md5(s.encode('utf-8')).hexdigest()
+        """
+        Lockstep state hash. Covers the physical state (terrain, bases, units, tick,
+        seed) but not per-side knowledge (explored, known_enemy_base). Unit hashes
+        are XORed incrementally by add/remove/move_unit and apply_damage, so this
+        is O(1) in the number of units and cells.
+        """
+        if self.checksum_debug:
+            self.verify_checksum()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f'{self.tick}|{self.seed}|{self._terrain_hash()}|{len(self._units)}|{self._units_hash:016x}'.encode('utf-8'))
+        for b in (self.base_a, self.base_b):
+            h.update(f'|{b.team},{b.x},{b.y},{b.hp},{getattr(b, "build_points_per_turn", BASE_BUILD_POINTS)},{getattr(b, "build_point_bonus", 0)}'.encode('utf-8'))
+        return h.hexdigest()
 
     @staticmethod
-    def deserialize(data):
+    def deserialize(data, seed=None):
+        # seed 覆盖存档中的种子（例如地图文件 + 批量模拟的种子）
         mdata = data.get('map', {})
         m = Map(mdata.get('width', 40), mdata.get('height', 20))
         grid = mdata.get('grid')
         if grid:
-            m.grid = grid
-        gs = GameState(m.width, m.height)
+            m.set_grid(grid)
+        gs = GameState(m.width, m.height, seed if seed is not None else data.get('seed'))
         gs.map = m
         bases = data.get('bases', [])
         if len(bases) >= 2:
@@ -85,8 +314,11 @@ class GameState:
             gs.base_a = Base(a.get('team','A'), a.get('x',1), a.get('y',1), a.get('hp',500), build_points_per_turn=a.get('build_points_per_turn', BASE_BUILD_POINTS), build_point_bonus=a.get('build_point_bonus', 0))
             gs.base_b = Base(b.get('team','B'), b.get('x',m.width-2), b.get('y',m.height-2), b.get('hp',500), build_points_per_turn=b.get('build_points_per_turn', BASE_BUILD_POINTS), build_point_bonus=b.get('build_point_bonus', 0))
         gs.units = []
+        gs._next_uid = 0
         for ud in data.get('units', []):
-            gs.units.append(Unit(ud.get('team','A'), ud.get('kind','Infantry'), ud.get('x',0), ud.get('y',0), ud.get('atk',10), ud.get('rng',1), ud.get('spd',1), ud.get('hp',50), ud.get('armor',0), ud.get('vision',6)))
+            u = Unit(ud.get('team','A'), ud.get('kind','Infantry'), ud.get('x',0), ud.get('y',0), ud.get('atk',10), ud.get('rng',1), ud.get('spd',1), ud.get('hp',50), ud.get('armor',0), ud.get('vision',6))
+            u.uid = ud.get('id')
+            gs.add_unit(u)
         gs.tick = data.get('tick', 0)
         keb = data.get('known_enemy_base')
         if isinstance(keb, dict):
@@ -95,30 +327,89 @@ class GameState:
         aexp = exp.get('A', [])
         bexp = exp.get('B', [])
         gs.explored = {
-            'A': set((int(x), int(y)) for x, y in aexp if isinstance(x, int) and isinstance(y, int)),
-            'B': set((int(x), int(y)) for x, y in bexp if isinstance(x, int) and isinstance(y, int))
+            'A': CellBitset.from_cells(m.width, m.height, ((int(x), int(y)) for x, y in aexp if isinstance(x, int) and isinstance(y, int))),
+            'B': CellBitset.from_cells(m.width, m.height, ((int(x), int(y)) for x, y in bexp if isinstance(x, int) and isinstance(y, int)))
         }
-        gs.update_occupied()
+        gs.mutations += 1
         return gs
 
+    def exploration_targets(self, side):
+        """
+        Walkable cells ranked farthest-first from `side`'s base (ties in row-major
+        order). Computed once per map and terrain version.
+        """
+        home = (self.base_a if side == 'A' else self.base_b).pos()
+        ent = self._explore_targets.get(side)
+        if ent is not None and ent[0] is self.map and ent[1] == self.map.version and ent[2] == home:
+            return ent[3]
+        m = self.map
+        ranked = []
+        for y in range(m.height):
+            for x in range(m.width):
+                if m.can_walk(x, y):
+                    ranked.append((-hex_distance(home, (x, y)), y, x))
+        ranked.sort()
+        cells = [(x, y) for _, y, x in ranked]
+        self._explore_targets[side] = (m, m.version, home, cells)
+        return cells
+
+    def frontier_target(self, unit, spread=None):
+        """
+        Farthest unexplored target for `unit` that is not within `spread` (default:
+        the unit's vision) of a cell already claimed by a living teammate. The claim
+        is kept until the cell is reached or explored. Returns None if nothing is left.
+        """
+        side = unit.team
+        claims = self._explore_claims.setdefault(side, {})
+        for uid in [k for k in claims if k not in self._units]:
+            del claims[uid]
+        cur = claims.get(unit.uid)
+        if cur is not None and cur != unit.pos() and not self.is_explored(side, cur[0], cur[1]):
+            return cur
+        spread = unit.vision if spread is None else spread
+        others = [c for uid, c in claims.items() if uid != unit.uid]
+        exp = self.explored.get(side, ())
+        for cell in self.exploration_targets(side):
+            if cell in exp:
+                continue
+            if any(hex_distance(cell, c) <= spread for c in others):
+                continue
+            claims[unit.uid] = cell
+            return cell
+        claims.pop(unit.uid, None)
+        return None
+
     def record_enemy_base(self, side, pos):
-        self.known_enemy_base[side] = pos
+        if self.known_enemy_base.get(side) != pos:
+            self.known_enemy_base[side] = pos
+            self.mutations += 1
+
+    def _new_bitset(self):
+        return CellBitset(self.map.width, self.map.height)
 
     def record_explored(self, side, cells):
-        self.explored.setdefault(side, set())
-        for c in cells:
-            self.explored[side].add((c[0], c[1]))
+        # cells 可以是 CellBitset（按字合并）或任意 (x, y) 可迭代对象
+        exp = self.explored.get(side)
+        if exp is None:
+            exp = self.explored[side] = self._new_bitset()
+        before = exp.as_int()
+        exp.update(cells)
+        if exp.as_int() != before:
+            self.mutations += 1
 
     def is_explored(self, side, x, y):
-        return (x, y) in self.explored.get(side, set())
+        exp = self.explored.get(side)
+        return exp is not None and (x, y) in exp
 
     def get_explored_ratio(self, side):
         total = self.map.width * self.map.height
-        cnt = len(self.explored.get(side, set()))
+        exp = self.explored.get(side)
+        cnt = len(exp) if exp is not None else 0
         return cnt / total if total > 0 else 0.0
 
     def get_explored_cells(self, side):
-        return list(self.explored.get(side, set()))
+        return list(self.explored.get(side, ()))
+
     def ensure_connectivity(self):
         from collections import deque
         from utils.common import hex_neighbors, hex_line
@@ -145,7 +436,7 @@ class GameState:
         if not ok:
             for x, y in hex_line((ax, ay), (bx, by)):
                 if self.map.in_bounds(x, y):
-                    self.map.grid[y][x] = PLAIN
+                    self.map.set_tile(x, y, PLAIN)
 
     def find_open(self, preferred):
         for dx in range(-2, 3):
@@ -172,8 +463,8 @@ class GameState:
         by = self.map.height - 4
         
         # Ensure exact spots are clear (though map gen should handle it)
-        if self.map.in_bounds(ax, ay): self.map.grid[ay][ax] = PLAIN
-        if self.map.in_bounds(bx, by): self.map.grid[by][bx] = PLAIN
+        if self.map.in_bounds(ax, ay): self.map.set_tile(ax, ay, PLAIN)
+        if self.map.in_bounds(bx, by): self.map.set_tile(bx, by, PLAIN)
         
         return Base('A', ax, ay, 500, build_points_per_turn=BASE_BUILD_POINTS), Base('B', bx, by, 500, build_points_per_turn=BASE_BUILD_POINTS)
 
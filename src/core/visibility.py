@@ -0,0 +1,203 @@
+from core.map import MOUNTAIN
+from core.los import los_table
+from core.bitset import CellBitset
+from core.backend import np, use_numpy
+from utils.common import oddr_to_cube
+
+def compute_fov(grid, width, height, origin, radius, reveal_blockers=False):
+    """
+    Ray-fan field of view over the precomputed LOS table for `radius`.
+    A MOUNTAIN on the line (or leaving the map) blocks everything behind it.
+    With reveal_blockers=True the blocking mountain itself counts as seen.
+    """
+    ox, oy = origin
+    vis = set()
+    for dx, dy, inter in los_table(radius, ox, oy):
+        tx = ox + dx
+        ty = oy + dy
+        if not (0 <= tx < width and 0 <= ty < height):
+            continue
+        if (dx or dy) and not reveal_blockers and grid[ty][tx] == MOUNTAIN:
+            continue
+        for ix, iy in inter:
+            lx = ox + ix
+            ly = oy + iy
+            if not (0 <= lx < width and 0 <= ly < height) or grid[ly][lx] == MOUNTAIN:
+                break
+        else:
+            vis.add((tx, ty))
+    return vis
+
+# LOS 表的数组形式（NumPy 后端）：{table_key: (tdx, tdy, idx, idy, valid)}
+_NP_TABLES = {}
+
+def _np_table(radius, x, y):
+    key = (radius, y & 1, oddr_to_cube(x, y)[0] & 1)
+    t = _NP_TABLES.get(key)
+    if t is None:
+        entries = los_table(radius, x, y)
+        k = len(entries)
+        l = max(1, max(len(e[2]) for e in entries))
+        tdx = np.array([e[0] for e in entries], dtype=np.int64)
+        tdy = np.array([e[1] for e in entries], dtype=np.int64)
+        idx = np.zeros((k, l), dtype=np.int64)
+        idy = np.zeros((k, l), dtype=np.int64)
+        valid = np.zeros((k, l), dtype=bool)
+        for i, e in enumerate(entries):
+            for j, (ix, iy) in enumerate(e[2]):
+                idx[i, j] = ix
+                idy[i, j] = iy
+                valid[i, j] = True
+        t = (tdx, tdy, idx, idy, valid)
+        _NP_TABLES[key] = t
+    return t
+
+def _visible_targets_numpy(blockers, key, origins, reveal_blockers):
+    # 同一张 LOS 表的一组视点做一次广播：返回目标坐标 tx/ty 与可见标记 ok，形状 (视点数, 目标数)
+    h, w = blockers.shape
+    ox0, oy0 = origins[0]
+    tdx, tdy, idx, idy, valid = _np_table(key[0], ox0, oy0)
+    o = np.array(origins, dtype=np.int64)
+    ox = o[:, 0, None]
+    oy = o[:, 1, None]
+    tx = ox + tdx
+    ty = oy + tdy
+    ok = (tx >= 0) & (tx < w) & (ty >= 0) & (ty < h)
+    lx = ox[:, :, None] + idx
+    ly = oy[:, :, None] + idy
+    inside = (lx >= 0) & (lx < w) & (ly >= 0) & (ly < h)
+    hit = blockers[np.clip(ly, 0, h - 1), np.clip(lx, 0, w - 1)]
+    ok &= ~(valid & (~inside | hit)).any(axis=2)
+    if not reveal_blockers:
+        own = (tdx == 0) & (tdy == 0)
+        ok &= own | ~blockers[np.clip(ty, 0, h - 1), np.clip(tx, 0, w - 1)]
+    return tx, ty, ok
+
+def _group_by_table(viewers):
+    groups = {}
+    for (ox, oy), rng in viewers:
+        key = (rng, oy & 1, oddr_to_cube(ox, oy)[0] & 1)
+        groups.setdefault(key, []).append((ox, oy))
+    return groups
+
+def visibility_mask_numpy(game_map, viewers, reveal_blockers=False):
+    """
+    Vectorized visibility for many viewers at once: returns a (height, width)
+    bool array. Viewers are grouped by LOS table so each group is a single
+    broadcast over (viewers, targets, intermediates).
+    """
+    blockers = game_map.blocker_mask()
+    seen = np.zeros(blockers.shape, dtype=bool)
+    for key, origins in _group_by_table(viewers).items():
+        tx, ty, ok = _visible_targets_numpy(blockers, key, origins, reveal_blockers)
+        seen[ty[ok], tx[ok]] = True
+    return seen
+
+def fov_masks_numpy(game_map, viewers, reveal_blockers=False):
+    """Per-viewer int bitmasks for a batch of (pos, vision) viewers."""
+    blockers = game_map.blocker_mask()
+    h, w = blockers.shape
+    res = {}
+    for key, origins in _group_by_table(viewers).items():
+        tx, ty, ok = _visible_targets_numpy(blockers, key, origins, reveal_blockers)
+        flat = ty * w + tx
+        for i, pos in enumerate(origins):
+            cells = np.zeros(h * w, dtype=bool)
+            cells[flat[i][ok[i]]] = True
+            res[(pos, key[0])] = _mask_to_int(cells)
+    return res
+
+def _mask_to_int(seen):
+    return int.from_bytes(np.packbits(seen.ravel(), bitorder='little').tobytes(), 'little')
+
+def compute_side_visibility(state, side, include_base=False, reveal_blockers=False, base_vision=6):
+    """
+    Union of the fields of view of every unit of `side` (and its base if include_base).
+    Viewers sharing the same cell and vision radius are traced once.
+    """
+    m = state.map
+    viewers = [(u.pos(), u.vision) for u in state.units if u.team == side]
+    if include_base:
+        base = state.base_a if side == 'A' else state.base_b
+        viewers.append((base.pos(), getattr(base, 'vision', base_vision)))
+    if use_numpy():
+        ys, xs = np.nonzero(visibility_mask_numpy(m, set(viewers), reveal_blockers))
+        return set(zip(xs.tolist(), ys.tolist()))
+    vis = set()
+    done = set()
+    for key in viewers:
+        if key in done:
+            continue
+        done.add(key)
+        pos, rng = key
+        vis |= compute_fov(m.grid, m.width, m.height, pos, rng, reveal_blockers)
+    return vis
+
+class VisibilityTracker:
+    """
+    Incremental per-side visibility. Each viewer's field of view is cached as an
+    int bitmask keyed by (position, vision), so only viewers that moved or
+    spawned are traced again; side visibility is the OR of the current viewers'
+    masks, rebuilt only when the viewer set changed. The cache is dropped when
+    the state's map object changes.
+    """
+    def __init__(self, include_base=False, reveal_blockers=False, base_vision=6, max_cached=4096, batch_min=16):
+        self.include_base = include_base
+        self.reveal_blockers = reveal_blockers
+        self.base_vision = base_vision
+        self.max_cached = max_cached
+        self.batch_min = batch_min
+        self.reset()
+
+    def reset(self, game_map=None):
+        self._map = game_map
+        self._masks = {}
+        self._viewers = {'A': {}, 'B': {}}
+        w = game_map.width if game_map is not None else 0
+        h = game_map.height if game_map is not None else 0
+        self.visible = {'A': CellBitset(w, h), 'B': CellBitset(w, h)}
+
+    def fov_mask(self, pos, vision):
+        key = (pos, vision)
+        bits = self._masks.get(key)
+        if bits is None:
+            m = self._map
+            cells = compute_fov(m.grid, m.width, m.height, pos, vision, self.reveal_blockers)
+            bits = CellBitset.from_cells(m.width, m.height, cells).as_int()
+            self._store(key, bits)
+        return bits
+
+    def _store(self, key, bits):
+        if len(self._masks) >= self.max_cached:
+            # 淘汰最早缓存的条目
+            del self._masks[next(iter(self._masks))]
+        self._masks[key] = bits
+
+    def _prefetch(self, keys):
+        # NumPy 后端下成批计算缺失的视野；单个视点用纯 Python 查表更快
+        missing = [k for k in keys if k not in self._masks]
+        if len(missing) >= self.batch_min:
+            for key, bits in fov_masks_numpy(self._map, missing, self.reveal_blockers).items():
+                self._store(key, bits)
+
+    def update(self, state, side):
+        if state.map is not self._map:
+            self.reset(state.map)
+        current = {}
+        for u in state.units:
+            if u.team == side:
+                current[u] = (u.pos(), u.vision)
+        if self.include_base:
+            base = state.base_a if side == 'A' else state.base_b
+            current[base] = (base.pos(), getattr(base, 'vision', self.base_vision))
+        if current == self._viewers[side]:
+            return self.visible[side]
+        keys = set(current.values())
+        if use_numpy():
+            self._prefetch(keys)
+        bits = 0
+        for key in keys:
+            bits |= self.fov_mask(*key)
+        self._viewers[side] = current
+        self.visible[side] = CellBitset.from_int(self._map.width, self._map.height, bits)
+        return self.visible[side]
@@ -7,6 +7,7 @@ import json
 import math
 import pygame
 from src.core.map import PLAIN, MOUNTAIN, RIVER
+from src.utils.hex_layout import HexLayout
 
 class MapEditor:
     def __init__(self, width=60, height=30, cell_size=24, ui_top=64, pad_x=24, pad_top=24):
@@ -17,6 +18,7 @@ class MapEditor:
         self.ui_top = ui_top
         self.pad_x = pad_x
         self.pad_top = pad_top
+        self.layout = HexLayout(width, height, cell_size, pad_x, ui_top + pad_top)
         self.running = True
         self.current = PLAIN
         self.font = None
@@ -57,29 +59,16 @@ class MapEditor:
         return pygame.font.SysFont(None, size)
 
     def hex_center(self, x, y):
-        cx = self.pad_x + self.cell_size * math.sqrt(3) * (x + 0.5 * (y & 1))
-        cy = self.ui_top + self.pad_top + self.cell_size * 1.5 * y
-        return cx, cy
+        return self.layout.center(x, y)
 
     def pixel_to_hex(self, px, py):
-        ry = (py - (self.ui_top + self.pad_top)) / (1.5 * self.cell_size)
-        y = int(round(ry))
-        if y < 0 or y >= self.height:
-            return None
-        offset = 0.5 * (y & 1) * self.cell_size * math.sqrt(3)
-        rx = (px - self.pad_x - offset) / (self.cell_size * math.sqrt(3))
-        x = int(round(rx))
-        if x < 0 or x >= self.width:
+        x, y = self.layout.pixel_to_hex(px, py)
+        if not self.layout.in_bounds(x, y):
             return None
         return x, y
 
-    def draw_hex(self, cx, cy, color):
-        pts = []
-        for i in range(6):
-            ang = math.pi/180 * (60 * i + 30)
-            px = cx + self.cell_size * math.cos(ang)
-            py = cy + self.cell_size * math.sin(ang)
-            pts.append((px, py))
+    def draw_hex(self, x, y, color):
+        pts = self.layout.corners(x, y)
         pygame.draw.polygon(self.screen, color, pts)
         self.stroke_dashed(pts, (60,60,70), 1)
 
@@ -123,8 +112,7 @@ class MapEditor:
         self.screen.blit(p2, (16, 64))
         for y in range(self.height):
             for x in range(self.width):
-                cx, cy = self.hex_center(x, y)
-                self.draw_hex(cx, cy, self.colors[self.grid[y][x]])
+                self.draw_hex(x, y, self.colors[self.grid[y][x]])
         for side, pos in self.base_pos.items():
             if pos:
                 cx, cy = self.hex_center(pos[0], pos[1])
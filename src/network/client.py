@@ -3,13 +3,18 @@ import threading
 import json
 import queue
 
+from network.protocol import FrameDecoder, ProtocolError, encode, JSON, SUPPORTED
+
 class GameClient:
-    def __init__(self):
+    def __init__(self, binary=True):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.connected = False
         self.team = None
         self.msg_queue = queue.Queue()
         self.running = False
+        # 发送用的线路协议；连接时提出 binary，服务器 welcome 后才切换，否则保持 JSON
+        self.binary = binary
+        self.protocol = JSON
 
     def connect(self, host, port=5000):
         try:
@@ -23,6 +28,8 @@ class GameClient:
             self.recv_thread.daemon = True
             self.recv_thread.start()
             print(f"Client connected to {host}:{port}, receive thread started")
+            if self.binary:
+                self._send({'type': 'hello', 'protocols': list(SUPPORTED)})
             return True
         except Exception as e:
             print(f"Connection error: {e}")
@@ -30,32 +37,29 @@ class GameClient:
 
     def _receive_loop(self):
         print("DEBUG: Receive loop running")
-        buffer = b""
+        decoder = FrameDecoder()
         try:
             while self.running:
                 try:
-                    data = self.sock.recv(4096)
+                    data = self.sock.recv(65536)
                     if not data:
                         print("Connection closed by server")
                         break
                     
                     print(f"DEBUG: Recv {len(data)} bytes")
-                    buffer += data
+                    decoder.feed(data)
                     
                     # Handle potential sticky packets or split packets
-                    while b'\n' in buffer:
-                        line_bytes, rest = buffer.split(b'\n', 1)
-                        buffer = rest
-                        if line_bytes.strip():
-                            try:
-                                line = line_bytes.decode('utf-8')
-                                msg = json.loads(line)
-                                print(f"DEBUG: Client received msg type: {msg.get('type')}")
-                                self._handle_message(msg)
-                            except UnicodeDecodeError as e:
-                                print(f"Decode error: {e}")
-                            except json.JSONDecodeError as e:
-                                print(f"JSON decode error: {e} for line: {line_bytes}")
+                    while True:
+                        try:
+                            msg = decoder.next_message()
+                        except (UnicodeDecodeError, json.JSONDecodeError, ProtocolError) as e:
+                            print(f"Decode error: {e}")
+                            continue
+                        if msg is None:
+                            break
+                        print(f"DEBUG: Client received msg type: {msg.get('type')}")
+                        self._handle_message(msg)
                 except socket.error as e:
                     print(f"Socket error in receive loop: {e}")
                     break
@@ -73,10 +77,22 @@ class GameClient:
         if mtype == 'assign':
             self.team = msg.get('team')
             print(f"Assigned team: {self.team}")
+        elif mtype == 'welcome':
+            self.protocol = msg.get('protocol', JSON)
+            print(f"Wire protocol: {self.protocol}")
         
         # Enqueue all messages for the game loop to process safely
         self.msg_queue.put(msg)
 
+    def join_room(self, room=None, config=None, team=None):
+        """RoomServer only: join (or create) a named room; room None means quick match."""
+        msg = {'type': 'join', 'room': room}
+        if config is not None:
+            msg['config'] = config
+        if team is not None:
+            msg['team'] = team
+        self._send(msg)
+
     def send_actions(self, actions, checksum=None):
         """
         Send local actions to server
@@ -99,11 +115,13 @@ class GameClient:
             
         self._send(payload)
 
+    def send_keyframe(self, turn, state):
+        """Host only: answer a keyframe_request with the serialized state after `turn` turns."""
+        self._send({'type': 'keyframe', 'turn': turn, 'state': state})
+
     def _send(self, msg):
         try:
-            # Append newline as delimiter
-            data = (json.dumps(msg) + '\n').encode('utf-8')
-            self.sock.sendall(data)
+            self.sock.sendall(encode(msg, self.protocol))
         except Exception as e:
             print(f"Send error: {e}")
             self.connected = False
@@ -0,0 +1,256 @@
+import json
+import struct
+
+# 线路协议：
+#   'json' —— 每条消息一行 JSON（旧格式，始终可用）
+#   'bin1' —— 长度前缀帧：MAGIC(1 字节) + 负载长度(4 字节大端) + 紧凑二进制编码的负载
+# JSON 文本不会以 0xB1 开头，因此解码器可以逐帧自动识别两种格式。
+# 客户端连接后发送 {'type': 'hello', 'protocols': [...]}，服务器回复
+# {'type': 'welcome', 'protocol': ...}，此后双方按协商结果发送；未协商时保持 JSON。
+JSON = 'json'
+BIN1 = 'bin1'
+SUPPORTED = (BIN1, JSON)
+MAGIC = 0xB1
+_HEADER = struct.Struct('!BI')
+MAX_FRAME = 64 * 1024 * 1024
+
+# 紧凑编码的类型标记（0x00-0x7f 为非负小整数本身）
+_NONE = 0xc0
+_FALSE = 0xc2
+_TRUE = 0xc3
+_INT = 0xd3
+_FLOAT = 0xcb
+_STR = 0xd9
+_LIST = 0xdc
+_DICT = 0xde
+_GRID = 0xe0
+_Q = struct.Struct('!q')
+_D = struct.Struct('!d')
+
+class ProtocolError(Exception):
+    pass
+
+def _varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _is_char_grid(v):
+    # 地图网格（行列表，每格单字符）按行字符串编码，比逐格编码小得多
+    if not v or not isinstance(v[0], list) or not v[0]:
+        return False
+    for row in v:
+        if not isinstance(row, list):
+            return False
+        for c in row:
+            if not (isinstance(c, str) and len(c) == 1):
+                return False
+    return True
+
+def _pack(out, v):
+    if v is None:
+        out.append(_NONE)
+    elif v is True:
+        out.append(_TRUE)
+    elif v is False:
+        out.append(_FALSE)
+    elif isinstance(v, int):
+        if 0 <= v < 0x80:
+            out.append(v)
+        else:
+            try:
+                b = _Q.pack(v)
+            except struct.error:
+                raise ProtocolError(f'int out of 64-bit range: {v}')
+            out.append(_INT)
+            out += b
+    elif isinstance(v, float):
+        out.append(_FLOAT)
+        out += _D.pack(v)
+    elif isinstance(v, str):
+        b = v.encode('utf-8')
+        out.append(_STR)
+        _varint(out, len(b))
+        out += b
+    elif isinstance(v, dict):
+        out.append(_DICT)
+        _varint(out, len(v))
+        for k, x in v.items():
+            _pack(out, str(k))
+            _pack(out, x)
+    elif isinstance(v, (list, tuple)):
+        if isinstance(v, list) and _is_char_grid(v):
+            out.append(_GRID)
+            _varint(out, len(v))
+            for row in v:
+                b = ''.join(row).encode('utf-8')
+                _varint(out, len(b))
+                out += b
+            return
+        out.append(_LIST)
+        _varint(out, len(v))
+        for x in v:
+            _pack(out, x)
+    else:
+        raise ProtocolError(f'cannot encode {type(v).__name__}')
+
+def _read_varint(buf, i):
+    n = 0
+    shift = 0
+    while True:
+        b = buf[i]
+        i += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+def _unpack(buf, i):
+    t = buf[i]
+    i += 1
+    if t < 0x80:
+        return t, i
+    if t == _NONE:
+        return None, i
+    if t == _TRUE:
+        return True, i
+    if t == _FALSE:
+        return False, i
+    if t == _INT:
+        return _Q.unpack_from(buf, i)[0], i + 8
+    if t == _FLOAT:
+        return _D.unpack_from(buf, i)[0], i + 8
+    if t == _STR:
+        n, i = _read_varint(buf, i)
+        return bytes(buf[i:i + n]).decode('utf-8'), i + n
+    if t == _LIST:
+        n, i = _read_varint(buf, i)
+        res = []
+        for _ in range(n):
+            v, i = _unpack(buf, i)
+            res.append(v)
+        return res, i
+    if t == _DICT:
+        n, i = _read_varint(buf, i)
+        res = {}
+        for _ in range(n):
+            k, i = _unpack(buf, i)
+            v, i = _unpack(buf, i)
+            res[k] = v
+        return res, i
+    if t == _GRID:
+        n, i = _read_varint(buf, i)
+        rows = []
+        for _ in range(n):
+            m, i = _read_varint(buf, i)
+            rows.append(list(bytes(buf[i:i + m]).decode('utf-8')))
+            i += m
+        return rows, i
+    raise ProtocolError(f'unknown tag 0x{t:02x}')
+
+def pack(msg):
+    out = bytearray()
+    _pack(out, msg)
+    return bytes(out)
+
+def unpack(data):
+    # 截断或损坏的负载统一报 ProtocolError，调用方只需处理一种异常
+    try:
+        v, i = _unpack(memoryview(data), 0)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ProtocolError(f'malformed frame: {e}')
+    if i != len(data):
+        raise ProtocolError('trailing bytes in frame')
+    return v
+
+def encode(msg, protocol=JSON):
+    """Serialize one message as a complete frame for `protocol`."""
+    if protocol == BIN1:
+        body = pack(msg)
+        return _HEADER.pack(MAGIC, len(body)) + body
+    return (json.dumps(msg) + '\n').encode('utf-8')
+
+def negotiate(offered):
+    """Server side: pick the first protocol we support from a client's hello list."""
+    for p in offered or ():
+        if p in SUPPORTED:
+            return p
+    return JSON
+
+class FrameDecoder:
+    """
+    Incremental decoder for a byte stream mixing JSON lines and binary frames.
+    Bytes are appended to one bytearray and consumed through a read offset; the
+    consumed prefix is dropped only once it outweighs the unread part, so each
+    byte is copied O(1) times no matter how a message is split across recv()s.
+    A bad message raises only after its bytes are consumed, so the caller can
+    log it and keep reading; an oversized frame is skipped as it arrives.
+    """
+    def __init__(self):
+        self.buf = bytearray()
+        self.pos = 0
+        self._scan = 0
+        self._skip = 0  # 还需丢弃的超大帧字节数
+
+    def feed(self, data):
+        self.buf += data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        msg = self.next_message()
+        if msg is None:
+            raise StopIteration
+        return msg
+
+    def next_message(self):
+        """Return the next complete message, or None if more bytes are needed."""
+        buf = self.buf
+        while self.pos < len(buf):
+            if self._skip:
+                take = min(self._skip, len(buf) - self.pos)
+                self._skip -= take
+                self._consume(self.pos + take)
+                continue
+            if buf[self.pos] == MAGIC:
+                if len(buf) - self.pos < _HEADER.size:
+                    break
+                _, n = _HEADER.unpack_from(buf, self.pos)
+                start = self.pos + _HEADER.size
+                if n > MAX_FRAME:
+                    # 不缓存超大帧：跳过头部，负载到达时直接丢弃
+                    self._consume(start)
+                    self._skip = n
+                    raise ProtocolError(f'frame too large: {n}')
+                if len(buf) - start < n:
+                    break
+                with memoryview(buf) as mv:
+                    payload = mv[start:start + n]
+                    self._consume(start + n)
+                    try:
+                        return unpack(payload)
+                    finally:
+                        payload.release()
+            # JSON 行：从上次扫描到的位置继续找换行，避免重复扫描
+            j = buf.find(b'\n', max(self.pos, self._scan))
+            if j < 0:
+                self._scan = len(buf)
+                break
+            line = bytes(buf[self.pos:j])
+            self._consume(j + 1)
+            if line.strip():
+                return json.loads(line.decode('utf-8'))
+        self._compact()
+        return None
+
+    def _consume(self, end):
+        self.pos = end
+        self._scan = end
+
+    def _compact(self):
+        if self.pos and self.pos * 2 >= len(self.buf):
+            del self.buf[:self.pos]
+            self._scan -= self.pos
+            self.pos = 0
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+# 作为脚本运行时把 src 加入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network.protocol import FrameDecoder, ProtocolError, encode, negotiate, JSON
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.protocol = JSON
+        self.room = None
+        self.team = None
+        peer = writer.get_extra_info('peername')
+        self.addr = f'{peer[0]}:{peer[1]}' if peer else '?'
+
+    def send(self, msg):
+        # write() 只进缓冲区，不会阻塞事件循环；drain 在读循环里做
+        if self.writer.is_closing():
+            return False
+        self.writer.write(encode(msg, self.protocol))
+        return True
+
+class Room:
+    """
+    One lockstep match: two seats, per-turn actions and checksums. Same message
+    flow as GameServer (assign, start, turn_data, desync, disconnect), but the
+    state lives here so a RoomServer can run many matches side by side.
+    """
+    def __init__(self, name, config=None, host_team='A'):
+        self.name = name
+        # 没给配置时随机地图，种子由服务器定，双方生成同一张图
+        self.config = config or {'mode': 'random', 'seed': random.SystemRandom().randrange(1 << 63)}
+        self.host_team = host_team
+        self.players = {}  # {team: Connection}
+        self.started = False
+        self.closed = False
+        self.turn = 0
+        self.desyncs = 0
+        self._reset_turn()
+
+    def _reset_turn(self):
+        self.turn_actions = {'A': [], 'B': []}
+        self.turn_checksums = {'A': None, 'B': None}
+        self.ready_for_next_turn = {'A': False, 'B': False}
+
+    def is_open(self):
+        return not self.closed and not self.started and len(self.players) < 2
+
+    def broadcast(self, msg):
+        for conn in list(self.players.values()):
+            conn.send(msg)
+
+    def join(self, conn):
+        # 第一个进入的是房主，拿 host_team
+        order = [self.host_team, 'B' if self.host_team == 'A' else 'A']
+        team = next(t for t in order if t not in self.players)
+        self.players[team] = conn
+        conn.room = self
+        conn.team = team
+        conn.send({'type': 'assign', 'team': team, 'room': self.name})
+        if len(self.players) == 2:
+            self.started = True
+            self.broadcast({'type': 'start', 'msg': 'Game Started', 'config': self.config, 'room': self.name})
+
+    def leave(self, conn):
+        if self.players.get(conn.team) is not conn:
+            return
+        del self.players[conn.team]
+        conn.room = None
+        # 对局中途有人掉线即结束本局，与 GameServer 相同
+        if self.started:
+            self.closed = True
+        self.broadcast({'type': 'disconnect', 'team': conn.team})
+
+    def submit(self, team, msg):
+        self.turn_actions[team] = msg.get('data', [])
+        self.turn_checksums[team] = msg.get('checksum')
+        self.ready_for_next_turn[team] = True
+        self._check_turn_complete()
+
+    def cancel(self, team):
+        self.ready_for_next_turn[team] = False
+        self.turn_actions[team] = []
+        self.turn_checksums[team] = None
+
+    def _check_turn_complete(self):
+        if not (self.ready_for_next_turn['A'] and self.ready_for_next_turn['B']):
+            return
+        ca = self.turn_checksums.get('A')
+        cb = self.turn_checksums.get('B')
+        if ca and cb and ca != cb:
+            self.desyncs += 1
+            print(f"[room {self.name}] DESYNC at turn {self.turn}: A:{ca} != B:{cb}")
+            self.broadcast({'type': 'desync', 'checksums': dict(self.turn_checksums)})
+        self.broadcast({
+            'type': 'turn_data',
+            'actions': {'A': self.turn_actions['A'], 'B': self.turn_actions['B']},
+            'timestamp': time.time(),
+        })
+        self.turn += 1
+        self._reset_turn()
+
+class RoomServer:
+    """
+    asyncio lockstep server hosting many independent rooms on one port.
+    A client connects, optionally negotiates the wire protocol (hello), then sends
+    {'type': 'join', 'room': name|None, 'config': ..., 'team': 'A'|'B'}; room None
+    means quick match into any waiting room. After that the usual actions /
+    cancel_turn messages are routed to the client's room only.
+
+    The game's PVP "join" flow works against it (it quick-matches); hosting from
+    the menu still starts a local GameServer. Spectators, keyframes and replay
+    files are GameServer features and are not implemented here.
+    """
+    def __init__(self, host='0.0.0.0', port=5000, binary=True, verbose=False):
+        self.host = host
+        self.port = port
+        self.binary = binary
+        self.verbose = verbose
+        self.rooms = {}
+        self.connections = set()
+        self._tasks = set()
+        self.turns = 0
+        self._server = None
+        self._ids = itertools.count(1)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 时取实际端口
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Room server listening on {self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for conn in list(self.connections):
+            conn.writer.close()
+        # 关闭连接后等各连接协程自行退出，避免事件循环结束时留下被取消的任务
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'rooms': len(self.rooms),
+            'playing': sum(1 for r in self.rooms.values() if r.started and not r.closed),
+            'connections': len(self.connections),
+            'turns': self.turns,
+            'desyncs': sum(r.desyncs for r in self.rooms.values()),
+        }
+
+    def _find_room(self, name, config, team):
+        if name is None:
+            # 快速匹配：进第一个等待中的匿名房间，没有就新开一个
+            for room in self.rooms.values():
+                if room.is_open() and room.name.startswith('#'):
+                    return room
+            name = f'#{next(self._ids)}'
+        room = self.rooms.get(name)
+        if room is None or room.closed:
+            room = self.rooms[name] = Room(name, config, team if team in ('A', 'B') else 'A')
+        return room if room.is_open() else None
+
+    def _drop_room(self, room):
+        if not room.players and self.rooms.get(room.name) is room:
+            del self.rooms[room.name]
+
+    def _dispatch(self, conn, msg):
+        mtype = msg.get('type')
+        room = conn.room
+        if mtype == 'hello':
+            protocol = negotiate(msg.get('protocols')) if self.binary else JSON
+            conn.send({'type': 'welcome', 'protocol': protocol})
+            conn.protocol = protocol
+        elif mtype == 'join':
+            if room is not None:
+                conn.send({'type': 'error', 'msg': f'already in room {room.name}'})
+                return
+            room = self._find_room(msg.get('room'), msg.get('config'), msg.get('team'))
+            if room is None:
+                conn.send({'type': 'error', 'msg': f"room {msg.get('room')} is full"})
+                return
+            room.join(conn)
+            if self.verbose:
+                print(f"{conn.addr} joined room {room.name} as {conn.team}")
+        elif room is None:
+            conn.send({'type': 'error', 'msg': 'join a room first'})
+        elif mtype == 'actions':
+            before = room.turn
+            room.submit(conn.team, msg)
+            self.turns += room.turn - before
+        elif mtype == 'cancel_turn':
+            room.cancel(conn.team)
+
+    async def _handle(self, reader, writer):
+        conn = Connection(reader, writer)
+        self.connections.add(conn)
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                decoder.feed(data)
+                try:
+                    for msg in decoder:
+                        self._dispatch(conn, msg)
+                except (UnicodeDecodeError, json.JSONDecodeError, ProtocolError) as e:
+                    # 坏数据直接断开该连接，不影响其它房间
+                    print(f"Decode error from {conn.addr}, closing: {e}")
+                    break
+                # 对端读得慢时在这里让出，而不是阻塞其它房间
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            if self.verbose:
+                print(f"Client {conn.addr} error: {e}")
+        finally:
+            self.connections.discard(conn)
+            self._tasks.discard(task)
+            room = conn.room
+            if room is not None:
+                room.leave(conn)
+                self._drop_room(room)
+            writer.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Multi-room lockstep PVP server')
+    ap.add_argument('--host', default='0.0.0.0')
+    ap.add_argument('--port', type=int, default=5000)
+    ap.add_argument('--json-only', action='store_true', help='refuse binary protocol negotiation')
+    ap.add_argument('-v', '--verbose', action='store_true')
+    args = ap.parse_args(argv)
+    server = RoomServer(args.host, args.port, binary=not args.json_only, verbose=args.verbose)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
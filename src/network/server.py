@@ -2,15 +2,201 @@ import socket
 import threading
 import json
 import time
+from collections import deque
+
+from network.protocol import FrameDecoder, ProtocolError, encode, negotiate, JSON
+
+class SendQueue:
+    """
+    Per-connection outgoing queue drained by its own thread, so put() never
+    blocks the caller. put() returns False when `maxlen` frames are already
+    waiting; the owner decides what to do with a slow consumer.
+    """
+    def __init__(self, conn, maxlen=256, name='send'):
+        self.conn = conn
+        self.maxlen = maxlen
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.alive = True
+        self.thread = threading.Thread(target=self._run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, data):
+        with self.cond:
+            if not self.alive or len(self.items) >= self.maxlen:
+                return False
+            self.items.append(data)
+            self.cond.notify()
+            return True
+
+    def reset(self, data):
+        # 丢弃积压的帧，只留 data（落后的观众改发一次追帧包）
+        with self.cond:
+            self.items.clear()
+            self.items.append(data)
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.alive = False
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.alive and not self.items:
+                    self.cond.wait()
+                if not self.alive:
+                    break
+                data = self.items.popleft()
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                break
+        self.alive = False
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+class SpectatorFeed:
+    """
+    Turn stream for spectators and the replay log.
+    Spectators get the start config once, then one 'turn' message per lockstep
+    turn (the two teams' actions only). A late joiner gets 'spectate_init' with
+    the latest keyframe (a full state sent by the host) plus the turns since,
+    instead of the whole history. A spectator whose queue is full is resynced
+    the same way rather than slowing anyone else down. If the host stops sending
+    keyframes, only the last max_deltas turns are kept and catch-up is marked
+    incomplete.
+    """
+    def __init__(self, keyframe_interval=50, queue_size=256, replay_path=None, max_deltas=None):
+        self.keyframe_interval = keyframe_interval
+        self.max_deltas = max_deltas or keyframe_interval * 4
+        self.queue_size = queue_size
+        self.replay_path = replay_path
+        self.lock = threading.Lock()
+        self.spectators = {}  # {conn: [SendQueue, protocol]}
+        self.replay = None
+        self._reset(None)
+
+    def _reset(self, config):
+        self.config = config
+        self.turn = 0
+        self.keyframe = None
+        self.deltas = deque(maxlen=self.max_deltas)  # 最近一个关键帧之后的回合
+        self.truncated = False  # 关键帧之后的回合是否已因超限被丢弃
+
+    def _record(self, msg):
+        if self.replay is not None:
+            self.replay.write(json.dumps(msg) + '\n')
+            self.replay.flush()
+
+    def _publish(self, msg):
+        # 每种协议只编码一次
+        frames = {}
+        for entry in list(self.spectators.values()):
+            q, protocol = entry
+            data = frames.get(protocol)
+            if data is None:
+                data = frames[protocol] = encode(msg, protocol)
+            if not q.put(data):
+                q.reset(encode(self.catch_up(), protocol))
+
+    def start(self, config):
+        with self.lock:
+            self._reset(config)
+            if self.replay_path:
+                if self.replay is not None:
+                    self.replay.close()
+                self.replay = open(self.replay_path, 'w', encoding='utf-8')
+            msg = {'type': 'start', 'config': config}
+            self._record(msg)
+            self._publish(msg)
+
+    def add_turn(self, actions):
+        with self.lock:
+            msg = {'type': 'turn', 'turn': self.turn, 'actions': actions}
+            self.turn += 1
+            if len(self.deltas) == self.max_deltas and not self.truncated:
+                # 房主迟迟不回关键帧（不是 PVPGameLoop，或应用回合失败）：只保留最近的回合
+                last = self.keyframe['turn'] if self.keyframe else 0
+                print(f"WARNING: no keyframe since turn {last}; keeping only the last {self.max_deltas} turns for late spectators")
+                self.truncated = True
+            self.deltas.append(msg)
+            self._record(msg)
+            self._publish(msg)
+
+    def needs_keyframe(self):
+        last = self.keyframe['turn'] if self.keyframe else 0
+        return self.config is not None and self.turn - last >= self.keyframe_interval
+
+    def add_keyframe(self, turn, state):
+        """Store the full state after `turn` turns; stale keyframes are ignored."""
+        with self.lock:
+            if turn != self.turn:
+                return False
+            self.keyframe = {'turn': turn, 'state': state}
+            self.deltas.clear()
+            self.truncated = False
+            self._record({'type': 'keyframe', 'turn': turn, 'state': state})
+            return True
+
+    def catch_up(self):
+        return {
+            'type': 'spectate_init',
+            'config': self.config,
+            'keyframe': self.keyframe,
+            'turns': list(self.deltas),
+            'turn': self.turn,
+            # False：关键帧与 turns 之间有缺口，观众无法还原完整状态
+            'complete': not self.truncated,
+        }
+
+    def add_spectator(self, conn):
+        with self.lock:
+            q = SendQueue(conn, self.queue_size, name='spectator-send')
+            self.spectators[conn] = [q, JSON]
+            q.put(encode(self.catch_up(), JSON))
+
+    def set_protocol(self, conn, protocol):
+        with self.lock:
+            entry = self.spectators.get(conn)
+            if entry is not None:
+                entry[0].put(encode({'type': 'welcome', 'protocol': protocol}, entry[1]))
+                entry[1] = protocol
+
+    def remove_spectator(self, conn):
+        with self.lock:
+            entry = self.spectators.pop(conn, None)
+        if entry is not None:
+            entry[0].close()
+
+    def close(self):
+        with self.lock:
+            entries = list(self.spectators.values())
+            self.spectators.clear()
+            if self.replay is not None:
+                self.replay.close()
+                self.replay = None
+        for q, _ in entries:
+            q.close()
 
 class GameServer:
-    def __init__(self, host='0.0.0.0', port=5000):
+    def __init__(self, host='0.0.0.0', port=5000, binary=True, spectator_port=None, replay_path=None, keyframe_interval=50):
         self.host = host
         self.port = port
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.clients = {}  # {conn: team}
         self.team_map = {} # {team: conn}
+        self.protocols = {} # {conn: wire protocol}，客户端 hello 之前一律 JSON
+        self.binary = binary
+        # 观众连独立端口（默认 port + 1，False 关闭），只收不发，不占玩家席位
+        self.spectator_port = port + 1 if spectator_port is None else spectator_port
+        self.spectator_socket = None
+        self.feed = SpectatorFeed(keyframe_interval, replay_path=replay_path)
         self.lock = threading.Lock()
         self.running = False
         self.game_started = False
@@ -39,10 +225,60 @@ class GameServer:
             accept_thread = threading.Thread(target=self._accept_clients)
             accept_thread.daemon = True
             accept_thread.start()
+            self._start_spectators()
         except Exception as e:
             print(f"Server start error: {e}")
             self.running = False
 
+    def _start_spectators(self):
+        if self.spectator_port is False:
+            return
+        try:
+            self.spectator_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.spectator_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.spectator_socket.bind((self.host, self.spectator_port))
+            self.spectator_socket.listen(16)
+            self.spectator_port = self.spectator_socket.getsockname()[1]
+            print(f"Spectators on {self.host}:{self.spectator_port}")
+            t = threading.Thread(target=self._accept_spectators)
+            t.daemon = True
+            t.start()
+        except Exception as e:
+            print(f"Spectator listener error: {e}")
+            self.spectator_socket = None
+
+    def _accept_spectators(self):
+        while self.running:
+            try:
+                conn, addr = self.spectator_socket.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            print(f"Spectator connected from {addr}")
+            self.feed.add_spectator(conn)
+            t = threading.Thread(target=self._handle_spectator, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def _handle_spectator(self, conn):
+        # 观众只可能发 hello；读循环主要用来发现断线
+        decoder = FrameDecoder()
+        while self.running:
+            try:
+                data = conn.recv(4096)
+            except OSError:
+                break
+            if not data:
+                break
+            decoder.feed(data)
+            try:
+                for msg in decoder:
+                    if msg.get('type') == 'hello':
+                        self.feed.set_protocol(conn, negotiate(msg.get('protocols')) if self.binary else JSON)
+            except (UnicodeDecodeError, json.JSONDecodeError, ProtocolError):
+                break
+        self.feed.remove_spectator(conn)
+
     def _accept_clients(self):
         # Determine team assignment order based on host_team
         # If host is A, first client (host) gets A, second gets B
@@ -80,32 +316,33 @@ class GameServer:
                         # Use a slight delay or ensure the second client is ready to receive
                         time.sleep(0.1) 
                         # Broadcast start with map config
+                        self.feed.start(self.game_config)
                         self._broadcast({'type': 'start', 'msg': 'Game Started', 'config': self.game_config})
                         print("Broadcasted start message")
             except Exception as e:
                 print(f"Accept error: {e}")
 
     def _handle_client(self, conn, team):
-        buffer = b""
+        decoder = FrameDecoder()
         while self.running:
             try:
-                data = conn.recv(4096)
+                data = conn.recv(65536)
                 if not data:
                     break
                 
-                buffer += data
-                while b'\n' in buffer:
-                    line_bytes, rest = buffer.split(b'\n', 1)
-                    buffer = rest
-                    if line_bytes.strip():
-                        try:
-                            line = line_bytes.decode('utf-8')
-                            msg = json.loads(line)
-                            self._process_message(team, msg)
-                        except UnicodeDecodeError:
-                            print(f"Decode error from team {team}")
-                        except json.JSONDecodeError:
-                            print(f"JSON decode error from team {team}")
+                decoder.feed(data)
+                while True:
+                    try:
+                        msg = decoder.next_message()
+                    except (UnicodeDecodeError, json.JSONDecodeError, ProtocolError) as e:
+                        print(f"Decode error from team {team}: {e}")
+                        continue
+                    if msg is None:
+                        break
+                    if msg.get('type') == 'hello':
+                        self._negotiate(conn, msg)
+                    else:
+                        self._process_message(team, msg)
             except Exception as e:
                 print(f"Client {team} error: {e}")
                 break
@@ -114,9 +351,18 @@ class GameServer:
             if conn in self.clients:
                 del self.clients[conn]
                 del self.team_map[team]
+                self.protocols.pop(conn, None)
                 self.game_started = False
                 self._broadcast({'type': 'disconnect', 'team': team})
 
+    def _negotiate(self, conn, msg):
+        # welcome 本身仍用 JSON 发出，之后才切换
+        protocol = negotiate(msg.get('protocols')) if self.binary else JSON
+        with self.lock:
+            self._send(conn, {'type': 'welcome', 'protocol': protocol})
+            self.protocols[conn] = protocol
+        print(f"Team {self.clients.get(conn, 'Unknown')} wire protocol: {protocol}")
+
     def _process_message(self, team, msg):
         mtype = msg.get('type')
         
@@ -133,6 +379,10 @@ class GameServer:
                 self.turn_actions[team] = []
                 self.turn_checksums[team] = None
                 print(f"Team {team} cancelled turn ready state")
+        elif mtype == 'keyframe':
+            # 只接受房主的全量状态，作为观众追帧的起点
+            if team == self.host_team and self.feed.add_keyframe(msg.get('turn'), msg.get('state')):
+                print(f"Keyframe stored at turn {msg.get('turn')}")
                 
     def _check_turn_complete(self):
         # If both players have sent their actions (or ready signal)
@@ -167,6 +417,11 @@ class GameServer:
             }
             print(f"[{timestamp}] Broadcasting turn_data to clients...")
             self._broadcast(payload)
+            # 观众与回放：只入队，不阻塞玩家的回合
+            self.feed.add_turn(payload['actions'])
+            host_conn = self.team_map.get(self.host_team)
+            if host_conn is not None and self.feed.needs_keyframe():
+                self._send(host_conn, {'type': 'keyframe_request', 'turn': self.feed.turn})
             
             # Reset for next turn
             self.turn_actions = {'A': [], 'B': []}
@@ -175,8 +430,7 @@ class GameServer:
 
     def _send(self, conn, msg):
         try:
-            json_str = json.dumps(msg)
-            data = (json_str + '\n').encode('utf-8')
+            data = encode(msg, self.protocols.get(conn, JSON))
             # print(f"DEBUG: Server sending {len(data)} bytes to {self.clients.get(conn, 'Unknown')}")
             conn.sendall(data)
             return True
@@ -194,3 +448,6 @@ class GameServer:
     def stop(self):
         self.running = False
         self.server_socket.close()
+        if self.spectator_socket is not None:
+            self.spectator_socket.close()
+        self.feed.close()
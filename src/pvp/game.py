@@ -10,6 +10,7 @@ class PVPGameLoop(SimulationLoop):
         self.await_human = True # PVP is always waiting for human input locally
         self.waiting_for_server = False # Block 'next turn' until server confirms
         self.error_message = None # Store critical errors (Disconnect/Desync)
+        self.turns_applied = 0 # 已执行的服务器回合数，关键帧据此对齐
 
     def start_pvp_phase(self):
         # Initialize local player context
@@ -59,13 +60,20 @@ class PVPGameLoop(SimulationLoop):
             elif msg['type'] == 'turn_data':
                 print(f"DEBUG: Received turn_data for Tick {self.state.tick}, applying...")
                 try:
+                    self.profiler.begin_tick()
                     self._apply_server_turn(msg['actions'])
+                    self.turns_applied += 1
+                    self.profiler.end_tick()
                     self.waiting_for_server = False
                     print(f"DEBUG: Turn applied. New Tick: {self.state.tick}")
                 except Exception as e:
                     print(f"CRITICAL ERROR applying turn: {e}")
                     import traceback
                     traceback.print_exc()
+            elif msg['type'] == 'keyframe_request':
+                # 房主把当前全量状态交给服务器，供后来的观众追帧；地图已在 start 配置里，不重复发送
+                state = {k: v for k, v in self.state.serialize().items() if k != 'map'}
+                self.client.send_keyframe(self.turns_applied, state)
             elif msg['type'] == 'desync':
                 print(f"CRITICAL: Game State Desync Detected! Server Checksums: {msg.get('checksums')}")
                 self.error_message = "发生同步错误 (Desync)!"
@@ -107,13 +115,9 @@ class PVPGameLoop(SimulationLoop):
                 # Serialize action
                 act_data = {'kind': act.kind}
                 if hasattr(act.target, 'pos'): # Unit target
-                     # We need a way to ID units across network. 
-                     # For MVP, we might rely on coordinate matching or assume deterministic ID generation if careful.
-                     # But IDs are safer. GameState needs to ensure IDs are consistent.
-                     # For now, let's use target ID if available, or pos if it's a move_path
-                     act_data['target_id'] = id(act.target) # Python ID won't work across net!
-                     # FIXME: Need stable IDs for units.
-                     # Fallback: For attacks, send target grid pos.
+                     # uid 由 GameState 按相同顺序分配，两端一致；基地没有 uid，只发坐标
+                     if getattr(act.target, 'uid', None) is not None:
+                         act_data['target_id'] = act.target.uid
                      tx, ty = act.target.pos()
                      act_data['target_pos'] = (tx, ty)
                 elif isinstance(act.target, tuple): # Coord target
@@ -121,10 +125,11 @@ class PVPGameLoop(SimulationLoop):
                 elif isinstance(act.target, list): # Path target
                     act_data['target_path'] = act.target
                 
-                # Identify which unit is acting by its position (assuming unique per tile) or ID
+                # Identify which unit is acting by its stable ID (position kept as fallback)
                 ux, uy = u.pos()
                 actions_payload.append({
                     'kind': 'command',
+                    'unit_id': u.uid,
                     'unit_pos': (ux, uy),
                     'action': act_data
                 })
@@ -172,9 +177,9 @@ class PVPGameLoop(SimulationLoop):
         # 3. Apply Unit Commands
         # We need to map coordinate/ID back to local unit objects
         # Create a map of pos -> unit for quick lookup
-        # 注意：这里需要先更新 occupied，因为招募可能新增了单位
-        self.state.update_occupied()
-        pos_to_unit = {u.pos(): u for u in self.state.units}
+        # 优先按 unit_id 查找，旧客户端只带坐标时退回 occupied（位置 -> uid）
+        def unit_at(pos):
+            return self.state.get_unit(self.state.occupied.get(pos))
         
         collected_actions = []
         
@@ -182,8 +187,9 @@ class PVPGameLoop(SimulationLoop):
             team_acts = all_actions.get(team, [])
             for act in team_acts:
                 if act['kind'] == 'command':
-                    u_pos = tuple(act['unit_pos'])
-                    unit = pos_to_unit.get(u_pos)
+                    unit = self.state.get_unit(act.get('unit_id'))
+                    if unit is None and 'unit_pos' in act:
+                        unit = unit_at(tuple(act['unit_pos']))
                     if unit and unit.team == team:
                         # Decode Action
                         act_data = act['action']
@@ -194,7 +200,9 @@ class PVPGameLoop(SimulationLoop):
                             tx, ty = act_data['target_pos']
                             # If attack, find unit at target
                             if kind == 'attack':
-                                target = pos_to_unit.get((tx, ty))
+                                target = self.state.get_unit(act_data.get('target_id'))
+                                if not target:
+                                    target = unit_at((tx, ty))
                                 # Also check bases
                                 if not target:
                                     if (tx, ty) == self.state.base_a.pos():
@@ -223,15 +231,16 @@ class PVPGameLoop(SimulationLoop):
         # We reuse the logic from SimulationLoop but applied with these specific actions
         # 注意：resolve_movements 依赖于 _vis_cache 和 _is_known_walkable
         # 因此在结算前必须更新 _vis_cache
-        self._vis_cache['A'] = self._compute_visibility('A')
-        self._vis_cache['B'] = self._compute_visibility('B')
+        with self.profiler.phase('visibility'):
+            self._refresh_visibility()
         
-        self.resolve_attacks(collected_actions)
-        self.resolve_movements(collected_actions)
+        with self.profiler.phase('resolve_attacks'):
+            self.resolve_attacks(collected_actions)
+        with self.profiler.phase('resolve_movements'):
+            self.resolve_movements(collected_actions)
         
         # 5. Advance State
         self.state.tick += 1
-        self.state.update_occupied()
         
         # 6. Prepare next local turn
         self.start_player_phase() # Re-calc points, etc.
@@ -2,7 +2,16 @@ import pygame
 import math
 from renderer.base import Renderer
 from core.map import PLAIN, MOUNTAIN, RIVER
-from utils.common import hex_line, hex_distance, hex_neighbors
+from core.visibility import VisibilityTracker
+from utils.hex_layout import HexLayout
+
+def _freeze(v):
+    # 预览目标可能是单位/基地、坐标或路径列表，转成可比较的 key
+    if hasattr(v, 'pos'):
+        return v.pos()
+    if isinstance(v, (list, tuple)):
+        return tuple(_freeze(p) for p in v)
+    return v
 
 class PygameRenderer(Renderer):
     def __init__(self, cell_size=24, fps=60):
@@ -23,6 +32,26 @@ class PygameRenderer(Renderer):
         self.preview_recruits = []
         self.preview_actions = {}
         self.preview_paths = {}
+        self._vis_tracker = VisibilityTracker(include_base=True, reveal_blockers=True)
+        # 由控制器每帧写入的分阶段计时摘要（TickProfiler.summary_lines），为空则不显示
+        self.profile_lines = []
+        # 预渲染的地形层（地形色 + 网格虚线）：{视角: [surface, 已烘焙的探索位]}
+        # 地图、格子大小或窗口变化时整体作废；A/B 视角下新探索的格子增量补画
+        self._terrain_layers = {}
+        self._terrain_key = None
+        # 格心与顶点缓存，handle_resize 时重建
+        self.layout = None
+        # 战争迷雾层：覆盖地图范围的一张 SRCALPHA 表面，视野或探索位变化时才用六边形印章重画
+        self._fog = None
+        self._fog_stamps = None
+        # 脏矩形模式：状态、视角、选择都没变时跳过整帧；只有 HUD、预览或面板变化时
+        # 从缓存的底图恢复，重画界面层，并只提交变化的区域
+        self.dirty_rects = True
+        self._scene = None   # 地形 + 迷雾 + 基地 + 单位合成后的整屏
+        self._frame = None   # 上一帧 {部件: (key, [Rect])}，None 表示下一帧必须整屏重画
+        self._rects = {}     # 本帧界面层各部件画过的区域
+        # 模拟线程模式下由控制器写入 (上一帧 {uid: (x, y)}, alpha)，单位位置在两帧之间插值
+        self.interp = None
         self.colors = {
             'bg': (18, 18, 18),
             'grid': (32, 32, 32),
@@ -83,6 +112,20 @@ class PygameRenderer(Renderer):
         
         avail_h_for_map = h - self.ui_top
         self.map_pad_top = max(0, int((avail_h_for_map - actual_map_h) / 2))
+        self._hex_layout(gamestate)
+        self.invalidate()
+
+    def invalidate(self):
+        # 屏幕被别处画过（菜单、窗口重绘、改尺寸）后调用，下一帧整屏重画
+        self._frame = None
+
+    def _hex_layout(self, gamestate):
+        # 地图尺寸、格子大小或边距变了才重建
+        m = gamestate.map
+        oy = self.ui_top + self.map_pad_top
+        if self.layout is None or not self.layout.matches(m.width, m.height, self.cell_size, self.map_pad_x, oy):
+            self.layout = HexLayout(m.width, m.height, self.cell_size, self.map_pad_x, oy)
+        return self.layout
 
     def _load_font(self, size):
         candidates = ['Microsoft YaHei UI', 'Microsoft YaHei', 'SimHei', 'Arial Unicode MS', 'Segoe UI Symbol', 'Noto Sans CJK SC', 'Source Han Sans SC', 'Consolas']
@@ -115,34 +158,76 @@ class PygameRenderer(Renderer):
     def render(self, gamestate, tick):
         if self.screen is None:
             self.initialize(gamestate)
-        self.screen.fill(self.colors['bg'])
-        vis = None
-        if self.view_mode in ('A','B'):
-            vis = self.compute_visibility(gamestate, self.view_mode)
-            gamestate.record_explored(self.view_mode, list(vis))
-        self.render_map(gamestate, vis)
-        self.render_bases(gamestate, vis)
-        self.render_units(gamestate, vis)
+        self._hex_layout(gamestate)
+        keys = self._frame_keys(gamestate, tick) if self.dirty_rects else None
+        prev = self._frame
+        if keys is not None and prev is not None and prev['scene'][0] == keys['scene']:
+            changed = [part for part in ('overlay', 'panel', 'hud') if prev[part][0] != keys[part]]
+            if not changed:
+                # 什么都没变：不画也不 flip，只按帧率等待
+                self.clock.tick(self.fps)
+                return ''
+            # 地图层没变：恢复底图后只重画界面层，提交变化部件新旧两帧的区域
+            self.screen.blit(self._scene, (0, 0))
+            rects = self._draw_ui(gamestate, tick)
+            pygame.display.update([r for part in changed for r in prev[part][1] + rects[part]])
+        else:
+            # 不再整屏 fill：render_map 先整屏贴地形层（背景色已烘焙在内）
+            vis = None
+            if self.view_mode in ('A','B'):
+                vis = self.compute_visibility(gamestate, self.view_mode)
+                gamestate.record_explored(self.view_mode, vis)
+            self.render_map(gamestate, vis)
+            self.render_bases(gamestate, vis)
+            self.render_units(gamestate, vis)
+            if keys is not None:
+                if self._scene is None or self._scene.get_size() != self.screen.get_size():
+                    self._scene = pygame.Surface(self.screen.get_size())
+                self._scene.blit(self.screen, (0, 0))
+            rects = self._draw_ui(gamestate, tick)
+            pygame.display.flip()
+        self._frame = None if keys is None else {part: (key, rects.get(part, [])) for part, key in keys.items()}
+        self.clock.tick(self.fps)
+        return ''
+
+    def _draw_ui(self, gamestate, tick):
+        self._rects = {'overlay': [], 'panel': [], 'hud': []}
         self.render_overlays(gamestate)
         self.render_panel(gamestate)
         self.render_hud(gamestate, tick)
-        pygame.display.flip()
-        self.clock.tick(self.fps)
-        return ''
+        return self._rects
+
+    def _note(self, part, rect):
+        rects = self._rects.get(part)
+        if rects is not None:
+            rects.append(pygame.Rect(rect))
+
+    def _frame_keys(self, gamestate, tick):
+        # 地图层：状态（tick + 变更计数）、视角、布局和选中高亮；界面层各自一个 key
+        m = gamestate.map
+        scene = (id(gamestate), tick, gamestate.mutations, id(m), m.version, self.view_mode,
+                 self.screen.get_size(), id(self.layout), frozenset(getattr(self, 'ui_highlights', None) or ()),
+                 self.interp[1] if self.interp else None)
+        overlay = (
+            tuple((r.get('kind'), r.get('team'), _freeze(r['pos'])) for r in self.preview_recruits),
+            tuple((u.uid, u.x, u.y, a.kind, _freeze(a.target), _freeze(self.preview_paths.get(u, ())))
+                  for u, a in self.preview_actions.items()),
+        )
+        panel = getattr(self, 'panel', None)
+        if panel:
+            panel = (id(panel), panel.get('selected_item'), panel.get('selected_mode'), panel.get('points'))
+        hud = (self.paused, self.speed, self.step_mode, getattr(self, 'is_waiting_pvp', False),
+               getattr(self, 'pvp_error', None), tuple(self.profile_lines),
+               tuple((it.text, int(it.x), int(it.y)) for it in getattr(self, 'feed_items', [])))
+        return {'scene': scene, 'overlay': overlay, 'panel': panel, 'hud': hud}
 
     def pixel_to_hex(self, px, py):
-        ry = (py - (self.ui_top + self.map_pad_top)) / (1.5 * self.cell_size)
-        y = int(round(ry))
-        if y < 0 or y >= getattr(self, 'last_h', 0):
-            pass
-        offset = 0.5 * (y & 1) * self.cell_size * math.sqrt(3)
-        rx = (px - self.map_pad_x - offset) / (self.cell_size * math.sqrt(3))
-        x = int(round(rx))
-        return (x, y)
+        if self.layout is None:
+            return (-1, -1)
+        return self.layout.pixel_to_hex(px, py)
 
     def _draw_ghost_unit(self, kind, team, x, y):
-        cx = self.map_pad_x + self.cell_size * math.sqrt(3) * (x + 0.5 * (y & 1))
-        cy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * y
+        cx, cy = self.layout.center(x, y)
         color = self.colors.get(team, (200,200,200))
         overlay = pygame.Surface((int(self.cell_size*2), int(self.cell_size*2)), pygame.SRCALPHA)
         ox = int(cx - self.cell_size)
@@ -171,39 +256,107 @@ class PygameRenderer(Renderer):
         hy2 = ty - l * math.sin(ang + math.pi/6)
         pygame.draw.polygon(self.screen, color, [(tx, ty), (hx1, hy1), (hx2, hy2)])
 
-    def render_map(self, gamestate, vis=None):
+    def _bake_cells(self, surf, gamestate, cells, side_exp):
+        grid = gamestate.map.grid
+        for x, y in cells:
+            t = grid[y][x]
+            if side_exp is None or (x, y) in side_exp:
+                color = self.colors.get(t, self.colors[PLAIN])
+            else:
+                color = self.colors.get(PLAIN)
+            pts = self.layout.corners(x, y)
+            pygame.draw.polygon(surf, color, pts)
+            self._stroke_dashed(pts, (60,60,70), 1, surf)
+
+    def _terrain_layer(self, gamestate):
+        m = gamestate.map
+        key = (id(m), m.version, m.width, m.height, self.cell_size, self.map_pad_x, self.map_pad_top, self.ui_top, self.screen.get_size())
+        if key != self._terrain_key:
+            self._terrain_layers = {}
+            self._terrain_key = key
+        view = self.view_mode if self.view_mode in ('A','B') else 'ALL'
+        side_exp = gamestate.explored.get(view) if view != 'ALL' else None
+        bits = side_exp.as_int() if side_exp is not None else 0
+        ent = self._terrain_layers.get(view)
+        if ent is None or ent[1] & ~bits:
+            surf = pygame.Surface(self.screen.get_size()).convert()
+            surf.fill(self.colors['bg'])
+            self._bake_cells(surf, gamestate, ((x, y) for y in range(m.height) for x in range(m.width)), side_exp)
+            ent = self._terrain_layers[view] = [surf, bits]
+        elif bits != ent[1]:
+            # 探索只增不减：只补画新探索的格子
+            new = bits & ~ent[1]
+            cells = []
+            while new:
+                low = new & -new
+                i = low.bit_length() - 1
+                cells.append((i % m.width, i // m.width))
+                new ^= low
+            self._bake_cells(ent[0], gamestate, cells, side_exp)
+            ent[1] = bits
+        return ent[0]
+
+    def _map_rect(self, gamestate):
         size = self.cell_size
-        side_exp = gamestate.explored.get(self.view_mode, set()) if self.view_mode in ('A','B') else None
-        for y in range(gamestate.map.height):
-            for x in range(gamestate.map.width):
-                t = gamestate.map.grid[y][x]
-                if self.view_mode in ('A','B'):
-                    if (x, y) in side_exp:
-                        color = self.colors.get(t, self.colors[PLAIN])
-                    else:
-                        color = self.colors.get(PLAIN)
-                else:
-                    color = self.colors.get(t, self.colors[PLAIN])
-                cx = self.map_pad_x + size * math.sqrt(3) * (x + 0.5 * (y & 1))
-                cy = self.ui_top + self.map_pad_top + size * 1.5 * y
-                pts = []
-                for i in range(6):
-                    ang = math.pi/180 * (60 * i + 30)
-                    px = cx + size * math.cos(ang)
-                    py = cy + size * math.sin(ang)
-                    pts.append((px, py))
-                pygame.draw.polygon(self.screen, color, pts)
-                if self.view_mode in ('A','B'):
-                    if vis is not None and (x, y) in vis:
-                        pass
-                    elif (x, y) in side_exp:
-                        self._poly_overlay(pts, (0, 0, 0, 80))
-                    else:
-                        self._poly_overlay(pts, (100, 100, 110, 160))
-                self._stroke_dashed(pts, (60,60,70), 1)
-                # 选中高亮描边
-                if getattr(self, 'ui_highlights', None) and (x, y) in self.ui_highlights:
-                    pygame.draw.polygon(self.screen, (240,220,80), pts, 3)
+        x0 = int(self.map_pad_x - size) - 1
+        y0 = int(self.ui_top + self.map_pad_top - size) - 1
+        w = int(size * math.sqrt(3) * (gamestate.map.width + 0.5) + size * 2) + 3
+        h = int(size * 1.5 * gamestate.map.height + size * 2) + 3
+        return pygame.Rect(x0, y0, w, h)
+
+    def _stamps(self):
+        # 两种迷雾（已探索/未探索）的六边形印章，按格子大小缓存；(印章, 格心在印章内的坐标)
+        size = self.cell_size
+        if self._fog_stamps is None or self._fog_stamps[0] != size:
+            ox = int(math.ceil(size * math.sqrt(3) / 2)) + 1
+            oy = int(math.ceil(size)) + 1
+            pts = [(ox + dx, oy + dy) for dx, dy in self.layout.corner_offsets]
+            stamps = []
+            for color in ((0, 0, 0, 80), (100, 100, 110, 160)):
+                st = pygame.Surface((ox * 2 + 1, oy * 2 + 1), pygame.SRCALPHA)
+                pygame.draw.polygon(st, color, pts)
+                stamps.append(st)
+            self._fog_stamps = (size, stamps[0], stamps[1], ox, oy)
+        return self._fog_stamps
+
+    def _fog_layer(self, gamestate, vis):
+        m = gamestate.map
+        side_exp = gamestate.explored.get(self.view_mode)
+        exp_bits = side_exp.as_int() if side_exp is not None else 0
+        vis_bits = vis.as_int() if vis is not None else 0
+        key = (self._terrain_key, self.view_mode, vis_bits, exp_bits)
+        if self._fog is not None and self._fog[0] == key:
+            return self._fog[1], self._fog[2]
+        rect = self._map_rect(gamestate)
+        layer = self._fog[1] if self._fog is not None and self._fog[1].get_size() == rect.size else pygame.Surface(rect.size, pygame.SRCALPHA)
+        layer.fill((0, 0, 0, 0))
+        _, dim, dark, ox, oy = self._stamps()
+        fog = ((1 << (m.width * m.height)) - 1) & ~vis_bits
+        centers = self.layout.centers
+        bx = rect.x + ox
+        by = rect.y + oy
+        blits = []
+        while fog:
+            low = fog & -fog
+            i = low.bit_length() - 1
+            fog ^= low
+            cx, cy = centers[i]
+            blits.append((dim if exp_bits & low else dark, (int(round(cx - bx)), int(round(cy - by)))))
+        # 逐通道取最大值：印章之间不做 alpha 混合，重叠的边取较深的一种
+        for st, pos in blits:
+            layer.blit(st, pos, special_flags=pygame.BLEND_RGBA_MAX)
+        self._fog = (key, layer, rect.topleft)
+        return layer, rect.topleft
+
+    def render_map(self, gamestate, vis=None):
+        self.screen.blit(self._terrain_layer(gamestate), (0, 0))
+        if self.view_mode in ('A','B'):
+            # 不管隐藏了多少格，迷雾每帧只有一次 blit
+            layer, pos = self._fog_layer(gamestate, vis)
+            self.screen.blit(layer, pos)
+        # 选中高亮描边
+        for (x, y) in getattr(self, 'ui_highlights', None) or ():
+            pygame.draw.polygon(self.screen, (240,220,80), self.layout.corners(x, y), 3)
         self.last_w = gamestate.map.width
         self.last_h = gamestate.map.height
 
@@ -214,16 +367,14 @@ class PygameRenderer(Renderer):
                 kb = gamestate.known_enemy_base.get(self.view_mode)
                 if kb == base.pos():
                     color = self.colors.get(base.team)
-                    cx = self.map_pad_x + self.cell_size * math.sqrt(3) * (base.x + 0.5 * (base.y & 1))
-                    cy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * base.y
+                    cx, cy = self.layout.center(base.x, base.y)
                     r = int(self.cell_size * 0.6)
                     pygame.draw.circle(self.screen, color, (int(cx), int(cy)), r, 2)
                     continue
                 else:
                     continue
             color = self.colors.get(base.team)
-            cx = self.map_pad_x + self.cell_size * math.sqrt(3) * (base.x + 0.5 * (base.y & 1))
-            cy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * base.y
+            cx, cy = self.layout.center(base.x, base.y)
             r = int(self.cell_size * 0.6)
             pygame.draw.circle(self.screen, color, (int(cx), int(cy)), r)
             
@@ -237,12 +388,17 @@ class PygameRenderer(Renderer):
             pygame.draw.rect(self.screen, self.colors['hp_bar_fg'], pygame.Rect(bx, by, int(bw * ratio), bh))
 
     def render_units(self, gamestate, vis=None):
+        prev, alpha = self.interp if self.interp else (None, 1.0)
         for u in gamestate.units:
             if vis is not None and u.team != self.view_mode and (u.x, u.y) not in vis:
                 continue
             color = self.colors.get(u.team)
-            cx = self.map_pad_x + self.cell_size * math.sqrt(3) * (u.x + 0.5 * (u.y & 1))
-            cy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * u.y
+            cx, cy = self.layout.center(u.x, u.y)
+            p = prev.get(u.uid) if prev else None
+            if p is not None and p != (u.x, u.y):
+                px, py = self.layout.center(p[0], p[1])
+                cx = px + (cx - px) * alpha
+                cy = py + (cy - py) * alpha
             
             unit_size = max(2, int(self.cell_size * 0.5))
             
@@ -261,6 +417,7 @@ class PygameRenderer(Renderer):
         top_panel.set_alpha(220)
         top_panel.fill((10, 10, 12))
         self.screen.blit(top_panel, (0, 0))
+        self._note('hud', top_panel.get_rect())
         w = self.screen.get_width()
         a_ratio = max(0.0, min(1.0, gamestate.base_a.hp / 500.0))
         b_ratio = max(0.0, min(1.0, gamestate.base_b.hp / 500.0))
@@ -354,6 +511,10 @@ class PygameRenderer(Renderer):
             wait_text = self.title_font.render("等待对手...", True, (255, 255, 255))
             wrect = wait_text.get_rect(center=(w//2, 80))
             self.screen.blit(wait_text, wrect)
+            self._note('hud', wrect)
+
+        if self.profile_lines:
+            self._render_profile(self.profile_lines)
 
         # Draw PVP Error Overlay
         err_msg = getattr(self, 'pvp_error', None)
@@ -362,38 +523,46 @@ class PygameRenderer(Renderer):
             s.set_alpha(200)
             s.fill((100, 0, 0))
             self.screen.blit(s, (0, self.screen.get_height()//2 - 30))
+            self._note('hud', s.get_rect(topleft=(0, self.screen.get_height()//2 - 30)))
             etext = self.title_font.render(err_msg, True, (255, 255, 255))
             erect = etext.get_rect(center=(w//2, self.screen.get_height()//2))
             self.screen.blit(etext, erect)
 
+    def _render_profile(self, lines):
+        lh = self.font.get_linesize()
+        pw = max(self.font.size(t)[0] for t in lines) + 16
+        panel = pygame.Surface((pw, lh * len(lines) + 12))
+        panel.set_alpha(200)
+        panel.fill((10, 10, 12))
+        x = self.screen.get_width() - pw - 10
+        y = self.ui_top + 6
+        self.screen.blit(panel, (x, y))
+        self._note('hud', panel.get_rect(topleft=(x, y)))
+        for i, t in enumerate(lines):
+            self.screen.blit(self.font.render(t, True, (200, 230, 200)), (x + 8, y + 6 + i * lh))
+
     def render_overlays(self, gamestate):
         hl = getattr(self, 'ui_highlights', set())
         color = (230, 210, 80, 100)
         for (x, y) in hl:
-            size = self.cell_size
-            cx = self.map_pad_x + size * math.sqrt(3) * (x + 0.5 * (y & 1))
-            cy = self.ui_top + self.map_pad_top + size * 1.5 * y
-            pts = []
-            for i in range(6):
-                ang = math.pi/180 * (60 * i + 30)
-                px = cx + size * math.cos(ang)
-                py = cy + size * math.sin(ang)
-                pts.append((px, py))
-            self._poly_overlay(pts, color)
+            self._poly_overlay(self.layout.corners(x, y), color)
         # 预览：招募与单位行动
         for rec in getattr(self, 'preview_recruits', []):
             self._draw_ghost_unit(rec.get('kind','Infantry'), rec.get('team','A'), rec['pos'][0], rec['pos'][1])
+            self._note('overlay', self._cells_rect([rec['pos']]))
         for u, act in getattr(self, 'preview_actions', {}).items():
+            cells = [(u.x, u.y)] + [tuple(p) for p in self.preview_paths.get(u, [])]
+            if act.kind == 'move_towards':
+                cells.append(tuple(act.target))
+            elif act.kind == 'attack':
+                cells.append(act.target.pos())
+            self._note('overlay', self._cells_rect(cells))
             if act.kind == 'move_towards':
                 tx, ty = act.target
                 self._draw_ghost_unit(u.kind, u.team, tx, ty)
                 path = self.preview_paths.get(u, [])
                 if len(path) >= 2:
-                    ppts = []
-                    for (x, y) in path:
-                        cx = self.map_pad_x + self.cell_size * math.sqrt(3) * (x + 0.5 * (y & 1))
-                        cy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * y
-                        ppts.append((cx, cy))
+                    ppts = [self.layout.center(x, y) for (x, y) in path]
                     for i in range(len(ppts)-1):
                         pygame.draw.line(self.screen, (240,240,120), ppts[i], ppts[i+1], 2)
             elif act.kind == 'move_path':
@@ -402,32 +571,27 @@ class PygameRenderer(Renderer):
                     tx, ty = path[-1]
                     self._draw_ghost_unit(u.kind, u.team, tx, ty)
                     if len(path) >= 2:
-                        ppts = []
-                        for (x, y) in path:
-                            cx = self.map_pad_x + self.cell_size * math.sqrt(3) * (x + 0.5 * (y & 1))
-                            cy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * y
-                            ppts.append((cx, cy))
+                        ppts = [self.layout.center(x, y) for (x, y) in path]
                         for i in range(len(ppts)-1):
                             pygame.draw.line(self.screen, (240,240,120), ppts[i], ppts[i+1], 2)
             elif act.kind == 'attack':
                 tgt = act.target
                 x, y = tgt.pos()
-                size = self.cell_size
-                cx = self.map_pad_x + size * math.sqrt(3) * (x + 0.5 * (y & 1))
-                cy = self.ui_top + self.map_pad_top + size * 1.5 * y
-                pts = []
-                for i in range(6):
-                    ang = math.pi/180 * (60 * i + 30)
-                    px = cx + size * math.cos(ang)
-                    py = cy + size * math.sin(ang)
-                    pts.append((px, py))
+                cx, cy = self.layout.center(x, y)
+                pts = self.layout.corners(x, y)
                 self._poly_overlay(pts, (220,70,70,120))
                 pygame.draw.polygon(self.screen, (220,70,70), pts, 3)
                 # 攻击箭头预览
-                sx = self.map_pad_x + self.cell_size * math.sqrt(3) * (u.x + 0.5 * (u.y & 1))
-                sy = self.ui_top + self.map_pad_top + self.cell_size * 1.5 * u.y
+                sx, sy = self.layout.center(u.x, u.y)
                 self._draw_arrow(sx, sy, cx, cy, (220,70,70))
 
+    def _cells_rect(self, cells):
+        # 覆盖这些格子上幽灵单位、路径和箭头的包围盒
+        pad = max(self.cell_size, 10) + 4
+        xs = [self.layout.center(x, y)[0] for x, y in cells]
+        ys = [self.layout.center(x, y)[1] for x, y in cells]
+        return pygame.Rect(int(min(xs) - pad), int(min(ys) - pad), int(max(xs) - min(xs) + 2 * pad), int(max(ys) - min(ys) + 2 * pad))
+
     def render_panel(self, gamestate):
         panel = getattr(self, 'panel', None)
         self.panel_rects = {}
@@ -440,6 +604,7 @@ class PygameRenderer(Renderer):
         px = 16
         py = self.ui_top + 8
         self.screen.blit(surf, (px, py))
+        self._note('panel', (px, py, w, h))
         title = panel.get('title', '')
         t = self.title_font.render(title, True, self.colors['text'])
         self.screen.blit(t, (px + 10, py + 8))
@@ -508,35 +673,8 @@ class PygameRenderer(Renderer):
             self.panel_rects['undo'] = undo
 
     def compute_visibility(self, gamestate, side):
-        vis = set()
-        ents = [u for u in gamestate.units if u.team == side]
-        base = gamestate.base_a if side == 'A' else gamestate.base_b
-        ents.append(base)
-        for e in ents:
-            r = getattr(e, 'vision', 6)
-            ex, ey = e.pos()
-            y0 = max(0, ey - r)
-            y1 = min(gamestate.map.height - 1, ey + r)
-            x0 = max(0, ex - r)
-            x1 = min(gamestate.map.width - 1, ex + r)
-            for y in range(y0, y1 + 1):
-                for x in range(x0, x1 + 1):
-                    if hex_distance((ex, ey), (x, y)) > r:
-                        continue
-                    blocked = False
-                    for px, py in hex_line((ex, ey), (x, y)):
-                        if (px, py) == (ex, ey):
-                            continue
-                        if not gamestate.map.in_bounds(px, py):
-                            blocked = True
-                            break
-                        t = gamestate.map.grid[py][px]
-                        if t == MOUNTAIN and (px, py) != (x, y):
-                            blocked = True
-                            break
-                    if not blocked:
-                        vis.add((x, y))
-        return vis
+        # 渲染视野包含基地（默认视野 6），且可看到阻挡视线的山地本身；逐帧增量更新
+        return self._vis_tracker.update(gamestate, side)
 
     def _poly_overlay(self, pts, color):
         minx = min(p[0] for p in pts)
@@ -549,7 +687,8 @@ class PygameRenderer(Renderer):
         adj = [(p[0] - minx + 1, p[1] - miny + 1) for p in pts]
         pygame.draw.polygon(overlay, color, adj)
         self.screen.blit(overlay, (int(minx), int(miny)))
-    def _stroke_dashed(self, pts, color, width):
+    def _stroke_dashed(self, pts, color, width, surf=None):
+        surf = self.screen if surf is None else surf
         dash = 4
         gap = 2
         for i in range(len(pts)):
@@ -568,5 +707,5 @@ class PygameRenderer(Renderer):
                 sy = y1 + vy * pos
                 ex = x1 + vx * (pos + dash)
                 ey = y1 + vy * (pos + dash)
-                pygame.draw.line(self.screen, color, (sx, sy), (ex, ey), width)
+                pygame.draw.line(surf, color, (sx, sy), (ex, ey), width)
                 pos += dash + gap
@@ -1,11 +1,14 @@
-import random
+import os
 import sys
 import threading
 import time
 from core.state import GameState
-from utils.common import hex_neighbors, hex_distance, hex_line
+from core.visibility import compute_side_visibility, VisibilityTracker
+from utils.common import hex_neighbors, hex_distance
+from utils.pathfinding import FlowFieldCache, UNREACHABLE, hex_astar
 from ai.spawn_strategy import RandomSpawnStrategy
 from ai.policy import Action
+from simulation.profiler import TickProfiler, NullProfiler
 
 class SimulationLoop:
     def __init__(self, policy, renderer=None, initial_state=None, spawn_strategy=None):
@@ -20,7 +23,15 @@ class SimulationLoop:
         self.player_points = 0
         self.player_recruits = []
         self.player_actions = {}
-        self._vis_cache = {'A': set(), 'B': set()}
+        self._vis_cache = {'A': (), 'B': ()}
+        self._vis_tracker = VisibilityTracker()
+        # 共享流场：敌我基地及同一回合被至少 flow_min_users 个单位共用的目标格
+        self._flow_fields = FlowFieldCache()
+        self.flow_min_users = 3
+        # 分阶段计时：默认关闭；设置环境变量 RTS_PROFILE=<json 路径> 时开启，run() 结束时写出
+        self.profiler = NullProfiler()
+        if os.environ.get('RTS_PROFILE'):
+            self.enable_profiling(path=os.environ['RTS_PROFILE'])
 
     def start_player_phase(self):
         if not self.await_human or self.player_team not in ('A','B'):
@@ -68,30 +79,49 @@ class SimulationLoop:
     def set_unit_action(self, unit, action):
         self.player_actions[unit] = action
 
+    def _base_positions(self):
+        return (self.state.base_a.pos(), self.state.base_b.pos())
+
+    def _flow_field(self, goal, build=True):
+        # 基地格不可通行，流场从目标反向扩展时绕开（目标本身除外）
+        goal = tuple(goal)
+        blocked = tuple(p for p in self._base_positions() if p != goal)
+        if build:
+            return self._flow_fields.get(self.state.map, goal, blocked)
+        return self._flow_fields.peek(self.state.map, goal, blocked)
+
+    def _step_rank(self, field, pos, dest):
+        # 有流场时先比较到目标的真实步数，不可达或无流场时退回直线距离
+        d = hex_distance(pos, dest)
+        if field is None:
+            return (0, d)
+        fd = field.distance(pos[0], pos[1])
+        return (fd if fd != UNREACHABLE else 10**9, d)
+
     def step_towards(self, unit, dest):
         ux, uy = unit.pos()
         nbrs = hex_neighbors(ux, uy)
-        random.shuffle(nbrs)
+        self.state.rng.stream('movement').shuffle(nbrs)
+        field = self._flow_field(dest, build=tuple(dest) in self._base_positions())
         best = None
-        best_d = 10**9
+        best_d = None
         for nx, ny in nbrs:
             if self._is_known_walkable(unit.team, nx, ny) and (nx, ny) not in self.state.occupied:
-                d = hex_distance((nx,ny), dest)
-                if d < best_d:
+                d = self._step_rank(field, (nx, ny), dest)
+                if best_d is None or d < best_d:
                     best_d = d
                     best = (nx, ny)
         if best is not None:
-            unit.x, unit.y = best
+            self.state.move_unit(unit, best[0], best[1])
             return True
         return False
 
     def wander(self, unit):
         nbrs = hex_neighbors(unit.x, unit.y)
-        random.shuffle(nbrs)
+        self.state.rng.stream('movement').shuffle(nbrs)
         for nx, ny in nbrs:
             if self._is_known_walkable(unit.team, nx, ny) and (nx, ny) not in self.state.occupied:
-                unit.x = nx
-                unit.y = ny
+                self.state.move_unit(unit, nx, ny)
                 return True
         return False
 
@@ -101,7 +131,7 @@ class SimulationLoop:
         if not kinds:
             return
         spots = [p for p in hex_neighbors(base.x, base.y) if self.state.map.in_bounds(p[0], p[1])]
-        random.shuffle(spots)
+        self.state.rng.stream('spawn').shuffle(spots)
         for kind in kinds:
             for sx, sy in spots:
                 if self.state.map.can_walk(sx, sy) and (sx, sy) not in self.state.occupied:
@@ -129,11 +159,9 @@ class SimulationLoop:
                         dmg = self.state.damage_value(u, tgt)
                         dmg_map[tgt] = dmg_map.get(tgt, 0) + dmg
         for tgt, total in dmg_map.items():
-            tgt.hp -= total
+            self.state.apply_damage(tgt, total)
         # 统一清理死亡单位
-        dead = [x for x in self.state.units if hasattr(x, 'hp') and x.hp <= 0]
-        for d in dead:
-            self.state.remove_unit(d)
+        self.state.remove_units([x for x in self.state.units if x.hp <= 0])
 
     def resolve_movements(self, actions):
         movers = []
@@ -143,12 +171,18 @@ class SimulationLoop:
                 movers.append((u, act.target))
             elif act.kind == 'move_path':
                 movers.append((u, None))
-                move_paths[u] = list(act.target) if isinstance(act.target, list) else []
+                move_paths[u] = self._validate_move_path(u, act.target) if isinstance(act.target, list) else []
             elif act.kind == 'wander':
                 movers.append((u, None))
         if not movers:
             return
         max_spd = max(u.spd for u, _ in movers)
+        users = {}
+        for _, tgt in movers:
+            if tgt is not None:
+                users[tuple(tgt)] = users.get(tuple(tgt), 0) + 1
+        bases = self._base_positions()
+        fields = {g: self._flow_field(g) for g, n in users.items() if g in bases or n >= self.flow_min_users}
         occupied = set(self.state.occupied)
         # 基地加入占用，禁止踏入基地格
         occupied.add(self.state.base_a.pos())
@@ -184,12 +218,13 @@ class SimulationLoop:
                             break
                 else:
                     nbrs = hex_neighbors(u.x, u.y)
+                    field = fields.get(tuple(tgt))
                     best = None
-                    best_d = 10**9
+                    best_d = None
                     for nx, ny in nbrs:
                         if self._is_known_walkable(u.team, nx, ny) and (nx, ny) not in occupied:
-                            d = hex_distance((nx, ny), tgt)
-                            if d < best_d:
+                            d = self._step_rank(field, (nx, ny), tgt)
+                            if best_d is None or d < best_d:
                                 best_d = d
                                 best = (nx, ny)
                 if best is not None:
@@ -200,16 +235,15 @@ class SimulationLoop:
                 if len(us) == 1:
                     winner = us[0]
                 else:
-                    us.sort(key=lambda x: (-x.spd, -x.hp, -x.atk, id(x)))
+                    us.sort(key=lambda x: (-x.spd, -x.hp, -x.atk, x.uid))
                     winner = us[0]
                 wx, wy = dest
                 prev = winner.pos()
-                winner.x, winner.y = wx, wy
+                self.state.move_unit(winner, wx, wy)
                 occupied.add((wx, wy))
                 # 释放原占用，允许同回合后续推进经过该格
                 if prev in occupied:
                     occupied.discard(prev)
-        self.state.update_occupied()
 
     def apply_action(self, unit, action):
         if action.kind == 'attack':
@@ -218,49 +252,53 @@ class SimulationLoop:
                 if hasattr(target, 'hp'):
                     if hex_distance(unit.pos(), target.pos()) <= unit.rng:
                         dmg = self.state.damage_value(unit, target)
-                        target.hp -= dmg
+                        self.state.apply_damage(target, dmg)
                         if hasattr(target, 'kind') and target.hp <= 0:
                             self.state.remove_unit(target)
             else:
                 return
         elif action.kind == 'move_towards':
             for _ in range(unit.spd):
-                if self.step_towards(unit, action.target):
-                    self.state.occupied.add(unit.pos())
+                self.step_towards(unit, action.target)
         elif action.kind == 'wander':
             for _ in range(unit.spd):
-                if self.wander(unit):
-                    self.state.occupied.add(unit.pos())
+                self.wander(unit)
 
     def step(self, print_every=10):
         with self.lock:
-            self.state.update_occupied()
+            prof = self.profiler
+            prof.begin_tick()
             # 预计算双方可见集
-            self._vis_cache['A'] = self._compute_visibility('A')
-            self._vis_cache['B'] = self._compute_visibility('B')
-            actions = self.collect_actions()
+            with prof.phase('visibility'):
+                self._refresh_visibility()
+            with prof.phase('collect_actions'):
+                actions = self.collect_actions()
             progressed = False
             if not (self.await_human and not self.human_ready):
                 # 生成阶段：AI 阵营自动生成，玩家阵营根据队列生成
-                if self.await_human and self.player_team in ('A','B'):
-                    if self.player_team == 'A':
-                        self.spawn_from_base(self.state.base_b)
+                with prof.phase('spawn'):
+                    if self.await_human and self.player_team in ('A','B'):
+                        if self.player_team == 'A':
+                            self.spawn_from_base(self.state.base_b)
+                        else:
+                            self.spawn_from_base(self.state.base_a)
+                        for rec in self.player_recruits:
+                            x, y = rec['pos']
+                            if self._is_known_walkable(rec['team'], x, y) and (x, y) not in self.state.occupied:
+                                nu = self.state.spawn_unit(rec['team'], (x, y), rec['kind'])
+                                self.state.add_unit(nu)
                     else:
                         self.spawn_from_base(self.state.base_a)
-                    for rec in self.player_recruits:
-                        x, y = rec['pos']
-                        if self._is_known_walkable(rec['team'], x, y) and (x, y) not in self.state.occupied:
-                            nu = self.state.spawn_unit(rec['team'], (x, y), rec['kind'])
-                            self.state.add_unit(nu)
-                else:
-                    self.spawn_from_base(self.state.base_a)
-                    self.spawn_from_base(self.state.base_b)
-                self.resolve_attacks(actions)
-                self.resolve_movements(actions)
+                        self.spawn_from_base(self.state.base_b)
+                with prof.phase('resolve_attacks'):
+                    self.resolve_attacks(actions)
+                with prof.phase('resolve_movements'):
+                    self.resolve_movements(actions)
                 self.human_ready = False if self.await_human else True
                 progressed = True
             if self.renderer is not None and self.state.tick % print_every == 0:
-                out = self.renderer.render(self.state, self.state.tick)
+                with prof.phase('render'):
+                    out = self.renderer.render(self.state, self.state.tick)
                 if out:
                     print(out)
                     sys.stdout.flush()
@@ -271,82 +309,70 @@ class SimulationLoop:
                     self.player_recruits = []
                     self.player_actions = {}
                     self.start_player_phase()
+            prof.end_tick()
             cont = self.state.base_a.hp > 0 and self.state.base_b.hp > 0
             return cont
 
+    def enable_profiling(self, enabled=True, path=None, window=300):
+        # 开启后每个 step 记录各阶段耗时；关闭时换回空实现，几乎无开销
+        self.profiler = TickProfiler(window, path) if enabled else NullProfiler()
+        return self.profiler
+
+    def _refresh_visibility(self):
+        # 增量更新：只重算移动、新生成或死亡单位的视野
+        self._vis_cache['A'] = self._vis_tracker.update(self.state, 'A')
+        self._vis_cache['B'] = self._vis_tracker.update(self.state, 'B')
+
     def _compute_visibility(self, side):
-        vis = set()
-        units = [u for u in self.state.units if u.team == side]
-        for u in units:
-            rng = u.vision
-            ux, uy = u.pos()
-            for y in range(self.state.map.height):
-                for x in range(self.state.map.width):
-                    if hex_distance((ux, uy), (x, y)) <= rng:
-                        line = hex_line((ux, uy), (x, y))
-                        blocked = False
-                        for lx, ly in line[1:]:
-                            if not self.state.map.in_bounds(lx, ly):
-                                blocked = True
-                                break
-                            tile = self.state.map.grid[ly][lx]
-                            if tile == '#':  # MOUNTAIN 阻挡
-                                blocked = True
-                                break
-                        if not blocked:
-                            vis.add((x, y))
-        return vis
+        # 只扫描每个单位视野半径内的格子，山地阻挡规则与逐格 hex_line 扫描一致
+        return compute_side_visibility(self.state, side)
 
     def _is_known_walkable(self, side, x, y):
-        if not self.state.map.in_bounds(x, y):
+        m = self.state.map
+        if not (0 <= x < m.width and 0 <= y < m.height):
             return False
-        if not self.state.map.can_walk(x, y):
+        if not m.walkable_flat()[y * m.width + x]:
             return False
         # 基地视作障碍
         if (x, y) == self.state.base_a.pos() or (x, y) == self.state.base_b.pos():
             return False
-        known = (x, y) in self._vis_cache.get(side, set()) or (x, y) in self.state.explored.get(side, set())
+        known = (x, y) in self._vis_cache.get(side, ()) or (x, y) in self.state.explored.get(side, ())
         return known
 
-    def preview_path(self, unit, target):
-        # BFS 限制在可行且“已知”的格上
-        from collections import deque
-        sx, sy = unit.pos()
+    def preview_path(self, unit, target, avoid_units=True):
+        # A* 限制在可行且“已知”的格上；avoid_units 时绕开已被单位占用的格
+        side = unit.team
         tx, ty = target
-        if not self._is_known_walkable(unit.team, tx, ty):
+        if not self._is_known_walkable(side, tx, ty):
             return []
-        dq = deque()
-        dq.append((sx, sy))
-        prev = {}
-        seen = {(sx, sy)}
-        while dq:
-            x, y = dq.popleft()
-            if (x, y) == (tx, ty):
-                break
-            for nx, ny in hex_neighbors(x, y):
-                if (nx, ny) in seen:
-                    continue
-                if self._is_known_walkable(unit.team, nx, ny) and (nx, ny) not in self.state.occupied:
-                    seen.add((nx, ny))
-                    prev[(nx, ny)] = (x, y)
-                    dq.append((nx, ny))
-        path = []
-        cur = (tx, ty)
-        if cur not in prev and cur != (sx, sy):
+        m = self.state.map
+        avoid = self.state.occupied if avoid_units else None
+        return hex_astar(m.width, m.height).find_path(unit.pos(), (tx, ty), lambda x, y: self._is_known_walkable(side, x, y), avoid=avoid)
+
+    def _validate_move_path(self, unit, path):
+        # 路径须从单位当前位置出发、逐格相邻且都是已知可走格；否则按终点重新规划并截断到本回合步数
+        path = [tuple(p) for p in path]
+        if not path:
             return []
-        while cur != (sx, sy):
-            path.append(cur)
-            cur = prev.get(cur, (sx, sy))
-        path.append((sx, sy))
-        path.reverse()
-        return path
+        ok = path[0] == unit.pos()
+        if ok:
+            for (ax, ay), b in zip(path, path[1:]):
+                if b not in hex_neighbors(ax, ay) or not self._is_known_walkable(unit.team, b[0], b[1]):
+                    ok = False
+                    break
+        if ok:
+            return path
+        return self.preview_path(unit, path[-1], avoid_units=False)[:unit.spd + 1]
 
     def run(self, max_ticks=1000, print_every=10):
-        random.seed()
         while self.state.tick < max_ticks:
             cont = self.step(print_every)
             if not cont:
                 break
+        if self.profiler.enabled:
+            text = self.profiler.dump()
+            if not self.profiler.path:
+                print(text)
         if self.renderer is not None:
             out = self.renderer.render(self.state, self.state.tick)
             if out:
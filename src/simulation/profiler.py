@@ -0,0 +1,123 @@
+import json
+import time
+from collections import deque
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class NullProfiler:
+    """Profiler stand-in used when profiling is off: every hook is a no-op."""
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def begin_tick(self):
+        pass
+
+    def end_tick(self):
+        pass
+
+    def report(self):
+        return {}
+
+    def summary_lines(self, limit=8):
+        return []
+
+    def dump(self, path=None):
+        return None
+
+class _Phase:
+    __slots__ = ('prof', 'name', 't0')
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._add(self.name, time.perf_counter() - self.t0)
+        return False
+
+class TickProfiler:
+    """
+    Per-phase wall time for SimulationLoop.step. Each phase's total time per tick
+    goes into a rolling window of the last `window` ticks, from which p50/p95/max
+    are reported; call counts are cumulative. 'tick' is the whole step.
+    """
+    enabled = True
+
+    def __init__(self, window=300, path=None):
+        self.window = window
+        self.path = path
+        self.samples = {}
+        self.calls = {}
+        self.ticks = 0
+        self._cur = {}
+        self._t0 = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def _add(self, name, dt):
+        self._cur[name] = self._cur.get(name, 0.0) + dt
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def begin_tick(self):
+        self._cur = {}
+        self._t0 = time.perf_counter()
+
+    def end_tick(self):
+        if self._t0 is None:
+            return
+        self._cur['tick'] = time.perf_counter() - self._t0
+        self.calls['tick'] = self.calls.get('tick', 0) + 1
+        for name, dt in self._cur.items():
+            q = self.samples.get(name)
+            if q is None:
+                q = self.samples[name] = deque(maxlen=self.window)
+            q.append(dt)
+        self.ticks += 1
+        self._t0 = None
+
+    def report(self):
+        """{phase: {calls, last_ms, mean_ms, p50_ms, p95_ms, max_ms}} over the rolling window."""
+        res = {}
+        for name, q in self.samples.items():
+            if not q:
+                continue
+            xs = sorted(q)
+            n = len(xs)
+            res[name] = {
+                'calls': self.calls.get(name, 0),
+                'last_ms': round(q[-1] * 1000, 3),
+                'mean_ms': round(sum(xs) / n * 1000, 3),
+                'p50_ms': round(xs[(n - 1) // 2] * 1000, 3),
+                'p95_ms': round(xs[min(n - 1, int(n * 0.95))] * 1000, 3),
+                'max_ms': round(xs[-1] * 1000, 3),
+            }
+        return res
+
+    def summary_lines(self, limit=8):
+        # HUD 用的简短文本，按 p95 从高到低
+        rep = self.report()
+        rows = sorted(rep.items(), key=lambda kv: -kv[1]['p95_ms'])[:limit]
+        return [f"{name:<17} p50 {r['p50_ms']:7.2f}  p95 {r['p95_ms']:7.2f}  max {r['max_ms']:7.2f} ms" for name, r in rows]
+
+    def dump(self, path=None):
+        """Write the report as JSON to `path` (or self.path); returns the JSON text."""
+        text = json.dumps({'ticks': self.ticks, 'window': self.window, 'phases': self.report()}, indent=2, sort_keys=True)
+        path = path or self.path
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
@@ -0,0 +1,130 @@
+import copy
+import threading
+import time
+from collections import deque
+from concurrency.interfaces import IWorker
+
+class StateFrame:
+    """
+    Read-only copy of what the renderer draws from a GameState at one tick:
+    units, bases, known enemy bases and explored bitsets. The map object is
+    shared (it does not change during a game). record_explored only updates
+    this frame's own copy and forwards the cells to the owner, so the render
+    thread never writes the live state.
+    """
+    def __init__(self, state, units, on_explored=None):
+        self.tick = state.tick
+        self.mutations = state.mutations
+        self.map = state.map
+        self.base_a = copy.copy(state.base_a)
+        self.base_b = copy.copy(state.base_b)
+        self.units = units
+        self.known_enemy_base = dict(state.known_enemy_base)
+        self.explored = {side: bits.copy() for side, bits in state.explored.items()}
+        self.positions = {u.uid: (u.x, u.y) for u in units}
+        self.time = time.perf_counter()
+        self._on_explored = on_explored
+
+    def record_explored(self, side, cells):
+        exp = self.explored.get(side)
+        if exp is None:
+            return
+        before = exp.as_int()
+        exp.update(cells)
+        if exp.as_int() != before:
+            self.mutations += 1
+            if self._on_explored is not None:
+                self._on_explored(side, exp.copy())
+
+class SimulationWorker(IWorker):
+    """
+    Runs SimulationLoop.step on its own thread at a fixed tick rate and
+    publishes a StateFrame after every tick. Frames are built while holding
+    SimulationLoop.lock, so they are consistent with anything else that takes
+    the lock (input handlers, the web viewer). Callables passed to
+    submit_task run on the worker thread under the lock before the next step.
+    The loop's renderer is detached while the worker runs, because pygame
+    drawing stays on the main thread.
+    """
+    def __init__(self, loop, tick_rate=60.0):
+        self.loop = loop
+        self.tick_rate = tick_rate
+        self.paused = False
+        self.finished = False
+        self.frames = (None, None)  # (上一帧, 最新帧)，整体替换，渲染线程读到的总是一对
+        self._tasks = deque()
+        self._views = {}  # uid -> (x, y, hp, 拷贝)；未变化的单位复用同一拷贝
+        self._stop = threading.Event()
+        self._thread = None
+        self._renderer = None
+
+    def start(self):
+        self._renderer = self.loop.renderer
+        self.loop.renderer = None
+        with self.loop.lock:
+            self._publish()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._run_tasks()
+        self.loop.renderer = self._renderer
+
+    def submit_task(self, task):
+        self._tasks.append(task)
+
+    def latest(self):
+        """(frame, prev_frame, alpha): alpha is how far between the two frames the display should be."""
+        prev, cur = self.frames
+        if prev is None or self.paused or self.finished:
+            return cur, None, 1.0
+        interval = 1.0 / max(0.1, self.tick_rate)
+        return cur, prev, max(0.0, min(1.0, (time.perf_counter() - cur.time) / interval))
+
+    def _run_tasks(self):
+        if not self._tasks:
+            return
+        with self.loop.lock:
+            while self._tasks:
+                self._tasks.popleft()()
+
+    def _publish(self):
+        # 调用方持有 loop.lock
+        state = self.loop.state
+        views = {}
+        units = []
+        for u in state.units:
+            v = self._views.get(u.uid)
+            if v is None or v[0] != u.x or v[1] != u.y or v[2] != u.hp:
+                v = (u.x, u.y, u.hp, copy.copy(u))
+            views[u.uid] = v
+            units.append(v[3])
+        self._views = views
+        frame = StateFrame(state, tuple(units), lambda side, cells: self.submit_task(lambda: state.record_explored(side, cells)))
+        self.frames = (self.frames[1], frame)
+
+    def _run(self):
+        next_t = time.perf_counter()
+        while not self._stop.is_set():
+            self._run_tasks()
+            if self.paused:
+                self._stop.wait(0.02)
+                next_t = time.perf_counter()
+                continue
+            cont = self.loop.step(print_every=1)
+            with self.loop.lock:
+                self._publish()
+            if not cont:
+                self.finished = True
+                break
+            next_t += 1.0 / max(0.1, self.tick_rate)
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -0.25:
+                # 落后太多时不再追帧，重新对齐时钟
+                next_t = time.perf_counter()
@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+import time
+from collections import deque
+# 与其他工具一样：把 src 加入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.map import generate
+from utils.common import hex_neighbors, hex_distance
+from utils.pathfinding import hex_astar
+
+def bfs_path(m, start, goal):
+    # 旧版 preview_path 的 BFS，作为对照
+    sx, sy = start
+    tx, ty = goal
+    dq = deque()
+    dq.append((sx, sy))
+    prev = {}
+    seen = {(sx, sy)}
+    while dq:
+        x, y = dq.popleft()
+        if (x, y) == (tx, ty):
+            break
+        for nx, ny in hex_neighbors(x, y):
+            if (nx, ny) in seen:
+                continue
+            if m.can_walk(nx, ny):
+                seen.add((nx, ny))
+                prev[(nx, ny)] = (x, y)
+                dq.append((nx, ny))
+    path = []
+    cur = (tx, ty)
+    if cur not in prev and cur != (sx, sy):
+        return []
+    while cur != (sx, sy):
+        path.append(cur)
+        cur = prev.get(cur, (sx, sy))
+    path.append((sx, sy))
+    path.reverse()
+    return path
+
+def run(width, height, queries=200, seed=1, max_dist=None):
+    random.seed(seed)
+    m = generate(width, height)
+    cells = [(x, y) for y in range(height) for x in range(width) if m.can_walk(x, y)]
+    pairs = []
+    while len(pairs) < queries:
+        a = random.choice(cells)
+        b = random.choice(cells)
+        if max_dist is None or hex_distance(a, b) <= max_dist:
+            pairs.append((a, b))
+    astar = hex_astar(width, height)
+    t = time.perf_counter()
+    bfs = [bfs_path(m, a, b) for a, b in pairs]
+    t_bfs = time.perf_counter() - t
+    t = time.perf_counter()
+    ast = [astar.find_path(a, b, m.can_walk) for a, b in pairs]
+    t_ast = time.perf_counter() - t
+    # 两者都应给出最短路径（长度一致，具体走法可以不同）
+    mism = sum(1 for p, q in zip(bfs, ast) if len(p) != len(q))
+    return t_bfs, t_ast, mism
+
+def main():
+    print(f"{'map':>9} {'range':>6} {'bfs ms/q':>9} {'a* ms/q':>9} {'speedup':>8} {'mismatch':>8}")
+    for w, h in ((60, 30), (200, 100)):
+        for label, md in (('near', 10), ('any', None)):
+            n = 200
+            t_bfs, t_ast, mism = run(w, h, n, max_dist=md)
+            size = f'{w}x{h}'
+            print(f"{size:>9} {label:>6} {t_bfs / n * 1000:9.3f} {t_ast / n * 1000:9.3f} {t_bfs / t_ast:7.1f}x {mism:8d}")
+
+if __name__ == '__main__':
+    main()
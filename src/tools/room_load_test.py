@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+# 与其他工具一样：把 src 加入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network.protocol import FrameDecoder, encode, JSON, SUPPORTED
+from network.room_server import RoomServer
+
+class Bot:
+    """Headless lockstep client: joins a room, then plays `turns` turns of random moves."""
+    def __init__(self, host, port, room, turns, binary=True, desync_at=None):
+        self.host = host
+        self.port = port
+        self.room = room
+        self.turns = turns
+        self.binary = binary
+        self.desync_at = desync_at
+        self.protocol = JSON
+        self.team = None
+        self.latencies = []
+        self.desyncs = 0
+
+    async def _next(self, reader, decoder):
+        while True:
+            msg = decoder.next_message()
+            if msg is not None:
+                return msg
+            data = await reader.read(65536)
+            if not data:
+                raise ConnectionError('server closed connection')
+            decoder.feed(data)
+
+    async def _wait_for(self, reader, decoder, mtype):
+        while True:
+            msg = await self._next(reader, decoder)
+            t = msg.get('type')
+            if t == 'welcome':
+                self.protocol = msg['protocol']
+            elif t == 'assign':
+                self.team = msg['team']
+            elif t == 'desync':
+                self.desyncs += 1
+            elif t == 'disconnect':
+                raise ConnectionError('opponent disconnected')
+            if t == mtype:
+                return msg
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        decoder = FrameDecoder()
+        rng = random.Random(self.room)
+        try:
+            if self.binary:
+                writer.write(encode({'type': 'hello', 'protocols': list(SUPPORTED)}))
+                await self._wait_for(reader, decoder, 'welcome')
+            writer.write(encode({'type': 'join', 'room': self.room}, self.protocol))
+            await self._wait_for(reader, decoder, 'start')
+            for turn in range(self.turns):
+                actions = [{'type': 'move', 'unit_id': rng.randrange(1000), 'target': [rng.randrange(60), rng.randrange(30)]}
+                           for _ in range(rng.randrange(1, 6))]
+                # 同一房间的两个机器人用相同的校验值，desync_at 时故意让 B 不一致
+                checksum = f'{self.room}:{turn}'
+                if turn == self.desync_at and self.team == 'B':
+                    checksum += ':bad'
+                t = time.perf_counter()
+                writer.write(encode({'type': 'actions', 'data': actions, 'checksum': checksum}, self.protocol))
+                await writer.drain()
+                await self._wait_for(reader, decoder, 'turn_data')
+                self.latencies.append(time.perf_counter() - t)
+        finally:
+            writer.close()
+        return self
+
+async def run_load(pairs, turns, host='127.0.0.1', port=0, binary=True, spawn_server=True, desync_rooms=0):
+    server = None
+    if spawn_server:
+        server = await RoomServer(host, port, binary=binary).start()
+        port = server.port
+    bots = []
+    for i in range(pairs):
+        room = f'load-{i}'
+        desync_at = turns // 2 if i < desync_rooms else None
+        bots.append(Bot(host, port, room, turns, binary, desync_at))
+        bots.append(Bot(host, port, room, turns, binary, desync_at))
+    t = time.perf_counter()
+    results = await asyncio.gather(*(b.run() for b in bots), return_exceptions=True)
+    elapsed = time.perf_counter() - t
+    errors = [r for r in results if isinstance(r, Exception)]
+    stats = server.stats() if server is not None else {}
+    if server is not None:
+        await server.stop()
+    latencies = sorted(x for b in bots for x in b.latencies)
+    report = {
+        'pairs': pairs,
+        'turns': turns,
+        'protocol': 'bin1' if binary else 'json',
+        'seconds': round(elapsed, 3),
+        'errors': len(errors),
+        'turns_completed': sum(len(b.latencies) for b in bots) // 2,
+        'desyncs_seen': sum(b.desyncs for b in bots) // 2,
+        'server': stats,
+    }
+    if latencies:
+        n = len(latencies)
+        report['turns_per_s'] = round(report['turns_completed'] / elapsed, 1) if elapsed > 0 else 0
+        report['latency_p50_ms'] = round(statistics.median(latencies) * 1000, 3)
+        report['latency_p95_ms'] = round(latencies[min(n - 1, int(n * 0.95))] * 1000, 3)
+        report['latency_max_ms'] = round(latencies[-1] * 1000, 3)
+    return report
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Load-test RoomServer with paired bot clients on localhost')
+    ap.add_argument('--pairs', type=int, default=200)
+    ap.add_argument('--turns', type=int, default=50)
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=0, help='with --connect, port of a running server')
+    ap.add_argument('--connect', action='store_true', help='use an already running server instead of starting one')
+    ap.add_argument('--json', action='store_true', help='do not negotiate the binary protocol')
+    args = ap.parse_args(argv)
+    report = asyncio.run(run_load(args.pairs, args.turns, args.host, args.port,
+                                  binary=not args.json, spawn_server=not args.connect))
+    for k, v in report.items():
+        print(f'{k:<16} {v}')
+    return 1 if report['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,7 +6,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pygame
 from src.core.map import PLAIN, MOUNTAIN, RIVER
-from src.utils.common import hex_neighbors, hex_distance, hex_line
+from src.utils.pathfinding import hex_astar
+from src.core.visibility import compute_fov
+from src.utils.hex_layout import HexLayout
 
 class VisionPathTester:
     def __init__(self, width=60, height=30, cell_size=24, ui_top=64, pad_x=24, pad_top=24):
@@ -17,6 +19,7 @@ class VisionPathTester:
         self.ui_top = ui_top
         self.pad_x = pad_x
         self.pad_top = pad_top
+        self.layout = HexLayout(width, height, cell_size, pad_x, ui_top + pad_top)
         self.running = True
         self.current = PLAIN
         self.font = None
@@ -63,29 +66,16 @@ class VisionPathTester:
         return pygame.font.SysFont(None, size)
 
     def hex_center(self, x, y):
-        cx = self.pad_x + self.cell_size * math.sqrt(3) * (x + 0.5 * (y & 1))
-        cy = self.ui_top + self.pad_top + self.cell_size * 1.5 * y
-        return cx, cy
+        return self.layout.center(x, y)
 
     def pixel_to_hex(self, px, py):
-        ry = (py - (self.ui_top + self.pad_top)) / (1.5 * self.cell_size)
-        y = int(round(ry))
-        if y < 0 or y >= self.height:
-            return None
-        offset = 0.5 * (y & 1) * self.cell_size * math.sqrt(3)
-        rx = (px - self.pad_x - offset) / (self.cell_size * math.sqrt(3))
-        x = int(round(rx))
-        if x < 0 or x >= self.width:
+        x, y = self.layout.pixel_to_hex(px, py)
+        if not self.layout.in_bounds(x, y):
             return None
         return x, y
 
-    def draw_hex(self, cx, cy, color):
-        pts = []
-        for i in range(6):
-            ang = math.pi/180 * (60 * i + 30)
-            px = cx + self.cell_size * math.cos(ang)
-            py = cy + self.cell_size * math.sin(ang)
-            pts.append((px, py))
+    def draw_hex(self, x, y, color):
+        pts = self.layout.corners(x, y)
         pygame.draw.polygon(self.screen, color, pts)
         self.stroke_dashed(pts, (60,60,70), 1)
         return pts
@@ -118,56 +108,14 @@ class VisionPathTester:
         upos = self.unit_pos.get(side)
         if not upos:
             return
-        ux, uy = upos
-        rng = self.vision_range
-        for y in range(self.height):
-            for x in range(self.width):
-                if hex_distance((ux, uy), (x, y)) <= rng:
-                    line = hex_line((ux, uy), (x, y))
-                    blocked = False
-                    for lx, ly in line[1:]:
-                        if lx < 0 or ly < 0 or lx >= self.width or ly >= self.height:
-                            blocked = True
-                            break
-                        if self.grid[ly][lx] == MOUNTAIN:
-                            blocked = True
-                            break
-                    if not blocked:
-                        self.vis_cells.add((x, y))
+        self.vis_cells = compute_fov(self.grid, self.width, self.height, upos, self.vision_range)
 
     def bfs_path(self, start, goal):
-        from collections import deque
+        # 与游戏共用的 A*（名字保留以兼容调用处）
         if not start or not goal:
             return []
-        sx, sy = start
-        tx, ty = goal
-        dq = deque()
-        dq.append((sx, sy))
-        prev = {}
-        seen = {(sx, sy)}
-        while dq:
-            x, y = dq.popleft()
-            if (x, y) == (tx, ty):
-                break
-            for nx, ny in hex_neighbors(x, y):
-                if nx < 0 or ny < 0 or nx >= self.width or ny >= self.height:
-                    continue
-                if (nx, ny) in seen:
-                    continue
-                if self.grid[ny][nx] == PLAIN:
-                    seen.add((nx, ny))
-                    prev[(nx, ny)] = (x, y)
-                    dq.append((nx, ny))
-        path = []
-        cur = (tx, ty)
-        if cur not in prev and cur != (sx, sy):
-            return []
-        while cur != (sx, sy):
-            path.append(cur)
-            cur = prev.get(cur, (sx, sy))
-        path.append((sx, sy))
-        path.reverse()
-        return path
+        grid = self.grid
+        return hex_astar(self.width, self.height).find_path(tuple(start), tuple(goal), lambda x, y: grid[y][x] == PLAIN)
 
     def render(self):
         self.screen.fill((18,18,18))
@@ -182,9 +130,9 @@ class VisionPathTester:
         self.screen.blit(ptxt, (16, 44))
         for y in range(self.height):
             for x in range(self.width):
-                cx, cy = self.hex_center(x, y)
-                pts = self.draw_hex(cx, cy, self.colors[self.grid[y][x]])
+                pts = self.draw_hex(x, y, self.colors[self.grid[y][x]])
                 if self.vision_on and (x, y) in self.vis_cells:
+                    cx, cy = self.hex_center(x, y)
                     s = pygame.Surface((self.cell_size*2, self.cell_size*2), pygame.SRCALPHA)
                     pygame.draw.polygon(s, self.colors['vis'], [(px-cx+self.cell_size, py-cy+self.cell_size) for px, py in pts])
                     self.screen.blit(s, (cx-self.cell_size, cy-self.cell_size))
@@ -0,0 +1,75 @@
+import math
+
+SQRT3 = math.sqrt(3)
+
+class HexLayout:
+    """
+    Pixel geometry of a pointy-top, odd-r offset hex map: cell (x, y) is centred
+    at (ox + size*sqrt(3)*(x + 0.5*(y & 1)), oy + size*1.5*y). Centers are
+    precomputed for every cell and corner lists are built on first use, so the
+    draw code does no trig per frame. Rebuild it (or check matches()) when the
+    cell size, origin or map dimensions change.
+    """
+    def __init__(self, width, height, size, origin_x=0.0, origin_y=0.0):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.dx = size * SQRT3
+        self.dy = size * 1.5
+        # 六个顶点相对格心的偏移（30° 起，每 60° 一个）
+        self.corner_offsets = [(size * math.cos(math.pi / 180 * (60 * i + 30)), size * math.sin(math.pi / 180 * (60 * i + 30))) for i in range(6)]
+        self.centers = [
+            (origin_x + self.dx * (x + 0.5 * (y & 1)), origin_y + self.dy * y)
+            for y in range(height) for x in range(width)
+        ]
+        self._corners = [None] * (width * height)
+
+    def matches(self, width, height, size, origin_x, origin_y):
+        return (self.width == width and self.height == height and self.size == size
+                and self.origin_x == origin_x and self.origin_y == origin_y)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def center(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.centers[y * self.width + x]
+        return (self.origin_x + self.dx * (x + 0.5 * (y & 1)), self.origin_y + self.dy * y)
+
+    def corners(self, x, y):
+        """The six vertices of cell (x, y); cached per cell, do not modify."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            cx, cy = self.center(x, y)
+            return [(cx + ox, cy + oy) for ox, oy in self.corner_offsets]
+        i = y * self.width + x
+        pts = self._corners[i]
+        if pts is None:
+            cx, cy = self.centers[i]
+            pts = self._corners[i] = [(cx + ox, cy + oy) for ox, oy in self.corner_offsets]
+        return pts
+
+    def pixel_to_hex(self, px, py):
+        """
+        Offset coordinates of the cell containing pixel (px, py), exact up to the
+        hex edges: convert to fractional cube coordinates and round. The result
+        may lie outside the map; callers check in_bounds().
+        """
+        fx = (px - self.origin_x) / self.size
+        fy = (py - self.origin_y) / self.size
+        q = SQRT3 / 3 * fx - fy / 3
+        r = 2 / 3 * fy
+        s = -q - r
+        rq = round(q)
+        rr = round(r)
+        rs = round(s)
+        dq = abs(rq - q)
+        dr = abs(rr - r)
+        ds = abs(rs - s)
+        if dq > dr and dq > ds:
+            rq = -rr - rs
+        elif dr > ds:
+            rr = -rq - rs
+        # 轴向坐标转回 odd-r 偏移坐标
+        return int(rq + (rr - (rr & 1)) // 2), int(rr)
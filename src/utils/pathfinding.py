@@ -0,0 +1,189 @@
+import heapq
+from collections import OrderedDict, deque
+from utils.common import hex_neighbors
+
+# 流场中不可达格的距离
+UNREACHABLE = -1
+
+class FlowField:
+    """
+    Reverse BFS distance map towards `goal` over walkable terrain.
+    The goal itself is always seeded (it may be a base, which is not walkable);
+    cells in `blocked` are never expanded. dist[y*width+x] is the step count to
+    the goal, or UNREACHABLE.
+    """
+    def __init__(self, game_map, goal, blocked=()):
+        w = game_map.width
+        h = game_map.height
+        self.width = w
+        self.height = h
+        self.goal = goal
+        dist = [UNREACHABLE] * (w * h)
+        gx, gy = goal
+        if 0 <= gx < w and 0 <= gy < h:
+            blocked = set(blocked)
+            walk = game_map.walkable_flat()
+            dist[gy * w + gx] = 0
+            dq = deque([(gx, gy)])
+            while dq:
+                x, y = dq.popleft()
+                nd = dist[y * w + x] + 1
+                for nx, ny in hex_neighbors(x, y):
+                    if not (0 <= nx < w and 0 <= ny < h):
+                        continue
+                    i = ny * w + nx
+                    if dist[i] != UNREACHABLE or not walk[i] or (nx, ny) in blocked:
+                        continue
+                    dist[i] = nd
+                    dq.append((nx, ny))
+        self.dist = dist
+
+    def distance(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.dist[y * self.width + x]
+        return UNREACHABLE
+
+class FlowFieldCache:
+    """
+    LRU cache of FlowField objects keyed by (goal, blocked). The whole cache is
+    dropped when the map object or its terrain version changes.
+    """
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._fields = OrderedDict()
+        self._map = None
+        self._version = -1
+
+    def _check_map(self, game_map):
+        if game_map is not self._map or game_map.version != self._version:
+            self._fields.clear()
+            self._map = game_map
+            self._version = game_map.version
+
+    def peek(self, game_map, goal, blocked=()):
+        self._check_map(game_map)
+        key = (tuple(goal), tuple(blocked))
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+        return field
+
+    def get(self, game_map, goal, blocked=()):
+        field = self.peek(game_map, goal, blocked)
+        if field is None:
+            goal = tuple(goal)
+            blocked = tuple(blocked)
+            field = FlowField(game_map, goal, blocked)
+            self._fields[(goal, blocked)] = field
+            if len(self._fields) > self.maxsize:
+                self._fields.popitem(last=False)
+        return field
+
+    def __len__(self):
+        return len(self._fields)
+
+class HexAStar:
+    """
+    A* over an odd-r hex grid with the (admissible) hex_distance heuristic.
+    Node buffers are flat lists indexed by cell id (y*width+x) and allocated once;
+    a generation stamp marks which entries belong to the current search, so
+    repeated queries do not reallocate or clear anything.
+
+    passable(x, y) decides which cells may be entered (the goal included),
+    cost(x, y) is the price of entering a cell (>= 1, default 1) and `avoid` is an
+    optional container of extra blocked cells, e.g. occupied positions.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        n = width * height
+        self._g = [0] * n
+        self._parent = [-1] * n
+        self._seen = [0] * n
+        self._closed = [0] * n
+        self._gen = 0
+        self.expanded = 0
+
+    def find_path(self, start, goal, passable, cost=None, avoid=None):
+        """Cheapest path [start, ..., goal] or [] when unreachable."""
+        w = self.width
+        h = self.height
+        sx, sy = start
+        tx, ty = goal
+        if not (0 <= sx < w and 0 <= sy < h and 0 <= tx < w and 0 <= ty < h):
+            return []
+        if (sx, sy) == (tx, ty):
+            return [(sx, sy)]
+        if not passable(tx, ty) or (avoid is not None and (tx, ty) in avoid):
+            return []
+        self._gen += 1
+        gen = self._gen
+        g = self._g
+        parent = self._parent
+        seen = self._seen
+        closed = self._closed
+        # 目标的立方坐标，用于启发式
+        tq = tx - ((ty - (ty & 1)) >> 1)
+        s = sy * w + sx
+        t = ty * w + tx
+        g[s] = 0
+        parent[s] = -1
+        seen[s] = gen
+        heap = [(0, 0, s)]
+        expanded = 0
+        found = False
+        while heap:
+            _, _, i = heapq.heappop(heap)
+            if closed[i] == gen:
+                continue
+            closed[i] = gen
+            expanded += 1
+            if i == t:
+                found = True
+                break
+            x = i % w
+            y = i // w
+            gi = g[i]
+            if y & 1:
+                nbrs = ((x+1,y),(x-1,y),(x,y+1),(x,y-1),(x+1,y+1),(x+1,y-1))
+            else:
+                nbrs = ((x+1,y),(x-1,y),(x,y+1),(x,y-1),(x-1,y+1),(x-1,y-1))
+            for nx, ny in nbrs:
+                if not (0 <= nx < w and 0 <= ny < h):
+                    continue
+                j = ny * w + nx
+                if closed[j] == gen:
+                    continue
+                if not passable(nx, ny) or (avoid is not None and (nx, ny) in avoid):
+                    continue
+                ng = gi + (cost(nx, ny) if cost is not None else 1)
+                if seen[j] == gen and ng >= g[j]:
+                    continue
+                seen[j] = gen
+                g[j] = ng
+                parent[j] = i
+                nq = nx - ((ny - (ny & 1)) >> 1)
+                dq = nq - tq
+                dr = ny - ty
+                hd = max(abs(dq), abs(dr), abs(dq + dr))
+                heapq.heappush(heap, (ng + hd, hd, j))
+        self.expanded = expanded
+        if not found:
+            return []
+        path = []
+        i = t
+        while i != -1:
+            path.append((i % w, i // w))
+            i = parent[i]
+        path.reverse()
+        return path
+
+_ASTARS = {}
+
+def hex_astar(width, height):
+    """Shared HexAStar for a grid size, so buffers are reused across callers."""
+    key = (width, height)
+    a = _ASTARS.get(key)
+    if a is None:
+        a = _ASTARS[key] = HexAStar(width, height)
+    return a
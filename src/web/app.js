@@ -17,6 +17,34 @@ const API = {
     const r = await fetch('/api/state');
     return await r.json();
   },
+  // 订阅 /api/stream：init 给出地图与全部单位，之后每个 tick 只有变化的单位
+  stream(onState, onFail) {
+    if (!window.EventSource) { onFail(); return null; }
+    const es = new EventSource('/api/stream');
+    let state = null;
+    let units = new Map();
+    const publish = ()=>{ state.units = Array.from(units.values()); onState(state); };
+    es.addEventListener('init', e=>{
+      const d = JSON.parse(e.data);
+      units = new Map(d.units.map(u=>[u.id, u]));
+      state = { tick: d.tick, map: d.map, bases: d.bases, units: [] };
+      publish();
+    });
+    es.addEventListener('delta', e=>{
+      if (!state) return;
+      const d = JSON.parse(e.data);
+      for (const u of d.units) units.set(u.id, u);
+      for (const id of d.removed) units.delete(id);
+      if (d.bases) state.bases = d.bases;
+      state.tick = d.tick;
+      publish();
+    });
+    es.onerror = ()=>{
+      // 还没收到 init 就出错：服务器不支持流，退回轮询；否则交给 EventSource 自动重连
+      if (!state) { es.close(); onFail(); }
+    };
+    return es;
+  },
   async control(cmd, value) {
     await fetch('/api/control', { method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({cmd, value}) });
   }
@@ -108,12 +136,17 @@ async function main(){
   speed.oninput = ()=>API.control('speed', parseFloat(speed.value));
   View.init();
   let last = 0; let frames = 0; let fps = 0;
+  let latest = null;
+  let polling = false;
+  API.stream(st=>{ latest = st; }, ()=>{ polling = true; });
   async function loop(ts){
     frames++;
     if (ts - last >= 1000){ fps = frames; frames = 0; last = ts; }
-    const state = await API.state();
-    View.draw(state);
-    stats.textContent = `回合 ${state.tick} | 甲方HP ${state.bases[0].hp} | 乙方HP ${state.bases[1].hp} | FPS ${fps}`;
+    if (polling) latest = await API.state();
+    if (latest) {
+      View.draw(latest);
+      stats.textContent = `回合 ${latest.tick} | 甲方HP ${latest.bases[0].hp} | 乙方HP ${latest.bases[1].hp} | FPS ${fps}`;
+    }
     requestAnimationFrame(loop);
   }
   requestAnimationFrame(loop);
@@ -1,9 +1,10 @@
 import json
 import os
+import queue
 import sys
 import threading
 import time
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import urlparse
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from ai.policy import SimplePolicy
@@ -11,20 +12,124 @@ from simulation.loop import SimulationLoop
 
 ROOT = os.path.dirname(__file__)
 
+def _event(kind, data):
+    return f'event: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode('utf-8')
+
+def _unit_view(u):
+    return {'id': u.uid, 'team': u.team, 'kind': u.kind, 'x': u.x, 'y': u.y, 'hp': u.hp}
+
+def _base_view(b):
+    return {'team': b.team, 'x': b.x, 'y': b.y, 'hp': b.hp}
+
+class TickStream:
+    """
+    Server-Sent-Events feed for /api/stream. A new viewer gets one 'init' event
+    (map, bases, units); after that each tick sends a 'delta' event with only the
+    units that changed (by uid), the removed uids, and the bases if their hp
+    changed. publish() runs on the simulation thread once per loop iteration. It
+    diffs once per tick however many viewers there are, and only enqueues. Each
+    viewer's handler thread does its own socket writes. A viewer whose queue
+    fills up is sent a fresh 'init' instead of the deltas it missed.
+    """
+    def __init__(self, loop, queue_size=64):
+        self.loop = loop
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self._tick = None
+        self._map_key = None
+        self._units = None
+        self._bases = None
+
+    def subscribe(self):
+        q = queue.Queue(self.queue_size)
+        q.needs_init = True
+        with self.lock:
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
+    def _init_event(self, state, units, bases):
+        m = state.map
+        return _event('init', {
+            'tick': state.tick,
+            'map': {'width': m.width, 'height': m.height, 'grid': m.grid},
+            'bases': bases,
+            'units': list(units.values()),
+        })
+
+    def publish(self):
+        with self.lock:
+            subs = list(self.subscribers)
+        if not subs:
+            # 没有观众时不做比较；下一个观众从 init 开始
+            self._tick = None
+            return
+        state = self.loop.state
+        map_key = (id(state.map), state.map.version)
+        if state.tick == self._tick and map_key == self._map_key and not any(q.needs_init for q in subs):
+            return
+        units = {u.uid: _unit_view(u) for u in state.units}
+        bases = [_base_view(state.base_a), _base_view(state.base_b)]
+        delta = None
+        if self._tick is not None and map_key == self._map_key:
+            if state.tick != self._tick:
+                old = self._units
+                changed = [v for uid, v in units.items() if old.get(uid) != v]
+                removed = [uid for uid in old if uid not in units]
+                delta = {'tick': state.tick, 'units': changed, 'removed': removed}
+                if bases != self._bases:
+                    delta['bases'] = bases
+                delta = _event('delta', delta)
+        else:
+            # 地图换了（或第一次）：所有观众重新 init
+            for q in subs:
+                q.needs_init = True
+        self._tick = state.tick
+        self._map_key = map_key
+        self._units = units
+        self._bases = bases
+        init = None
+        for q in subs:
+            if q.needs_init:
+                if init is None:
+                    init = self._init_event(state, units, bases)
+                try:
+                    q.put_nowait(init)
+                    q.needs_init = False
+                except queue.Full:
+                    pass
+            elif delta is not None:
+                try:
+                    q.put_nowait(delta)
+                except queue.Full:
+                    # 观众跟不上：丢掉这一帧，下次发完整 init
+                    q.needs_init = True
+
 class StateHolder:
     def __init__(self, loop):
         self.loop = loop
         self.paused = False
         self.speed = 1.0
+        self.stream = TickStream(loop)
         self.thread = threading.Thread(target=self.run, daemon=True)
 
     def start(self):
         self.thread.start()
 
+    def state_bytes(self, compressed=False):
+        # 处理请求的线程与模拟线程并行：持有 loop.lock，避免把执行到一半的 step 编进快照缓存
+        with self.loop.lock:
+            return self.loop.state.snapshot_bytes(compressed=compressed)
+
     def run(self):
         while True:
             if not self.paused:
                 self.loop.step()
+            self.stream.publish()
             time.sleep(max(0.0, 0.016 / max(0.1, self.speed)))
 
 class Handler(SimpleHTTPRequestHandler):
@@ -39,8 +144,26 @@ class Handler(SimpleHTTPRequestHandler):
         return os.path.join(ROOT, p)
 
     def do_GET(self):
+        if self.path.startswith('/api/stream'):
+            self._stream()
+            return
         if self.path.startswith('/api/state'):
-            body = json.dumps(self.holder.loop.state.serialize()).encode('utf-8')
+            # 同一 tick 的所有请求共用一份编码（及其 gzip）
+            gz = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = self.holder.state_bytes(compressed=gz)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-cache')
+            if gz:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.startswith('/api/profile'):
+            # 分阶段计时报告；未开启时为空对象（POST /api/control {"cmd": "profile"} 切换）
+            prof = self.holder.loop.profiler
+            body = json.dumps({'enabled': prof.enabled, 'ticks': getattr(prof, 'ticks', 0), 'phases': prof.report()}).encode('utf-8')
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Cache-Control', 'no-cache')
@@ -50,6 +173,25 @@ class Handler(SimpleHTTPRequestHandler):
             return
         return super().do_GET()
 
+    def _stream(self):
+        q = self.holder.stream.subscribe()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    data = q.get(timeout=15)
+                except queue.Empty:
+                    data = b': ping\n\n'  # 保活，顺便发现断开的连接
+                self.wfile.write(data)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.holder.stream.unsubscribe(q)
+
     def do_POST(self):
         if self.path.startswith('/api/control'):
             length = int(self.headers.get('Content-Length','0'))
@@ -66,6 +208,10 @@ class Handler(SimpleHTTPRequestHandler):
             elif cmd == 'speed':
                 v = float(data.get('value', 1.0))
                 self.holder.speed = max(0.1, min(3.0, v))
+            elif cmd == 'profile':
+                loop = self.holder.loop
+                with loop.lock:
+                    loop.enable_profiling(bool(data.get('value', not loop.profiler.enabled)))
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
@@ -79,7 +225,9 @@ def main():
     holder = StateHolder(loop)
     Handler.holder = holder
     holder.start()
-    server = HTTPServer(('localhost', 8000), Handler)
+    # 每个请求一个线程：长连接的 /api/stream 不会挡住其它请求
+    server = ThreadingHTTPServer(('localhost', 8000), Handler)
+    server.daemon_threads = True
     server.serve_forever()
 
 if __name__ == '__main__':
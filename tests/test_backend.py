@@ -0,0 +1,60 @@
+import unittest
+import random
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core import backend
+from core.map import generate
+from core.state import GameState
+from core.visibility import compute_side_visibility, VisibilityTracker
+
+@unittest.skipIf(backend.np is None, 'numpy not installed')
+class TestNumpyBackend(unittest.TestCase):
+    def setUp(self):
+        self.saved = backend.get_backend()
+
+    def tearDown(self):
+        backend.set_backend(self.saved)
+
+    def _with_backend(self, name, fn):
+        backend.set_backend(name)
+        return fn()
+
+    def test_same_map_for_seed(self):
+        for seed, (w, h) in [(1, (40, 20)), (2, (61, 31)), (3, (120, 60))]:
+            def gen():
+                random.seed(seed)
+                return generate(w, h).grid
+            self.assertEqual(self._with_backend('python', gen), self._with_backend('numpy', gen))
+
+    def test_same_visibility(self):
+        random.seed(4)
+        state = GameState(40, 20, seed=4)
+        for i in range(40):
+            pos = (random.randrange(40), random.randrange(20))
+            state.add_unit(state.spawn_unit('A' if i % 2 else 'B', pos, random.choice(['Scout', 'Infantry', 'Archer'])))
+        for side in ('A', 'B'):
+            for reveal in (False, True):
+                py = self._with_backend('python', lambda: compute_side_visibility(state, side, include_base=reveal, reveal_blockers=reveal))
+                nv = self._with_backend('numpy', lambda: compute_side_visibility(state, side, include_base=reveal, reveal_blockers=reveal))
+                self.assertEqual(py, nv)
+                tracked = self._with_backend('numpy', lambda: VisibilityTracker(include_base=reveal, reveal_blockers=reveal, batch_min=1).update(state, side))
+                self.assertEqual(tracked, py)
+
+    def test_walkable_mask(self):
+        m = GameState(40, 20, seed=5).map
+        expect = [m.can_walk(x, y) for y in range(20) for x in range(40)]
+        for name in ('python', 'numpy'):
+            m._walk = None
+            self.assertEqual(self._with_backend(name, m.walkable_flat), expect)
+        # 修改地形后缓存失效
+        x, y = expect.index(True) % 40, expect.index(True) // 40
+        m.set_tile(x, y, '#')
+        self.assertFalse(m.walkable_flat()[y * 40 + x])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+import batch
+
+class TestBatchRunner(unittest.TestCase):
+    def test_two_seeds_jsonl_and_csv(self):
+        tmp = tempfile.mkdtemp()
+        common = ['-n', '2', '--seed', '5', '--size', '30x16', '--max-ticks', '40', '--workers', '1']
+        batch.main(common + ['-o', os.path.join(tmp, 'out.jsonl')])
+        batch.main(common + ['-o', os.path.join(tmp, 'out.csv')])
+        with open(os.path.join(tmp, 'out.jsonl'), encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        with open(os.path.join(tmp, 'out.csv'), encoding='utf-8', newline='') as f:
+            crow = list(csv.DictReader(f))
+        self.assertEqual([r['seed'] for r in rows], [5, 6])
+        for r, c in zip(rows, crow):
+            self.assertEqual(set(r), set(batch.FIELDS))
+            self.assertIn(r['winner'], ('A', 'B', 'draw', None))
+            self.assertTrue(0 < r['ticks'] <= 40)
+            self.assertEqual((r['width'], r['height']), (30, 16))
+            self.assertTrue(0 <= r['base_a_hp'] and 0 <= r['base_b_hp'])
+            self.assertTrue(isinstance(r['units_a'], int) and isinstance(r['units_b'], int))
+            # 同一种子结果可复现：两种输出格式除耗时外一致
+            for k in ('seed', 'winner', 'ticks', 'units_a', 'units_b', 'base_a_hp', 'base_b_hp'):
+                self.assertEqual(c[k], '' if r[k] is None else str(r[k]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import math
+import random
+import unittest
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from utils.hex_layout import HexLayout
+
+class TestHexLayout(unittest.TestCase):
+    def test_centers_and_corners(self):
+        lay = HexLayout(7, 5, 10.0, 24, 88)
+        for y in range(5):
+            for x in range(7):
+                cx = 24 + 10.0 * math.sqrt(3) * (x + 0.5 * (y & 1))
+                cy = 88 + 10.0 * 1.5 * y
+                self.assertEqual(lay.center(x, y), (cx, cy))
+                for i, (px, py) in enumerate(lay.corners(x, y)):
+                    ang = math.pi/180 * (60 * i + 30)
+                    self.assertAlmostEqual(px, cx + 10.0 * math.cos(ang))
+                    self.assertAlmostEqual(py, cy + 10.0 * math.sin(ang))
+        self.assertIs(lay.corners(3, 2), lay.corners(3, 2))
+
+    def test_pixel_to_hex_is_nearest_center(self):
+        # 六边形格子即格心的 Voronoi 区域：随机像素应落在最近格心所在的格子（含地图外一圈）
+        lay = HexLayout(12, 9, 17.0, 30, 60)
+        rng = random.Random(1)
+        for _ in range(3000):
+            px = rng.uniform(30, 30 + 17.0 * math.sqrt(3) * 12)
+            py = rng.uniform(60, 60 + 17.0 * 1.5 * 8)
+            want = min(((x, y) for y in range(-1, 10) for x in range(-1, 13)),
+                       key=lambda c: math.dist(lay.center(*c), (px, py)))
+            got = lay.pixel_to_hex(px, py)
+            if got != want:
+                # 只允许恰好落在两格分界线上的像素
+                self.assertAlmostEqual(math.dist(lay.center(*got), (px, py)), math.dist(lay.center(*want), (px, py)), places=6)
+        self.assertEqual(lay.pixel_to_hex(*lay.center(11, 8)), (11, 8))
+        self.assertFalse(lay.in_bounds(*lay.pixel_to_hex(0, 0)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import socket
+import tempfile
+import time
+import unittest
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core.state import GameState
+from network.protocol import FrameDecoder, ProtocolError, encode, negotiate, JSON, BIN1
+from network.client import GameClient
+from network.server import GameServer, SpectatorFeed
+from network.room_server import RoomServer
+from tools.room_load_test import Bot, run_load
+
+def wait_for(client, mtype, timeout=5.0):
+    # 返回第一条 mtype 消息及其之前收到的消息；之后的消息留给下一次调用
+    pending = client.__dict__.setdefault('pending', [])
+    end = time.time() + timeout
+    while time.time() < end:
+        pending.extend(client.get_messages())
+        for i, m in enumerate(pending):
+            if m.get('type') == mtype:
+                seen = pending[:i + 1]
+                del pending[:i + 1]
+                return m, seen
+        time.sleep(0.01)
+    raise AssertionError(f'no {mtype} message, got {[m.get("type") for m in pending]}')
+
+def sample_messages():
+    state = GameState(40, 20, seed=3)
+    return [
+        {'type': 'assign', 'team': 'A'},
+        {'type': 'start', 'config': {'mode': 'file', 'data': state.serialize(), 'seed': 3}},
+        {'type': 'actions', 'data': [{'type': 'move', 'unit_id': 7, 'target': [3, -1]}], 'checksum': 'ab' * 16},
+        {'type': 'turn_data', 'actions': {'A': [], 'B': []}, 'timestamp': 1.5, 'ok': True, 'none': None},
+    ]
+
+class TestProtocol(unittest.TestCase):
+    def test_roundtrip_both_protocols(self):
+        msgs = sample_messages()
+        for protocol in (JSON, BIN1):
+            dec = FrameDecoder()
+            dec.feed(b''.join(encode(m, protocol) for m in msgs))
+            self.assertEqual(list(dec), msgs)
+
+    def test_binary_map_is_smaller(self):
+        start = sample_messages()[1]
+        self.assertLess(len(encode(start, BIN1)), len(encode(start, JSON)) // 2)
+
+    def test_split_and_mixed_stream(self):
+        # 两种帧交替、逐字节到达，解码结果不变
+        msgs = sample_messages()
+        data = b''.join(encode(m, (JSON, BIN1)[i % 2]) for i, m in enumerate(msgs))
+        dec = FrameDecoder()
+        out = []
+        for i in range(len(data)):
+            dec.feed(data[i:i + 1])
+            out.extend(dec)
+        self.assertEqual(out, msgs)
+        self.assertEqual(len(dec.buf), 0)
+
+    def test_malformed_frames_are_skipped(self):
+        # 每条坏帧只报一次错，之后的消息照常解码
+        good = {'type': 'ping', 'n': 1}
+        bad = [
+            b'\xb1\x00\x00\x00\x01\xff',                   # 未知标记
+            b'\xb1\x00\x00\x00\x02\xd3\x01',               # 截断的整数
+            b'\xb1\x00\x00\x00\x02\x01\x02',               # 多余字节
+            b'\xb1\xff\xff\xff\xff' + b'x' * 100,            # 超大帧，负载边到边丢
+            b'{not json\n',
+        ]
+        errors = 0
+        for frame in bad:
+            dec = FrameDecoder()
+            dec.feed(frame + encode(good, BIN1))
+            out = []
+            for _ in range(3):
+                try:
+                    msg = dec.next_message()
+                except (ProtocolError, ValueError):
+                    errors += 1
+                    continue
+                if msg is not None:
+                    out.append(msg)
+            self.assertEqual(out, [] if frame.startswith(b'\xb1\xff') else [good])
+        self.assertEqual(errors, len(bad))
+        with self.assertRaises(ProtocolError):
+            encode({'n': 2 ** 63}, BIN1)
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate(['bin1', 'json']), BIN1)
+        self.assertEqual(negotiate(['msgpack']), JSON)
+        self.assertEqual(negotiate(None), JSON)
+
+class TestSpectators(unittest.TestCase):
+    def test_late_joiner_catches_up_from_keyframe(self):
+        replay = os.path.join(tempfile.mkdtemp(), 'replay.jsonl')
+        server = GameServer('127.0.0.1', 0, spectator_port=0, replay_path=replay, keyframe_interval=2)
+        server.set_game_config({'mode': 'random', 'seed': 5}, 'A')
+        server.start()
+        port = server.server_socket.getsockname()[1]
+        clients = []
+        try:
+            early = GameClient()
+            self.assertTrue(early.connect('127.0.0.1', server.spectator_port))
+            host, guest = GameClient(), GameClient()
+            clients += [early, host, guest]
+            host.connect('127.0.0.1', port)
+            wait_for(host, 'assign')
+            guest.connect('127.0.0.1', port)
+            wait_for(guest, 'start')
+            for turn in range(3):
+                host.send_actions([{'kind': 'recruit', 'turn': turn}], 'c')
+                guest.send_actions([], 'c')
+                wait_for(guest, 'turn_data')
+                msg, _ = wait_for(host, 'turn_data')
+                if turn == 1:
+                    req, _ = wait_for(host, 'keyframe_request')
+                    host.send_keyframe(req['turn'], {'tick': 2})
+                    time.sleep(0.2)
+            time.sleep(0.2)
+            _, seen = wait_for(early, 'turn')
+            seen += early.pending + early.get_messages()
+            self.assertEqual([m['turn'] for m in seen if m['type'] == 'turn'], [0, 1, 2])
+
+            late = GameClient()
+            clients.append(late)
+            late.connect('127.0.0.1', server.spectator_port)
+            init, _ = wait_for(late, 'spectate_init')
+            self.assertEqual(init['config']['seed'], 5)
+            self.assertEqual(init['keyframe'], {'turn': 2, 'state': {'tick': 2}})
+            self.assertEqual([t['turn'] for t in init['turns']], [2])
+            self.assertEqual(init['turns'][0]['actions']['A'], [{'kind': 'recruit', 'turn': 2}])
+            self.assertTrue(init['complete'])
+        finally:
+            for c in clients:
+                c.close()
+            server.stop()
+        with open(replay, encoding='utf-8') as f:
+            kinds = [json.loads(line)['type'] for line in f]
+        self.assertEqual(kinds, ['start', 'turn', 'turn', 'keyframe', 'turn'])
+
+    def test_turns_bounded_without_keyframes(self):
+        # 房主从不回关键帧：追帧包只带最近 max_deltas 个回合并标记不完整
+        feed = SpectatorFeed(keyframe_interval=2, max_deltas=5)
+        feed.start({'mode': 'random'})
+        for i in range(3):
+            feed.add_turn({'A': [i], 'B': []})
+        self.assertTrue(feed.catch_up()['complete'])
+        for i in range(3, 40):
+            feed.add_turn({'A': [i], 'B': []})
+        init = feed.catch_up()
+        self.assertEqual([t['turn'] for t in init['turns']], list(range(35, 40)))
+        self.assertFalse(init['complete'])
+        self.assertTrue(feed.add_keyframe(40, {'tick': 40}))
+        init = feed.catch_up()
+        self.assertEqual((init['turns'], init['complete']), ([], True))
+        feed.close()
+
+    def test_slow_spectator_does_not_block(self):
+        # 对端从不读取：发送线程卡在 sendall，队列满后改为追帧包，publish 始终立即返回
+        feed = SpectatorFeed(queue_size=2)
+        feed.start({'mode': 'random'})
+        a, b = socket.socketpair()
+        try:
+            feed.add_spectator(a)
+            t = time.perf_counter()
+            for i in range(50):
+                feed.add_turn({'A': ['x' * 100000], 'B': []})
+            self.assertLess(time.perf_counter() - t, 2.0)
+            q = feed.spectators[a][0]
+            self.assertLessEqual(len(q.items), 2)
+        finally:
+            feed.close()
+            b.close()
+
+class TestRoomServer(unittest.TestCase):
+    def test_rooms_are_independent(self):
+        # 多个房间并行推进回合，只有故意不一致的那个房间报告 desync
+        for binary in (True, False):
+            report = asyncio.run(run_load(4, 5, binary=binary, desync_rooms=1))
+            self.assertEqual(report['errors'], 0)
+            self.assertEqual(report['turns_completed'], 20)
+            self.assertEqual(report['server']['turns'], 20)
+            self.assertEqual(report['desyncs_seen'], 1)
+
+    def test_default_room_config_has_seed(self):
+        # 两名玩家都没带配置时，由房间定种子，双方生成同一张随机地图
+        room = RoomServer()._find_room(None, None, None)
+        self.assertEqual(room.config['mode'], 'random')
+        self.assertIsInstance(room.config['seed'], int)
+
+    def test_bad_client_is_dropped(self):
+        # 发送坏帧的连接被断开，同时进行的房间照常完成
+        async def scenario():
+            server = await RoomServer('127.0.0.1', 0).start()
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(b'\xb1\x00\x00\x00\x01\xff')
+                await writer.drain()
+                self.assertEqual(await asyncio.wait_for(reader.read(), 5), b'')
+                writer.close()
+                bots = [Bot('127.0.0.1', server.port, 'r1', 3) for _ in range(2)]
+                await asyncio.wait_for(asyncio.gather(*(b.run() for b in bots)), 5)
+                return [len(b.latencies) for b in bots], server.stats()
+            finally:
+                await server.stop()
+        done, stats = asyncio.run(scenario())
+        self.assertEqual(done, [3, 3])
+        self.assertEqual(stats['turns'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core.map import Map, MOUNTAIN
+from utils.common import hex_neighbors
+from utils.pathfinding import FlowField, FlowFieldCache, UNREACHABLE, HexAStar
+
+def walled_map():
+    # 中间一道竖墙，只在最下面一行留缺口
+    m = Map(16, 10)
+    for y in range(9):
+        m.set_tile(8, y, MOUNTAIN)
+    return m
+
+class TestFlowField(unittest.TestCase):
+    def test_distances_follow_walkable_steps(self):
+        m = walled_map()
+        field = FlowField(m, (12, 2))
+        self.assertEqual(field.distance(12, 2), 0)
+        self.assertEqual(field.distance(8, 0), UNREACHABLE)
+        for y in range(m.height):
+            for x in range(m.width):
+                d = field.distance(x, y)
+                if d <= 0:
+                    continue
+                # 每个可达格都有一个邻居恰好近一步
+                nd = [field.distance(nx, ny) for nx, ny in hex_neighbors(x, y) if m.in_bounds(nx, ny)]
+                self.assertIn(d - 1, nd)
+        # 绕墙比直线远得多
+        self.assertGreater(field.distance(4, 2), 8)
+
+    def test_cache_lru_and_invalidation(self):
+        m = walled_map()
+        cache = FlowFieldCache(maxsize=2)
+        f1 = cache.get(m, (12, 2))
+        self.assertIs(cache.get(m, (12, 2)), f1)
+        cache.get(m, (1, 1))
+        cache.get(m, (3, 3))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.peek(m, (12, 2)))
+        m.set_tile(8, 9, MOUNTAIN)
+        self.assertIsNone(cache.peek(m, (3, 3)))
+        self.assertEqual(cache.get(m, (12, 2)).distance(4, 2), UNREACHABLE)
+
+class TestHexAStar(unittest.TestCase):
+    def test_shortest_paths_match_flow_field(self):
+        m = walled_map()
+        astar = HexAStar(m.width, m.height)
+        field = FlowField(m, (12, 2))
+        for start in [(0, 0), (4, 2), (7, 8), (15, 9), (12, 2)]:
+            path = astar.find_path(start, (12, 2), m.can_walk)
+            self.assertEqual(len(path) - 1, field.distance(*start))
+            self.assertEqual(path[0], start)
+            for (ax, ay), b in zip(path, path[1:]):
+                self.assertIn(b, hex_neighbors(ax, ay))
+                self.assertTrue(m.can_walk(*b))
+        self.assertEqual(astar.find_path((0, 0), (8, 0), m.can_walk), [])
+
+    def test_avoid_and_costs(self):
+        m = walled_map()
+        astar = HexAStar(m.width, m.height)
+        # 堵住缺口后无路可走
+        self.assertEqual(astar.find_path((4, 2), (12, 2), m.can_walk, avoid={(8, 9)}), [])
+        straight = astar.find_path((0, 4), (6, 4), m.can_walk)
+        self.assertEqual(len(straight), 7)
+        # 第 4 行代价很高时绕行
+        costly = astar.find_path((0, 4), (6, 4), m.can_walk, cost=lambda x, y: 10 if y == 4 and x not in (0, 6) else 1)
+        self.assertTrue(all(y != 4 for x, y in costly[1:-1]))
+
+if __name__ == '__main__':
+    unittest.main()
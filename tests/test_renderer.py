@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from core.state import GameState
+from ai.policy import Action
+from ai.unit_policies import CompositePolicy
+from simulation.loop import SimulationLoop
+
+@unittest.skipIf(pygame is None, 'pygame not installed')
+class TestDirtyRendering(unittest.TestCase):
+    def setUp(self):
+        from renderer.pygame_renderer import PygameRenderer
+        self.loop = SimulationLoop(CompositePolicy(), None, initial_state=GameState(30, 16, seed=7))
+        for _ in range(10):
+            self.loop.step()
+        self.r = PygameRenderer()
+        self.r.fps = 0
+        self.r.view_mode = 'A'
+
+    def tearDown(self):
+        self.r.close()
+
+    def _render(self):
+        # 记录真正提交到窗口的内容：flip 提交整屏，update 只提交给出的矩形
+        st = self.loop.state
+        with mock.patch('pygame.display.flip') as flip, mock.patch('pygame.display.update') as update:
+            self.r.render(st, st.tick)
+        if flip.called:
+            self.shown = self.r.screen.copy()
+        for call in update.call_args_list:
+            for rect in call.args[0]:
+                self.shown.blit(self.r.screen, rect, rect)
+        return flip.call_count, update.call_count
+
+    def _shown(self):
+        return pygame.image.tostring(self.shown, 'RGB')
+
+    def _full_redraw(self):
+        self.r.invalidate()
+        self._render()
+        return self._shown()
+
+    def test_dirty_path_matches_full_redraw(self):
+        self._render()
+        self._render()
+        # 状态与界面都没变：不画也不提交
+        self.assertEqual(self._render(), (0, 0))
+        u = next(u for u in self.loop.state.units if u.team == 'A')
+        self.r.preview_actions = {u: Action('move_towards', (u.x + 2, u.y))}
+        self.r.preview_paths = {u: [(u.x, u.y), (u.x + 1, u.y), (u.x + 2, u.y)]}
+        self.r.preview_recruits = [{'kind': 'Archer', 'team': 'A', 'pos': (u.x, u.y + 1)}]
+        self.r.paused = True
+        self.assertEqual(self._render(), (0, 1))
+        dirty = self._shown()
+        self.assertEqual(dirty, self._full_redraw())
+        # 撤掉预览后，旧区域也必须重新提交
+        self.r.preview_actions = {}
+        self.r.preview_paths = {}
+        self.r.preview_recruits = []
+        self.assertEqual(self._render(), (0, 1))
+        dirty = self._shown()
+        self.assertEqual(dirty, self._full_redraw())
+        # 新的 tick：整屏重画
+        self.loop.step()
+        self.assertEqual(self._render(), (1, 0))
+
+if __name__ == '__main__':
+    unittest.main()
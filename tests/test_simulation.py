@@ -1,3 +1,4 @@
+import json
 import unittest
 import sys
 import os
@@ -31,5 +32,163 @@ class TestSimulation(unittest.TestCase):
         cont = loop.step()
         self.assertFalse(cont)
 
+    def test_explored_round_trip(self):
+        state = GameState(20, 10)
+        state.record_explored('A', [(0, 0), (5, 3), (19, 9)])
+        data = state.serialize()
+        self.assertEqual(data['explored']['A'], [(0, 0), (5, 3), (19, 9)])
+        restored = GameState.deserialize(json.loads(json.dumps(data)))
+        self.assertTrue(restored.is_explored('A', 5, 3))
+        self.assertFalse(restored.is_explored('B', 5, 3))
+        self.assertAlmostEqual(restored.get_explored_ratio('A'), 3 / 200)
+        self.assertEqual(json.dumps(restored.serialize()['explored']), json.dumps(data['explored']))
+
+    def test_unit_store_and_occupancy(self):
+        state = GameState(20, 10)
+        units = [state.spawn_unit('A' if i % 2 else 'B', (i, 2), 'Infantry') for i in range(6)]
+        for u in units:
+            state.add_unit(u)
+        self.assertEqual([u.uid for u in state.units], list(range(6)))
+        state.remove_units([units[1], units[4]])
+        state.move_unit(units[2], 2, 5)
+        self.assertEqual([u.uid for u in state.units], [0, 2, 3, 5])
+        self.assertEqual(state.occupied, {(0, 2): 0, (2, 5): 2, (3, 2): 3, (5, 2): 5})
+        restored = GameState.deserialize(json.loads(json.dumps(state.serialize())))
+        self.assertEqual([u.uid for u in restored.units], [0, 2, 3, 5])
+        self.assertEqual(restored.occupied, state.occupied)
+        self.assertEqual(restored.get_checksum(), state.get_checksum())
+        restored.add_unit(restored.spawn_unit('A', (9, 9), 'Scout'))
+        self.assertEqual(restored.units[-1].uid, 6)
+
+    def test_exploration_targets(self):
+        from core.map import MOUNTAIN
+        from utils.common import hex_distance
+        state = GameState(30, 16)
+        home = state.base_a.pos()
+        targets = state.exploration_targets('A')
+        best = max((hex_distance(home, c), -c[1], -c[0]) for c in targets)
+        self.assertEqual(targets[0], (-best[2], -best[1]))
+        self.assertIs(state.exploration_targets('A'), targets)
+        # 地形变化后重新计算
+        state.map.set_tile(targets[0][0], targets[0][1], MOUNTAIN)
+        self.assertNotIn(targets[0], state.exploration_targets('A'))
+
+    def test_frontier_targets_spread(self):
+        from utils.common import hex_distance
+        state = GameState(40, 20)
+        s1 = state.spawn_unit('A', state.base_a.pos(), 'Scout')
+        s2 = state.spawn_unit('A', state.base_a.pos(), 'Scout')
+        state.add_unit(s1)
+        state.add_unit(s2)
+        g1 = state.frontier_target(s1)
+        g2 = state.frontier_target(s2)
+        self.assertGreater(hex_distance(g1, g2), s2.vision)
+        self.assertEqual(state.frontier_target(s1), g1)
+        state.record_explored('A', [g1])
+        self.assertNotEqual(state.frontier_target(s1), g1)
+
+    def test_seed_reproduces_game(self):
+        from ai.unit_policies import CompositePolicy
+        def play(seed):
+            loop = SimulationLoop(CompositePolicy(), initial_state=GameState(30, 16, seed=seed))
+            for _ in range(40):
+                loop.step()
+            return loop.state.get_checksum()
+        self.assertEqual(play(11), play(11))
+        self.assertNotEqual(play(11), play(12))
+        # 反序列化沿用存档中的种子
+        state = GameState(30, 16, seed=5)
+        self.assertEqual(GameState.deserialize(json.loads(json.dumps(state.serialize()))).seed, 5)
+
+    def test_profiler_reports_phases(self):
+        loop = SimulationLoop(SimplePolicy(), initial_state=GameState(30, 16, seed=2))
+        self.assertFalse(loop.profiler.enabled)
+        prof = loop.enable_profiling()
+        for _ in range(5):
+            loop.step()
+        rep = json.loads(prof.dump())
+        self.assertEqual(rep['ticks'], 5)
+        for name in ('tick', 'visibility', 'collect_actions', 'spawn', 'resolve_attacks', 'resolve_movements'):
+            self.assertEqual(rep['phases'][name]['calls'], 5)
+            r = rep['phases'][name]
+            self.assertTrue(r['p50_ms'] <= r['p95_ms'] <= r['max_ms'])
+
+    def test_incremental_checksum(self):
+        from ai.unit_policies import CompositePolicy
+        loop = SimulationLoop(CompositePolicy(), initial_state=GameState(30, 16, seed=3))
+        state = loop.state
+        for _ in range(60):
+            loop.step()
+            self.assertTrue(state.verify_checksum())
+        u = state.units[0]
+        before = state.get_checksum()
+        x, y = u.pos()
+        state.move_unit(u, x, y + 1 if y == 0 else y - 1)
+        self.assertNotEqual(state.get_checksum(), before)
+        state.move_unit(u, x, y)
+        self.assertEqual(state.get_checksum(), before)
+        state.apply_damage(u, 1)
+        self.assertNotEqual(state.get_checksum(), before)
+        # 绕过 GameState 的修改会被全量校验发现
+        u.hp += 5
+        self.assertRaises(RuntimeError, state.verify_checksum)
+
+    def test_snapshot_cache(self):
+        import gzip
+        from ai.unit_policies import CompositePolicy
+        loop = SimulationLoop(CompositePolicy(), initial_state=GameState(30, 16, seed=3))
+        state = loop.state
+        for _ in range(30):
+            loop.step()
+            snap = state.snapshot()
+            self.assertIs(state.serialize(), snap)
+            # 与从头序列化（清空缓存）的结果一致，编码后的字节也一致
+            state._unit_views = {}
+            state._explored_views = {}
+            state._snapshot = None
+            self.assertEqual(state.snapshot(), snap)
+            self.assertEqual(json.loads(state.snapshot_bytes()), json.loads(json.dumps(snap)))
+        self.assertEqual(gzip.decompress(state.snapshot_bytes(compressed=True)), state.snapshot_bytes())
+        snap = state.snapshot()
+        state.apply_damage(state.base_a, 1)
+        self.assertIsNot(state.snapshot(), snap)
+        self.assertEqual(state.snapshot()['bases'][0]['hp'], snap['bases'][0]['hp'] - 1)
+        self.assertIs(state.snapshot()['map'], snap['map'])
+
+    def test_simulation_worker(self):
+        import time
+        from ai.unit_policies import CompositePolicy
+        from simulation.worker import SimulationWorker
+        loop = SimulationLoop(CompositePolicy(), renderer='r', initial_state=GameState(30, 16, seed=3))
+        worker = SimulationWorker(loop, tick_rate=500)
+        worker.start()
+        self.assertIsNone(loop.renderer)
+        try:
+            first = worker.latest()[0]
+            seen = (first.tick, [(u.uid, u.x, u.y, u.hp) for u in first.units])
+            end = time.time() + 5
+            while worker.latest()[0].tick < 20 and time.time() < end:
+                time.sleep(0.01)
+            frame, prev, alpha = worker.latest()
+            self.assertGreaterEqual(frame.tick, 20)
+            self.assertEqual(prev.tick + 1, frame.tick)
+            self.assertTrue(0.0 <= alpha <= 1.0)
+            # 快照不随后续 tick 改变
+            self.assertEqual((first.tick, [(u.uid, u.x, u.y, u.hp) for u in first.units]), seen)
+            worker.paused = True
+            time.sleep(0.05)
+            frame = worker.latest()[0]
+            with loop.lock:
+                self.assertEqual(frame.tick, loop.state.tick)
+                self.assertEqual(sorted(frame.positions.items()), sorted((u.uid, u.pos()) for u in loop.state.units))
+            # 渲染线程记录的探索格由模拟线程写回实际状态
+            cells = [(x, y) for y in range(16) for x in range(30)]
+            frame.record_explored('A', cells)
+            time.sleep(0.1)
+            self.assertEqual(loop.state.get_explored_ratio('A'), 1.0)
+        finally:
+            worker.stop()
+        self.assertEqual(loop.renderer, 'r')
+
 if __name__ == '__main__':
     unittest.main()
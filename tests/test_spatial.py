@@ -0,0 +1,77 @@
+import random
+import unittest
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core.state import GameState
+from utils.common import hex_distance
+
+def brute_nearest(state, unit, max_radius=None):
+    # 旧策略的线性扫描：单位按列表顺序优先，基地只有更近时才替换
+    tgt = None; md = 10**9
+    for e in state.units + [state.base_a, state.base_b]:
+        if e.team != unit.team:
+            d = hex_distance(unit.pos(), e.pos())
+            if (max_radius is None or d <= max_radius) and d < md:
+                md = d; tgt = e
+    return tgt
+
+class TestSpatialIndex(unittest.TestCase):
+    def _populated(self, seed, n=120):
+        rng = random.Random(seed)
+        state = GameState(60, 30)
+        kinds = ['Infantry', 'Archer', 'Scout']
+        for _ in range(n):
+            pos = (rng.randrange(60), rng.randrange(30))
+            state.add_unit(state.spawn_unit(rng.choice('AB'), pos, rng.choice(kinds)))
+        return state, rng
+
+    def test_nearest_matches_linear_scan(self):
+        for seed in range(5):
+            state, rng = self._populated(seed)
+            for step in range(3):
+                for u in state.units:
+                    for r in (None, u.vision, 2):
+                        tgt, _ = state.nearest_enemy(u, r)
+                        self.assertIs(tgt, brute_nearest(state, u, r))
+                # 移动、删除后索引仍然一致
+                for u in list(state.units):
+                    if rng.random() < 0.3:
+                        state.move_unit(u, rng.randrange(60), rng.randrange(30))
+                for u in rng.sample(state.units, 10):
+                    state.remove_unit(u)
+
+    def test_enemies_within(self):
+        state, rng = self._populated(7)
+        for _ in range(50):
+            pos = (rng.randrange(60), rng.randrange(30))
+            r = rng.randrange(0, 8)
+            want = [u for u in state.units if u.team != 'A' and hex_distance(pos, u.pos()) <= r]
+            self.assertEqual(state.enemies_within(pos, r, 'A'), want)
+
+    def test_unbounded_nearest_does_not_scan_buckets(self):
+        # 无半径查询的扩展圈数由插入时维护的范围决定，不再每次遍历全部桶
+        class CountingDict(dict):
+            iters = 0
+            def __iter__(self):
+                CountingDict.iters += 1
+                return super().__iter__()
+        state, rng = self._populated(3, n=200)
+        state.spatial._buckets = CountingDict(state.spatial._buckets)
+        for u in state.units:
+            self.assertIs(state.nearest_enemy(u)[0], brute_nearest(state, u))
+        self.assertEqual(CountingDict.iters, 0)
+        # 删除单位后范围不收缩，远处唯一的敌人仍能找到
+        a = next(u for u in state.units if u.team == 'A')
+        far = max((u for u in state.units if u.team == 'B'), key=lambda u: hex_distance(a.pos(), u.pos()))
+        for u in list(state.units):
+            if u.team == 'B' and u is not far:
+                state.remove_unit(u)
+        self.assertIs(state.spatial.nearest('B', a.pos())[0], far)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import random
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core.state import GameState
+from core.map import MOUNTAIN
+from core.visibility import compute_fov
+from simulation.loop import SimulationLoop
+from ai.policy import SimplePolicy
+from utils.common import hex_distance, hex_line
+
+def reference_visibility(state, side):
+    # 旧实现：逐格扫描整张地图并对每格做 hex_line
+    vis = set()
+    for u in [u for u in state.units if u.team == side]:
+        ux, uy = u.pos()
+        for y in range(state.map.height):
+            for x in range(state.map.width):
+                if hex_distance((ux, uy), (x, y)) <= u.vision:
+                    blocked = False
+                    for lx, ly in hex_line((ux, uy), (x, y))[1:]:
+                        if not state.map.in_bounds(lx, ly) or state.map.grid[ly][lx] == MOUNTAIN:
+                            blocked = True
+                            break
+                    if not blocked:
+                        vis.add((x, y))
+    return vis
+
+def reference_fov_seeing_blockers(grid, width, height, origin, r):
+    # 旧 PygameRenderer.compute_visibility 的单个视点规则：阻挡的山地本身可见
+    vis = set()
+    ex, ey = origin
+    for y in range(max(0, ey - r), min(height - 1, ey + r) + 1):
+        for x in range(max(0, ex - r), min(width - 1, ex + r) + 1):
+            if hex_distance(origin, (x, y)) > r:
+                continue
+            blocked = False
+            for px, py in hex_line(origin, (x, y))[1:]:
+                if not (0 <= px < width and 0 <= py < height):
+                    blocked = True
+                    break
+                if grid[py][px] == MOUNTAIN and (px, py) != (x, y):
+                    blocked = True
+                    break
+            if not blocked:
+                vis.add((x, y))
+    return vis
+
+class TestVisibility(unittest.TestCase):
+    def test_matches_reference_on_random_maps(self):
+        for seed in range(4):
+            random.seed(seed)
+            state = GameState(30, 16)
+            for i in range(12):
+                kind = random.choice(['Scout', 'Infantry', 'Archer'])
+                x = random.randrange(state.map.width)
+                y = random.randrange(state.map.height)
+                state.add_unit(state.spawn_unit('A' if i % 2 == 0 else 'B', (x, y), kind))
+            loop = SimulationLoop(SimplePolicy(), initial_state=state)
+            for side in ('A', 'B'):
+                self.assertEqual(loop._compute_visibility(side), reference_visibility(state, side))
+
+    def test_incremental_tracker_follows_simulation(self):
+        random.seed(3)
+        loop = SimulationLoop(SimplePolicy(), initial_state=GameState(30, 16))
+        for _ in range(15):
+            loop.step()
+            loop._refresh_visibility()
+            for side in ('A', 'B'):
+                self.assertEqual(loop._vis_cache[side], reference_visibility(loop.state, side))
+
+    def test_los_table_reveal_blockers_on_dense_mountains(self):
+        rnd = random.Random(7)
+        width, height = 24, 14
+        grid = [[MOUNTAIN if rnd.random() < 0.3 else '.' for _ in range(width)] for _ in range(height)]
+        for y in range(height):
+            for x in range(width):
+                for r in (3, 6):
+                    self.assertEqual(compute_fov(grid, width, height, (x, y), r, reveal_blockers=True),
+                                     reference_fov_seeing_blockers(grid, width, height, (x, y), r))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import threading
+import unittest
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'src'))
+
+from core.state import GameState
+from ai.unit_policies import CompositePolicy
+from simulation.loop import SimulationLoop
+from web.server import StateHolder, TickStream
+
+def parse(data):
+    head, _, body = data.decode('utf-8').partition('\ndata: ')
+    return head[len('event: '):], json.loads(body)
+
+class TestTickStream(unittest.TestCase):
+    def test_deltas_rebuild_state(self):
+        loop = SimulationLoop(CompositePolicy(), None, initial_state=GameState(40, 20, seed=9))
+        stream = TickStream(loop)
+        q = stream.subscribe()
+        stream.publish()
+        kind, init = parse(q.get_nowait())
+        self.assertEqual(kind, 'init')
+        self.assertEqual(init['map']['grid'], loop.state.map.grid)
+        units = {u['id']: u for u in init['units']}
+        for _ in range(40):
+            loop.step()
+            stream.publish()
+            stream.publish()  # 同一 tick 不重复发送
+            kind, d = parse(q.get_nowait())
+            self.assertEqual(kind, 'delta')
+            self.assertNotIn('map', d)
+            self.assertTrue(q.empty())
+            for u in d['units']:
+                units[u['id']] = u
+            for uid in d['removed']:
+                del units[uid]
+        expect = {u.uid: (u.team, u.x, u.y, u.hp) for u in loop.state.units}
+        self.assertEqual({k: (u['team'], u['x'], u['y'], u['hp']) for k, u in units.items()}, expect)
+
+    def test_slow_viewer_gets_fresh_init(self):
+        loop = SimulationLoop(CompositePolicy(), None, initial_state=GameState(40, 20, seed=9))
+        stream = TickStream(loop, queue_size=3)
+        q = stream.subscribe()
+        for _ in range(6):
+            stream.publish()
+            loop.step()
+        stream.publish()
+        kinds = [parse(q.get_nowait())[0] for _ in range(q.qsize())]
+        self.assertEqual(kinds, ['init', 'delta', 'delta'])
+        stream.publish()
+        self.assertEqual(parse(q.get_nowait())[0], 'init')
+
+class TestStateHolder(unittest.TestCase):
+    def test_state_bytes_waits_for_step(self):
+        # step 进行中（持有 loop.lock）时快照请求必须等待，拿到的是 step 完成后的状态
+        loop = SimulationLoop(CompositePolicy(), None, initial_state=GameState(40, 20, seed=9))
+        holder = StateHolder(loop)
+        out = []
+        with loop.lock:
+            t = threading.Thread(target=lambda: out.append(holder.state_bytes()))
+            t.start()
+            t.join(0.2)
+            self.assertTrue(t.is_alive())
+            loop.state.tick += 1
+        t.join(5)
+        self.assertEqual(json.loads(out[0])['tick'], 1)
+
+if __name__ == '__main__':
+    unittest.main()